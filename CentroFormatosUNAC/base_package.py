@@ -0,0 +1,264 @@
+import argparse
+import datetime as dt
+import io
+import os
+import time
+import zipfile
+from functools import lru_cache
+
+import docx
+from docx import Document
+from docx.opc.pkgwriter import _ContentTypesItem
+from lxml import etree
+
+from docx_package import (
+    CONTENT_TYPES, CT_NS, DOCUMENT_PART, DOCUMENT_RELS, PKG_REL_NS, STYLES_PART, canonical_members,
+    to_xml_bytes, w, write_package,
+)
+from format_rules import PAGE_A4_CM, UNAC_MARGINS_CM
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(docx.__file__), "templates", "default.docx")
+NUMBERING_PART = "word/numbering.xml"
+SETTINGS_PART = "word/settings.xml"
+PACKAGE_RELS = "_rels/.rels"
+BASE_FONT = "Arial"
+BASE_LANG = "es-PE"
+TWIPS_PER_CM = 1440 / 2.54
+
+# Solo los estilos que referencian los generadores, markdown_ingest y figures
+KEEP_STYLES = {
+    "normal", "default paragraph font", "normal table", "no list", "header", "footer",
+    "caption", "list bullet", "list number", "table grid",
+} | {f"heading {n}" for n in range(1, 10)}
+
+# Partes de la plantilla de python-docx que ningun generador usa
+DROP_RELTYPES = {
+    "http://schemas.microsoft.com/office/2007/relationships/stylesWithEffects",
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/webSettings",
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/fontTable",
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/theme",
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/customXml",
+    "http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail",
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties",
+}
+DROP_SETTINGS = {"proofState", "savePreviewPicture", "rsids", "themeFontLang", "clrSchemeMapping",
+                 "shapeDefaults", "doNotAutoCompressPictures"}
+THEME_ATTRS = ("asciiTheme", "hAnsiTheme", "eastAsiaTheme", "cstheme",
+               "themeColor", "themeShade", "themeTint")
+RSID_PREFIX = w("rsid")
+
+# -------------------------
+# RECORTE DE PARTES
+# -------------------------
+
+def _strip_theme(root):
+    """Sin theme1.xml: fuentes y colores de tema pasan a valores explicitos."""
+    for el in root.iter(w("rFonts"), w("color")):
+        had_font = any(el.get(w(a)) for a in THEME_ATTRS[:4])
+        for attr in THEME_ATTRS:
+            el.attrib.pop(w(attr), None)
+        if had_font:
+            for attr in ("ascii", "hAnsi", "cs"):
+                el.set(w(attr), BASE_FONT)
+
+
+def _strip_rsids(root):
+    for el in root.iter():
+        for attr in [a for a in el.attrib if a.startswith(RSID_PREFIX)]:
+            del el.attrib[attr]
+
+
+def trim_styles(data: bytes) -> tuple:
+    """Deja solo KEEP_STYLES; devuelve (xml, numIds que siguen referenciados)."""
+    root = etree.fromstring(data)
+    latent = root.find(w("latentStyles"))
+    if latent is not None:
+        root.remove(latent)
+    for style in root.findall(w("style")):
+        name = style.find(w("name"))
+        if name is None or name.get(w("val"), "").lower() not in KEEP_STYLES:
+            root.remove(style)
+            continue
+        # Los estilos de caracter vinculados ("Heading 1 Char"...) no se conservan
+        for tag in ("link", "rsid"):
+            for el in style.findall(w(tag)):
+                style.remove(el)
+    _strip_theme(root)
+    for lang in root.iter(w("lang")):
+        lang.set(w("val"), BASE_LANG)
+    num_ids = {el.get(w("val")) for el in root.iter(w("numId"))}
+    return to_xml_bytes(root), num_ids
+
+
+def trim_numbering(data: bytes, num_ids: set) -> bytes:
+    root = etree.fromstring(data)
+    abstract_ids = set()
+    for num in root.findall(w("num")):
+        if num.get(w("numId")) in num_ids:
+            abstract_ids.add(num.find(w("abstractNumId")).get(w("val")))
+        else:
+            root.remove(num)
+    for abstract in root.findall(w("abstractNum")):
+        if abstract.get(w("abstractNumId")) not in abstract_ids:
+            root.remove(abstract)
+    _strip_theme(root)
+    _strip_rsids(root)
+    return to_xml_bytes(root)
+
+
+def trim_settings(data: bytes) -> bytes:
+    root = etree.fromstring(data)
+    for el in list(root):
+        local = etree.QName(el).localname
+        if local in DROP_SETTINGS or etree.QName(el).namespace != w("")[1:-1]:
+            root.remove(el)
+    for setting in root.iter(w("compatSetting")):
+        if setting.get(w("name")) == "compatibilityMode":
+            setting.set(w("val"), "15")
+    return to_xml_bytes(root)
+
+
+def unac_document(data: bytes) -> bytes:
+    """Cuerpo vacio con la seccion ya en A4 y margenes UNAC."""
+    root = etree.fromstring(data)
+    _strip_rsids(root)
+    sect = root.find(f"{w('body')}/{w('sectPr')}")
+    pg_sz, pg_mar = sect.find(w("pgSz")), sect.find(w("pgMar"))
+    pg_sz.set(w("w"), str(round(PAGE_A4_CM[0] * TWIPS_PER_CM)))
+    pg_sz.set(w("h"), str(round(PAGE_A4_CM[1] * TWIPS_PER_CM)))
+    for side, cm in UNAC_MARGINS_CM.items():
+        pg_mar.set(w(side), str(round(cm * TWIPS_PER_CM)))
+    return to_xml_bytes(root)
+
+# -------------------------
+# PAQUETE BASE (UNA VEZ POR PROCESO)
+# -------------------------
+
+def _drop_rels(data: bytes) -> bytes:
+    root = etree.fromstring(data)
+    for rel in root.findall(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Type") in DROP_RELTYPES:
+            root.remove(rel)
+    return to_xml_bytes(root)
+
+
+def build_base_package(template_path: str = DEFAULT_TEMPLATE) -> bytes:
+    parts = {}
+    with zipfile.ZipFile(template_path) as zin:
+        for name in zin.namelist():
+            parts[name] = zin.read(name)
+
+    parts[PACKAGE_RELS] = _drop_rels(parts[PACKAGE_RELS])
+    parts[DOCUMENT_RELS] = _drop_rels(parts[DOCUMENT_RELS])
+    parts[STYLES_PART], num_ids = trim_styles(parts[STYLES_PART])
+    parts[NUMBERING_PART] = trim_numbering(parts[NUMBERING_PART], num_ids)
+    parts[SETTINGS_PART] = trim_settings(parts[SETTINGS_PART])
+    parts[DOCUMENT_PART] = unac_document(parts[DOCUMENT_PART])
+
+    # Targets relativos a word/ o a la raiz; lo que ya no tiene relacion sale del paquete
+    keep = {CONTENT_TYPES}
+    pending = [PACKAGE_RELS]
+    while pending:
+        rels_name = pending.pop()
+        keep.add(rels_name)
+        base = os.path.dirname(os.path.dirname(rels_name))
+        for rel in etree.fromstring(parts[rels_name]).findall(f"{{{PKG_REL_NS}}}Relationship"):
+            target = os.path.normpath(os.path.join(base, rel.get("Target"))).replace(os.sep, "/").lstrip("/")
+            keep.add(target)
+            sub_rels = f"{os.path.dirname(target)}/_rels/{os.path.basename(target)}.rels".lstrip("/")
+            if sub_rels in parts and sub_rels not in keep:
+                pending.append(sub_rels)
+
+    ct = etree.fromstring(parts[CONTENT_TYPES])
+    for el in ct.findall(f"{{{CT_NS}}}Override"):
+        if el.get("PartName").lstrip("/") not in keep:
+            ct.remove(el)
+    for el in ct.findall(f"{{{CT_NS}}}Default"):
+        if el.get("Extension") not in ("xml", "rels"):
+            ct.remove(el)
+    parts[CONTENT_TYPES] = to_xml_bytes(ct)
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+        for name in [CONTENT_TYPES] + sorted(n for n in parts if n in keep and n != CONTENT_TYPES):
+            zout.writestr(name, parts[name])
+    return out.getvalue()
+
+
+@lru_cache(maxsize=1)
+def base_package_bytes() -> bytes:
+    return build_base_package()
+
+
+def new_document():
+    """Document() sobre el paquete UNAC recortado (construido una sola vez por proceso)."""
+    return Document(io.BytesIO(base_package_bytes()))
+
+# -------------------------
+# GUARDADO (DEFLATE EN PARALELO, OPCIONAL DETERMINISTA)
+# -------------------------
+
+def package_members(doc) -> list:
+    """[(miembro, bytes)] del paquete, lo mismo que escribiria doc.save() pero sin comprimir."""
+    package = doc.part.package
+    parts = list(package.parts)
+    for part in parts:
+        part.before_marshal()
+    members = [(CONTENT_TYPES, _ContentTypesItem.from_parts(parts).blob), (PACKAGE_RELS, package.rels.xml)]
+    for part in parts:
+        members.append((part.partname.membername, part.blob))
+        if len(part.rels):
+            members.append((part.partname.rels_uri.membername, part.rels.xml))
+    return members
+
+
+def build_timestamp() -> dt.datetime:
+    """Fecha fija de las salidas deterministas; respeta SOURCE_DATE_EPOCH si esta definido."""
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch and epoch.isdigit():
+        return max(dt.datetime.fromtimestamp(int(epoch), dt.timezone.utc).replace(tzinfo=None),
+                   dt.datetime(1980, 1, 1))
+    return dt.datetime(2000, 1, 1)
+
+
+def save_document(doc, path, deterministic: bool = False, compression: str = "balanced", jobs: int = None):
+    """
+    Reemplazo de doc.save(): las partes se comprimen en un pool de hilos al nivel
+    pedido (fast | balanced | small) y la media ya comprimida se guarda sin deflate.
+    En modo determinista fija las propiedades del documento, el orden de miembros y la
+    fecha del ZIP: las mismas entradas producen los mismos bytes (cache por hash, ETag).
+    """
+    date_time = None
+    if deterministic:
+        stamp = build_timestamp()
+        props = doc.core_properties
+        props.created = props.modified = stamp
+        props.revision = 1
+        props.last_modified_by = ""
+        date_time = stamp.timetuple()[:6]
+    members = package_members(doc)
+    if deterministic:
+        members = canonical_members(members)
+    write_package(path, members, compression=compression, jobs=jobs, date_time=date_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paquete DOCX base recortado para los generadores UNAC")
+    parser.add_argument("--write", help="Guarda el paquete base en esta ruta para inspeccionarlo")
+    parser.add_argument("--runs", type=int, default=200, help="Aperturas para medir")
+    args = parser.parse_args()
+
+    data = base_package_bytes()
+    if args.write:
+        with open(args.write, "wb") as f:
+            f.write(data)
+        print(f"[OK] Paquete base guardado en: {args.write}")
+
+    for label, opener in [("python-docx", Document), ("UNAC base", new_document)]:
+        t0 = time.perf_counter()
+        for _ in range(args.runs):
+            doc = opener()
+        elapsed = (time.perf_counter() - t0) / args.runs * 1000
+        out = io.BytesIO()
+        doc.save(out)
+        print(f"[OK] {label:12s} apertura {elapsed:6.2f} ms, docx vacio {len(out.getvalue()) // 1024} KB")
@@ -0,0 +1,465 @@
+import argparse
+import json
+import re
+import sys
+import time
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+from templates import normalize_text
+
+CITATION_STYLES = ("apa", "iso690")
+
+Reference = namedtuple("Reference", [
+    "key", "kind", "authors", "title", "container", "year", "volume", "issue", "pages",
+    "publisher", "place", "edition", "doi", "url",
+])
+
+# -------------------------
+# BIBTEX
+# -------------------------
+
+LATEX_ACCENTS = {"'": "\u0301", "`": "\u0300", "^": "\u0302", '"': "\u0308", "~": "\u0303", "c": "\u0327"}
+LATEX_ACCENT_RE = re.compile(r"\\([`'^\"~c])\s*\{?\s*([A-Za-z])\s*\}?")
+LATEX_DOTLESS_RE = re.compile(r"\\([ij])(?![A-Za-z])")
+LATEX_CMD_RE = re.compile(r"\\(?:textit|emph|textbf|textsc)\s*")
+BRACE_RE = re.compile(r"[{}]")
+QUOTED_RE = re.compile(r'[{}"]')
+BARE_RE = re.compile(r"[\w\-:.]*")
+FIELD_RE = re.compile(r"[\s,]*(\w[\w-]*)\s*=\s*")
+ENTRY_RE = re.compile(r"@(\w+)\s*[{(]\s*([^,\s]+)\s*,")
+BIBTEX_KINDS = {
+    "article": "article", "book": "book", "inbook": "chapter", "incollection": "chapter",
+    "inproceedings": "chapter", "conference": "chapter", "phdthesis": "thesis",
+    "mastersthesis": "thesis", "thesis": "thesis", "online": "web", "misc": "web",
+    "techreport": "report", "report": "report",
+}
+
+
+def _clean_latex(value: str) -> str:
+    if "\\" not in value and "{" not in value and "-" not in value:
+        return " ".join(value.split())
+    value = LATEX_DOTLESS_RE.sub(r"\1", value)
+    value = LATEX_ACCENT_RE.sub(lambda m: unicodedata.normalize("NFC", m.group(2) + LATEX_ACCENTS[m.group(1)]), value)
+    value = LATEX_CMD_RE.sub("", value).replace("\\&", "&").replace("--", "\u2013")
+    return " ".join(value.replace("{", "").replace("}", "").split())
+
+
+def _read_value(text: str, pos: int) -> tuple:
+    """Lee un valor BibTeX ({...}, "..." o palabra) desde pos; devuelve (valor, nueva_pos)."""
+    opener = text[pos]
+    if opener in "{\"":
+        closer, delim_re = ("}", BRACE_RE) if opener == "{" else ("\"", QUOTED_RE)
+        depth, start = 0, pos + 1
+        # Salta de delimitador en delimitador en vez de recorrer caracter a caracter
+        for m in delim_re.finditer(text, start):
+            ch = m.group(0)
+            if ch == "{":
+                depth += 1
+            elif ch == "}" and depth:
+                depth -= 1
+            elif ch == closer and depth == 0:
+                return text[start:m.start()], m.end()
+        raise ValueError("Valor BibTeX sin cerrar")
+    m = BARE_RE.match(text, pos)
+    return m.group(0), m.end()
+
+
+def _split_authors(value: str) -> tuple:
+    authors = []
+    for name in re.split(r"\s+and\s+", value.strip()):
+        if not name:
+            continue
+        if name.startswith("{") and name.endswith("}"):
+            authors.append((_clean_latex(name), ""))
+        elif "," in name:
+            family, given = name.split(",", 1)
+            authors.append((_clean_latex(family), _clean_latex(given)))
+        else:
+            parts = _clean_latex(name).split()
+            authors.append((parts[-1], " ".join(parts[:-1])))
+    return tuple(authors)
+
+
+def parse_bibtex(text: str) -> list:
+    entries, pos = [], 0
+    while True:
+        m = ENTRY_RE.search(text, pos)
+        if m is None:
+            break
+        kind, pos = m.group(1).lower(), m.end()
+        if kind in ("comment", "preamble", "string"):
+            continue
+        fields = {}
+        while True:
+            field = FIELD_RE.match(text, pos)
+            if field is None or field.end() >= len(text):
+                break
+            value, pos = _read_value(text, field.end())
+            fields[field.group(1).lower()] = value
+        year = re.search(r"\d{4}", fields.get("year", fields.get("date", "")))
+        entries.append(Reference(
+            key=m.group(2),
+            kind=BIBTEX_KINDS.get(kind, "other"),
+            authors=_split_authors(fields.get("author", fields.get("editor", ""))),
+            title=_clean_latex(fields.get("title", "")),
+            container=_clean_latex(fields.get("journal", fields.get("journaltitle", fields.get("booktitle", "")))),
+            year=year.group(0) if year else "",
+            volume=_clean_latex(fields.get("volume", "")),
+            issue=_clean_latex(fields.get("number", fields.get("issue", ""))),
+            pages=_clean_latex(fields.get("pages", "")),
+            publisher=_clean_latex(fields.get("publisher", fields.get("school",
+                                   fields.get("institution", fields.get("organization", ""))))),
+            place=_clean_latex(fields.get("address", fields.get("location", ""))),
+            edition=_clean_latex(fields.get("edition", "")),
+            doi=fields.get("doi", "").strip(),
+            url=fields.get("url", "").strip(),
+        ))
+    return entries
+
+# -------------------------
+# CSL-JSON
+# -------------------------
+
+CSL_KINDS = {
+    "article-journal": "article", "article-magazine": "article", "article-newspaper": "article",
+    "article": "article", "book": "book", "chapter": "chapter", "paper-conference": "chapter",
+    "thesis": "thesis", "webpage": "web", "post-weblog": "web", "report": "report",
+}
+
+
+def _csl_text(value) -> str:
+    """Campo de texto CSL: cadena, numero o lista de cadenas (container-title de algunas exportaciones)."""
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f"se esperaba texto, llego {type(value).__name__}")
+    return str(value)
+
+
+def _csl_year(item: dict) -> str:
+    parts = item.get("issued", {})
+    if not isinstance(parts, dict):
+        raise ValueError("issued debe ser un objeto")
+    parts = parts.get("date-parts", [[]])
+    if not isinstance(parts, list) or (parts and not isinstance(parts[0], list)):
+        raise ValueError("issued.date-parts debe ser una lista de listas")
+    return _csl_text(parts[0][0]) if parts and parts[0] else ""
+
+
+def _csl_authors(item: dict) -> tuple:
+    people = item.get("author", item.get("editor", []))
+    if not isinstance(people, list) or not all(isinstance(a, dict) for a in people):
+        raise ValueError("author debe ser una lista de objetos")
+    return tuple(
+        (_csl_text(a["literal"]), "") if "literal" in a
+        else (_csl_text(a.get("family", "")), _csl_text(a.get("given", "")))
+        for a in people
+    )
+
+
+def parse_csl_json(items: list) -> list:
+    """ValueError si el JSON no tiene la forma de CSL (lista de objetos con campos de texto)."""
+    if not isinstance(items, list):
+        raise ValueError("CSL-JSON: se esperaba una lista de entradas")
+    entries = []
+    for n, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"CSL-JSON: la entrada {n} no es un objeto")
+        text = lambda field: _csl_text(item.get(field, ""))
+        try:
+            entries.append(Reference(
+                key=text("id"),
+                kind=CSL_KINDS.get(text("type"), "other"),
+                authors=_csl_authors(item),
+                title=text("title"),
+                container=text("container-title"),
+                year=_csl_year(item),
+                volume=text("volume"),
+                issue=text("issue"),
+                pages=text("page").replace("-", "\u2013"),
+                publisher=text("publisher"),
+                place=text("publisher-place"),
+                edition=text("edition"),
+                doi=text("DOI"),
+                url=text("URL"),
+            ))
+        except ValueError as exc:
+            raise ValueError(f"CSL-JSON: entrada {n} mal formada: {exc}") from None
+    return entries
+
+
+@lru_cache(maxsize=32)
+def parse_bibliography(text: str, kind: str = "auto") -> tuple:
+    """
+    Parsea BibTeX o CSL-JSON; el resultado se reutiliza si llega el mismo archivo.
+    ValueError ante cualquier entrada no valida.
+    """
+    if kind == "auto":
+        kind = "csl" if text.lstrip()[:1] in "[{" else "bibtex"
+    if kind == "csl":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("items", [])
+        return tuple(parse_csl_json(data))
+    return tuple(parse_bibtex(text))
+
+# -------------------------
+# ESTILOS (APA 7 / ISO 690)
+# -------------------------
+
+def _initials(given: str) -> str:
+    return " ".join(f"{part[0]}." for part in given.replace("-", " ").split() if part)
+
+
+def _join(names: list, conj: str) -> str:
+    if len(names) <= 1:
+        return "".join(names)
+    return ", ".join(names[:-1]) + f", {conj} " + names[-1]
+
+
+def _apa_authors(authors: tuple) -> str:
+    names = [f"{family}, {_initials(given)}" if given else family for family, given in authors]
+    if len(names) > 20:
+        return ", ".join(names[:19]) + ", ... " + names[-1]
+    return _join(names, "y")
+
+
+def _iso_authors(authors: tuple) -> str:
+    names = [f"{family.upper()}, {given}" if given else family.upper() for family, given in authors]
+    return "; ".join(names[:3]) + (" et al." if len(names) > 3 else "")
+
+
+def _doi_or_url(ref: Reference) -> str:
+    if ref.doi:
+        return ref.doi if ref.doi.startswith("http") else f"https://doi.org/{ref.doi}"
+    return ref.url
+
+
+def _apa(ref: Reference, suffix: str) -> list:
+    year = f"{ref.year or 's.f.'}{suffix}"
+    segs = [(f"{_apa_authors(ref.authors)} ({year}). " if ref.authors else "", False)]
+    title = ref.title.rstrip(".")
+    if ref.kind == "article":
+        segs.append((f"{title}. ", False))
+        segs.append((ref.container, True))
+        if ref.volume:
+            segs += [(", ", False), (ref.volume, True)]
+        if ref.issue:
+            segs.append((f"({ref.issue})", False))
+        if ref.pages:
+            segs.append((f", {ref.pages}", False))
+        segs.append((". ", False))
+    elif ref.kind == "chapter":
+        segs.append((f"{title}. En ", False))
+        segs.append((ref.container, True))
+        segs.append((f" (pp. {ref.pages}). " if ref.pages else ". ", False))
+        if ref.publisher:
+            segs.append((f"{ref.publisher}. ", False))
+    else:
+        segs.append((title, True))
+        if ref.edition:
+            segs.append((f" ({ref.edition}.\u00aa ed.)", False))
+        if ref.kind == "thesis":
+            segs.append((" [Tesis]", False))
+        segs.append((". ", False))
+        if ref.publisher:
+            segs.append((f"{ref.publisher}. ", False))
+    if not ref.authors:
+        # Sin autor, el titulo ocupa su lugar y el anio va despues
+        segs.insert(len(segs) - 1, (f" ({year})", False))
+    link = _doi_or_url(ref)
+    if link:
+        segs.append((link, False))
+    return segs
+
+
+def _iso690(ref: Reference, suffix: str) -> list:
+    year = f"{ref.year or 's.f.'}{suffix}"
+    head = _iso_authors(ref.authors)
+    segs = [(f"{head}, {year}. " if head else f"{year}. ", False)]
+    title = ref.title.rstrip(".")
+    if ref.kind == "article":
+        segs.append((f"{title}. ", False))
+        segs.append((ref.container, True))
+        details = [f"vol. {ref.volume}" if ref.volume else "", f"no. {ref.issue}" if ref.issue else "",
+                   f"pp. {ref.pages}" if ref.pages else ""]
+        segs.append((". " + ", ".join(d for d in details if d) + ". " if any(details) else ". ", False))
+    elif ref.kind == "chapter":
+        segs.append((f"{title}. En: ", False))
+        segs.append((ref.container, True))
+        segs.append((". ", False))
+    else:
+        segs.append((title, True))
+        segs.append((" [en l\u00ednea]. " if ref.kind == "web" else ". ", False))
+        if ref.edition:
+            segs.append((f"{ref.edition}.\u00aa ed. ", False))
+        if ref.kind == "thesis":
+            segs.append(("Tesis. ", False))
+    imprint = ": ".join(x for x in (ref.place, ref.publisher) if x)
+    if imprint and ref.kind != "article":
+        segs.append((f"{imprint}" + (f", pp. {ref.pages}. " if ref.kind == "chapter" and ref.pages else ". "),
+                     False))
+    if ref.doi:
+        segs.append((f"DOI {ref.doi}. ", False))
+    if ref.url:
+        segs.append((f"Disponible en: {ref.url}", False))
+    return segs
+
+
+STYLE_FORMATTERS = {"apa": _apa, "iso690": _iso690}
+
+
+@lru_cache(maxsize=16384)
+def format_reference(style: str, ref: Reference, suffix: str = "") -> tuple:
+    """Entrada formateada como ((texto, cursiva), ...); compartida entre documentos."""
+    segs = [(text, italic) for text, italic in STYLE_FORMATTERS[style](ref, suffix) if text]
+    if segs:
+        segs[-1] = (segs[-1][0].rstrip(), segs[-1][1])
+    return tuple(segs)
+
+
+def _cite_label(style: str, ref: Reference) -> str:
+    families = [family for family, _given in ref.authors]
+    if style == "iso690":
+        families = [f.upper() for f in families]
+    if not families:
+        return ref.title
+    if len(families) == 1:
+        return families[0]
+    if len(families) == 2:
+        return f"{families[0]} y {families[1]}"
+    return f"{families[0]} et al."
+
+# -------------------------
+# BIBLIOGRAFIA DE UN DOCUMENTO
+# -------------------------
+
+CITE_RE = re.compile(r"\[(@[^\]]+)\]")
+CITE_ITEM_RE = re.compile(r"^\s*@([^\s,;]+)\s*(?:,\s*(.+?))?\s*$")
+# Marca provisional del sufijo a/b de una cita (numero de la entrada citada); se
+# resuelve con resolve() cuando ya se conocen todas las citas del documento
+SUFFIX_MARK = "\ue000{}\ue001"
+SUFFIX_MARK_RE = re.compile("\ue000(\\d+)\ue001")
+
+
+def year_suffix(i: int) -> str:
+    """0 -> a, 25 -> z, 26 -> aa, 27 -> ab... (sin repetir pasada la z)."""
+    letters = ""
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        letters = chr(ord("a") + rem) + letters
+    return letters
+
+
+class Bibliography:
+    """Entradas de un documento, citas resueltas en el texto y lista final ordenada."""
+
+    def __init__(self, entries, style: str = "apa"):
+        if style not in STYLE_FORMATTERS:
+            raise ValueError(f"Estilo de citas no soportado: {style}")
+        self.style = style
+        self.entries = {ref.key: ref for ref in entries}
+        self.cited = {}
+        self.missing = set()
+        self.suffixes = {}
+        self._by_index = {}
+        # Solo estas entradas pueden llevar sufijo: comparten autor y anio con otra
+        groups = {}
+        for ref in self.entries.values():
+            groups.setdefault(self._group(ref), []).append(ref.key)
+        self.ambiguous = {key for keys in groups.values() if len(keys) > 1 for key in keys}
+
+    @classmethod
+    def from_text(cls, text: str, style: str = "apa", kind: str = "auto"):
+        return cls(parse_bibliography(text, kind), style=style)
+
+    @classmethod
+    def from_file(cls, path: str, style: str = "apa"):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        return cls.from_text(text, style=style, kind="csl" if path.lower().endswith(".json") else "bibtex")
+
+    def _sort_key(self, ref: Reference) -> tuple:
+        first = ref.authors[0][0] if ref.authors else ref.title
+        return (normalize_text(first), ref.year or "9999", normalize_text(ref.title))
+
+    def _group(self, ref: Reference) -> tuple:
+        return (_cite_label(self.style, ref), ref.year)
+
+    def _year_suffixes(self, keys) -> dict:
+        """Mismo autor y anio dentro de keys: 2020a, 2020b... (por titulo)."""
+        groups = {}
+        for key in keys:
+            ref = self.entries[key]
+            groups.setdefault(self._group(ref), []).append(ref)
+        suffixes = {}
+        for refs in groups.values():
+            if len(refs) > 1:
+                for i, ref in enumerate(sorted(refs, key=lambda r: normalize_text(r.title))):
+                    suffixes[ref.key] = year_suffix(i)
+        return suffixes
+
+    def _cite_one(self, item: str) -> str:
+        m = CITE_ITEM_RE.match(item)
+        key, locator = (m.group(1), m.group(2)) if m else (item.strip().lstrip("@"), None)
+        ref = self.entries.get(key)
+        if ref is None:
+            self.missing.add(key)
+            return f"\u00bf{key}?"
+        index = self.cited.setdefault(key, len(self.cited))
+        mark = SUFFIX_MARK.format(index) if key in self.ambiguous else ""
+        text = f"{_cite_label(self.style, ref)}, {ref.year or 's.f.'}{mark}"
+        return f"{text}, {locator}" if locator else text
+
+    def cite(self, text: str) -> str:
+        """
+        Reemplaza [@clave], [@a; @b] y [@clave, p. 12] por la cita en el estilo activo.
+        El sufijo 2020a/2020b depende de todo lo citado: queda marcado hasta resolve().
+        """
+        if "[@" not in text:
+            return text
+        return CITE_RE.sub(lambda m: "(" + "; ".join(self._cite_one(i) for i in m.group(1).split(";")) + ")", text)
+
+    def finish(self):
+        """Segunda pasada, con el cuerpo ya recorrido: sufijos solo entre las entradas citadas."""
+        self.suffixes = self._year_suffixes(self.cited)
+        self._by_index = {index: key for key, index in self.cited.items()}
+
+    def resolve(self, text: str) -> str:
+        """Cambia las marcas de cite() por el sufijo final (o nada); requiere finish()."""
+        return SUFFIX_MARK_RE.sub(lambda m: self.suffixes.get(self._by_index[int(m.group(1))], ""), text)
+
+    def references(self, only_cited: bool = True) -> list:
+        keys = self.cited if only_cited and self.cited else self.entries
+        suffixes = self._year_suffixes(keys)
+        refs = sorted((self.entries[k] for k in keys), key=self._sort_key)
+        return [format_reference(self.style, ref, suffixes.get(ref.key, "")) for ref in refs]
+
+
+def references_heading(headings: list) -> str:
+    """Titulo de la seccion de referencias dentro de [(nivel, texto)] de la plantilla."""
+    return next((text for _level, text in headings if "referencia" in normalize_text(text)
+                 and "jurado" not in normalize_text(text)), "")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Formatea una bibliografia BibTeX o CSL-JSON")
+    parser.add_argument("archivo", help=".bib o .json (CSL)")
+    parser.add_argument("--style", default="apa", choices=CITATION_STYLES)
+    parser.add_argument("--limit", type=int, default=0, help="Muestra solo las primeras N entradas")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        bib = Bibliography.from_file(args.archivo, style=args.style)
+    except (OSError, ValueError) as exc:
+        print(f"[ERROR] No se pudo leer la bibliografia: {exc}")
+        sys.exit(1)
+    refs = bib.references(only_cited=False)
+    elapsed = time.perf_counter() - t0
+    for segs in refs[:args.limit or len(refs)]:
+        print("".join(text for text, _italic in segs))
+    print(f"[OK] {len(refs)} referencias formateadas en {elapsed * 1000:.1f} ms")
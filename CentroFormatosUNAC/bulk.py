@@ -0,0 +1,274 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from docx_package import COMPRESSION_LEVELS
+from templates import apply_overrides, check_override_path, load_template, resolve_key
+from unac_logging import get_logger, setup_logging
+
+CHECKPOINT_NAME = ".bulk_checkpoint.json"
+ERRORS_NAME = "bulk_errors.jsonl"
+CHECKPOINT_EVERY_S = 2.0
+PROGRESS_EVERY_S = 2.0
+# Filas en vuelo por proceso: la memoria no depende del tamano de la entrada
+WINDOW_PER_WORKER = 4
+NAME_RE = re.compile(r"[^\w.-]+")
+
+log = get_logger("bulk")
+
+# -------------------------
+# ENTRADA (STREAMING)
+# -------------------------
+
+def _flatten(row: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in row.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def iter_rows(path: str):
+    """Filas como {ruta.con.puntos: valor}; CSV (coma, punto y coma o tab) o JSONL, leido linea a linea."""
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield _flatten(json.loads(line))
+        return
+    # utf-8-sig: los CSV exportados desde Excel traen BOM
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.DictReader(f, dialect=dialect):
+            yield {k.strip(): v for k, v in row.items() if k}
+
+# -------------------------
+# WORKERS
+# -------------------------
+
+_WORKER = {}
+
+
+def _init_worker(fmt_type: str, sub_type: str, options: dict):
+    # Generadores importados y plantilla cargada una vez por proceso
+    from markdown_ingest import render_template
+    logging.getLogger("unac").setLevel(logging.WARNING)
+    _WORKER.update(fmt=fmt_type, sub=sub_type, base=load_template(fmt_type, sub_type),
+                   render=render_template, options=options)
+
+
+def _render_row(index: int, output_path: str, overrides: dict) -> tuple:
+    """(indice, bytes escritos, error); la salida aparece completa o no aparece."""
+    tmp_path = output_path + ".tmp"
+    try:
+        cfg = apply_overrides(_WORKER["base"], overrides)
+        _WORKER["render"](_WORKER["fmt"], _WORKER["sub"], tmp_path, cfg=cfg, **_WORKER["options"])
+        os.replace(tmp_path, output_path)
+        return index, os.path.getsize(output_path), None
+    except Exception as exc:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return index, 0, f"{type(exc).__name__}: {exc}"
+
+# -------------------------
+# CHECKPOINT
+# -------------------------
+
+class Checkpoint:
+    """
+    Progreso reanudable: todas las filas < done_upto estan terminadas, mas las que
+    terminaron fuera de orden (como mucho la ventana en vuelo). Escritura atomica.
+    """
+
+    def __init__(self, path: str, signature: dict):
+        self.path = path
+        self.signature = signature
+        self.done_upto = 0
+        self.done = set()
+        self.ok = 0
+        self.failed = 0
+        self.saved_at = 0.0
+
+    @classmethod
+    def load(cls, path: str, signature: dict, restart: bool = False):
+        cp = cls(path, signature)
+        if restart or not os.path.exists(path):
+            return cp
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cp
+        if data.get("signature") != signature:
+            log.warning("Checkpoint de otra entrada o plantilla; se empieza de cero: %s", path)
+            return cp
+        cp.done_upto, cp.done = data["done_upto"], set(data["done"])
+        cp.ok, cp.failed = data["ok"], data["failed"]
+        return cp
+
+    def is_done(self, index: int) -> bool:
+        return index < self.done_upto or index in self.done
+
+    def mark(self, index: int, ok: bool):
+        self.done.add(index)
+        while self.done_upto in self.done:
+            self.done.remove(self.done_upto)
+            self.done_upto += 1
+        if ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+
+    def save(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.saved_at < CHECKPOINT_EVERY_S:
+            return
+        data = {"signature": self.signature, "done_upto": self.done_upto, "done": sorted(self.done),
+                "ok": self.ok, "failed": self.failed}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+        self.saved_at = now
+
+# -------------------------
+# ORQUESTACION
+# -------------------------
+
+def output_name(row: dict, index: int, name_column: str) -> str:
+    name = NAME_RE.sub("_", str(row.get(name_column) or "")).strip("._")
+    return f"{name or f'fila_{index + 1:06d}'}.docx"
+
+
+def unique_name(name: str, used: set) -> str:
+    """
+    Un nombre repetido (sin distinguir mayusculas, como en Windows/macOS) recibe _2,
+    _3...: dos filas nunca escriben el mismo archivo. used acumula todas las filas,
+    tambien las ya hechas, para que al reanudar salgan los mismos nombres.
+    """
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate.lower() in used:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def run_bulk(input_path: str, out_dir: str, fmt_type: str, sub_type: str, jobs: int = None,
+             name_column: str = "id", restart: bool = False, deterministic: bool = False,
+             compression: str = "balanced") -> dict:
+    fmt_type, sub_type = resolve_key(fmt_type, sub_type)
+    base = load_template(fmt_type, sub_type)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    os.makedirs(out_dir, exist_ok=True)
+    st = os.stat(input_path)
+    signature = {"input": os.path.abspath(input_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                 "template": f"{fmt_type}/{sub_type}"}
+    cp = Checkpoint.load(os.path.join(out_dir, CHECKPOINT_NAME), signature, restart=restart)
+    if cp.done_upto or cp.done:
+        print(f"[OK] Reanudando desde la fila {cp.done_upto + 1} ({cp.ok} generados, {cp.failed} con error)")
+
+    options = {"deterministic": deterministic, "compression": compression}
+    checked, pending, used_names = set(), {}, set()
+    window = jobs * WINDOW_PER_WORKER
+    t0 = last_report = time.monotonic()
+    done_now = bytes_now = 0
+
+    def collect(futures):
+        nonlocal done_now, bytes_now
+        for fut in futures:
+            index, size, error = fut.result()
+            name = pending.pop(fut)
+            if error:
+                with open(os.path.join(out_dir, ERRORS_NAME), "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"row": index + 1, "output": name, "error": error}, ensure_ascii=False) + "\n")
+                log.warning("Fila %s (%s): %s", index + 1, name, error)
+            cp.mark(index, ok=error is None)
+            done_now += 1
+            bytes_now += size
+        cp.save()
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(fmt_type, sub_type, options)) as pool:
+            for index, row in enumerate(iter_rows(input_path)):
+                wanted = output_name(row, index, name_column)
+                name = unique_name(wanted, used_names)
+                if cp.is_done(index):
+                    continue
+                if name != wanted:
+                    log.warning("Fila %s: %s repetido en '%s', se guarda como %s", index + 1, wanted, name_column, name)
+                # Celda vacia = se mantiene el valor de la plantilla
+                overrides = {k: v for k, v in row.items() if k != name_column and v not in (None, "")}
+                for path in overrides.keys() - checked:
+                    check_override_path(base, path)
+                    checked.add(path)
+                fut = pool.submit(_render_row, index, os.path.join(out_dir, name), overrides)
+                pending[fut] = name
+                if len(pending) >= window:
+                    finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(finished)
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_EVERY_S:
+                    last_report = now
+                    print(f"[OK] {cp.ok + cp.failed} filas ({done_now / (now - t0):.1f} docs/s), {cp.failed} con error")
+            collect(wait(list(pending))[0])
+    finally:
+        cp.save(force=True)
+
+    elapsed = time.monotonic() - t0
+    return {"generated": cp.ok, "failed": cp.failed, "this_run": done_now, "elapsed_s": round(elapsed, 2),
+            "docs_per_s": round(done_now / elapsed, 1) if elapsed else 0.0, "bytes": bytes_now}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generacion masiva sin servidor: un DOCX por fila de un CSV/JSONL de registros academicos",
+        epilog="Cada columna es una ruta con puntos del JSON de la plantilla, p. ej. cover.autor (maestria) "
+               "o caratula.label_autor (informe); una celda vacia deja el valor de la plantilla. "
+               "La columna --name-column da el nombre del archivo.",
+    )
+    parser.add_argument("entrada", help="CSV (coma, punto y coma o tab) o JSONL")
+    parser.add_argument("salida", help="Carpeta de salida (ahi queda tambien el checkpoint)")
+    parser.add_argument("--format", default="maestria", help="proyecto | informe | maestria")
+    parser.add_argument("--sub-type", default="cuant", help="cuant | cual")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Procesos generadores")
+    parser.add_argument("--name-column", default="id", help="Columna con el nombre de cada archivo (sin .docx)")
+    parser.add_argument("--restart", action="store_true", help="Ignora el checkpoint y empieza de cero")
+    parser.add_argument("--deterministic", action="store_true", help="Salida reproducible byte a byte")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_LEVELS), default="balanced",
+                        help="Nivel de deflate del DOCX: fast, balanced o small")
+    args = parser.parse_args()
+    setup_logging()
+
+    try:
+        result = run_bulk(args.entrada, args.salida, args.format, args.sub_type, jobs=args.jobs,
+                          name_column=args.name_column, restart=args.restart, deterministic=args.deterministic,
+                          compression=args.compression)
+    except (OSError, ValueError) as exc:
+        print(f"[ERROR] {exc}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("[WARN] Interrumpido; al volver a ejecutar se reanuda desde el checkpoint")
+        sys.exit(130)
+    print(f"[OK] {result['this_run']} documentos en {result['elapsed_s']}s ({result['docs_per_s']} docs/s, "
+          f"{result['bytes'] // 1024} KB); total {result['generated']} generados, {result['failed']} con error")
+    if result["failed"]:
+        print(f"[WARN] Detalle de errores en {os.path.join(args.salida, ERRORS_NAME)}")
@@ -0,0 +1,156 @@
+import bisect
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime
+
+from templates import (
+    DOCS_DIR, ENFOQUES, SCRIPTS_CONFIG, iter_templates, load_template,
+    normalize_text, output_filename, template_headings,
+)
+from unac_logging import get_logger
+
+log = get_logger("catalog")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Peso de cada campo al ordenar resultados
+FIELD_WEIGHTS = {
+    "id": 4,
+    "tipo": 3,
+    "enfoque": 3,
+    "descripcion": 2,
+    "titulo": 1,
+}
+
+
+def tokenize(text: str) -> list:
+    return [tok for tok in TOKEN_RE.findall(normalize_text(text)) if len(tok) > 1]
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class TemplateCatalog:
+    """Catalogo en memoria de las plantillas de formats/ con indice invertido."""
+
+    def __init__(self, docs_dir: str = DOCS_DIR):
+        self.docs_dir = docs_dir
+        self.entries = {}
+        self.index = {}
+        self.vocab = []
+        self.lock = threading.Lock()
+
+    # -------------------------
+    # CONSTRUCCION
+    # -------------------------
+
+    def build(self):
+        entries, index = {}, {}
+        for fmt_type, sub_type, _path in iter_templates():
+            try:
+                cfg = load_template(fmt_type, sub_type)
+            except (OSError, ValueError) as exc:
+                log.warning("Plantilla omitida del catalogo %s/%s: %s", fmt_type, sub_type, exc)
+                continue
+
+            key = f"{fmt_type}/{sub_type}"
+            headings = template_headings(fmt_type, cfg)
+            entry = {
+                "key": key,
+                "id": cfg.get("id", f"unac_{fmt_type}_{sub_type}"),
+                "format": fmt_type,
+                "sub_type": sub_type,
+                "universidad": cfg.get("universidad", "UNAC"),
+                "tipo": cfg.get("tipo", SCRIPTS_CONFIG[fmt_type]["tipo"]),
+                "enfoque": cfg.get("enfoque", ENFOQUES.get(sub_type, sub_type)),
+                "version": cfg.get("version", "1.0.0"),
+                "descripcion": cfg.get("descripcion", SCRIPTS_CONFIG[fmt_type]["descripcion"]),
+                "titulos": len(headings),
+                "file": output_filename(fmt_type, sub_type),
+            }
+            entry.update(self._render_metadata(entry["file"]))
+            entries[key] = entry
+
+            fields = [
+                ("id", entry["id"].replace("_", " ")),
+                ("tipo", entry["tipo"].replace("_", " ")),
+                ("enfoque", entry["enfoque"]),
+                ("descripcion", entry["descripcion"]),
+            ] + [("titulo", text) for _level, text in headings]
+            for field, text in fields:
+                for tok in tokenize(text):
+                    postings = index.setdefault(tok, {})
+                    postings[key] = postings.get(key, 0) + FIELD_WEIGHTS[field]
+
+        with self.lock:
+            self.entries = entries
+            self.index = index
+            self.vocab = sorted(index)
+        return self
+
+    def _render_metadata(self, filename: str) -> dict:
+        path = os.path.join(self.docs_dir, filename)
+        if not os.path.exists(path):
+            return {"size_bytes": None, "sha256": None, "last_render": None}
+        st = os.stat(path)
+        return {
+            "size_bytes": st.st_size,
+            "sha256": file_sha256(path),
+            "last_render": datetime.fromtimestamp(st.st_mtime).isoformat(timespec="seconds"),
+        }
+
+    def record_render(self, fmt_type: str, sub_type: str, output_path: str):
+        """Actualiza tamano, hash y fecha de render tras una generacion exitosa."""
+        key = f"{fmt_type}/{sub_type}"
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not os.path.exists(output_path):
+                return
+            st = os.stat(output_path)
+            entry["size_bytes"] = st.st_size
+            entry["sha256"] = file_sha256(output_path)
+            entry["last_render"] = datetime.now().isoformat(timespec="seconds")
+
+    # -------------------------
+    # CONSULTAS
+    # -------------------------
+
+    def list(self) -> list:
+        with self.lock:
+            return [dict(e) for e in self.entries.values()]
+
+    def _postings(self, tok: str, prefix: bool) -> dict:
+        if not prefix:
+            return self.index.get(tok, {})
+        merged = {}
+        i = bisect.bisect_left(self.vocab, tok)
+        while i < len(self.vocab) and self.vocab[i].startswith(tok):
+            for key, score in self.index[self.vocab[i]].items():
+                merged[key] = merged.get(key, 0) + score
+            i += 1
+        return merged
+
+    def search(self, query: str, limit: int = 20) -> list:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self.lock:
+            scores = None
+            # El ultimo termino se trata como prefijo (busqueda mientras se escribe)
+            for n, tok in enumerate(tokens):
+                postings = self._postings(tok, prefix=(n == len(tokens) - 1))
+                if scores is None:
+                    scores = dict(postings)
+                else:
+                    scores = {k: s + postings[k] for k, s in scores.items() if k in postings}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+            return [dict(self.entries[key], score=score) for key, score in ranked]
@@ -0,0 +1,120 @@
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from docx.shared import Pt, RGBColor
+
+from docx_package import PPR_ORDER, get_or_add
+
+# -------------------------
+# ESTILOS CON NOMBRE
+# -------------------------
+# Los generadores definen cada estilo una sola vez por documento y los parrafos
+# solo llevan <w:pStyle>; asi no se repiten rFonts/sz/b en cada run.
+
+THEME_FONT_ATTRS = ("asciiTheme", "hAnsiTheme", "eastAsiaTheme", "cstheme")
+
+
+def set_style_font(style, font_name: str):
+    """Fuente explicita en un estilo; quita la fuente de tema que, si no, tiene prioridad."""
+    style.font.name = font_name
+    fonts = style.element.rPr.rFonts
+    for attr in THEME_FONT_ATTRS:
+        fonts.attrib.pop(qn(f"w:{attr}"), None)
+    fonts.set(qn("w:cs"), font_name)
+
+
+def paragraph_style(doc, name: str, font: str = "Arial", size_pt: float = 12, bold: bool = False,
+                    italic: bool = False, color: RGBColor = None, align=None, space_before: float = None,
+                    space_after: float = None, line_spacing_rule=None, base: str = "Normal",
+                    outline_level: int = None) -> str:
+    """
+    Crea el estilo de parrafo si no existe y devuelve su styleId. outline_level (1-9)
+    lo marca como titulo: panel de navegacion, validador y fusion de contenido.
+    """
+    try:
+        return doc.styles[name].style_id
+    except KeyError:
+        pass
+    style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = doc.styles[base]
+    style.quick_style = True
+    set_style_font(style, font)
+    style.font.size = Pt(size_pt)
+    style.font.bold = bold
+    style.font.italic = italic
+    if color is not None:
+        style.font.color.rgb = color
+    fmt = style.paragraph_format
+    if align is not None:
+        fmt.alignment = align
+    if space_before is not None:
+        fmt.space_before = Pt(space_before)
+    if space_after is not None:
+        fmt.space_after = Pt(space_after)
+    if line_spacing_rule is not None:
+        fmt.line_spacing_rule = line_spacing_rule
+    if outline_level is not None:
+        pPr = style.element.get_or_add_pPr()
+        get_or_add(pPr, "outlineLvl", PPR_ORDER).set(qn("w:val"), str(outline_level - 1))
+    return style.style_id
+
+
+def block_style(doc, prefix: str, size_pt: float, bold: bool = False, italic: bool = False, **kwargs) -> str:
+    """Estilo por combinacion tamano/negrita/cursiva, p. ej. 'Caratula 14 pt Negrita'."""
+    name = f"{prefix} {size_pt:g} pt" + (" Negrita" if bold else "") + (" Cursiva" if italic else "")
+    return paragraph_style(doc, name, size_pt=size_pt, bold=bold, italic=italic, **kwargs)
+
+
+def styled_paragraph(doc, text: str, style_id: str):
+    """Parrafo que referencia el estilo por id (sin busqueda por nombre en styles.xml)."""
+    p = doc.add_paragraph()
+    p._p.style = style_id
+    if text:
+        p.add_run(text)
+    return p
+
+# -------------------------
+# SALTOS DE PAGINA COMO PROPIEDAD
+# -------------------------
+
+def _is_break_only(p) -> bool:
+    ppr = p.find(qn("w:pPr"))
+    if ppr is not None and len(ppr):
+        return False
+    runs = [child for child in p if child.tag != qn("w:pPr")]
+    if len(runs) != 1 or runs[0].tag != qn("w:r"):
+        return False
+    content = [child for child in runs[0] if child.tag != qn("w:rPr")]
+    return (len(content) == 1 and content[0].tag == qn("w:br")
+            and content[0].get(qn("w:type")) == "page")
+
+
+def page_breaks_to_properties(doc) -> int:
+    """
+    Reemplaza cada parrafo que solo contiene un salto de pagina por pageBreakBefore
+    en el parrafo siguiente. Antes de una tabla o al final del documento se conserva
+    el salto (pageBreakBefore no aplica ahi). Devuelve los saltos convertidos.
+    """
+    body = doc.element.body
+    converted = 0
+    for p in list(body.iterchildren(qn("w:p"))):
+        if not _is_break_only(p):
+            continue
+        nxt = p.getnext()
+        if nxt is None or nxt.tag != qn("w:p"):
+            continue
+        ppr = nxt.get_or_add_pPr()
+        if ppr.find(qn("w:pageBreakBefore")) is not None:
+            continue
+        ppr.pageBreakBefore_val = True
+        body.remove(p)
+        converted += 1
+    return converted
+
+
+def starts_new_page(el) -> bool:
+    """Parrafo que abre pagina: salto explicito o pageBreakBefore."""
+    if el.tag != qn("w:p"):
+        return False
+    if el.find(f"{qn('w:pPr')}/{qn('w:pageBreakBefore')}") is not None:
+        return True
+    return any(br.get(qn("w:type")) == "page" for br in el.iter(qn("w:br")))
@@ -0,0 +1,406 @@
+import argparse
+import io
+import mmap
+import os
+import posixpath
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from lxml import etree
+
+# -------------------------
+# NAMESPACES / TIPOS OPC
+# -------------------------
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+RT_FOOTER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer"
+CT_FOOTER = "application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml"
+
+CONTENT_TYPES = "[Content_Types].xml"
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+STYLES_PART = "word/styles.xml"
+
+
+def w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def rels_path(part_name: str) -> str:
+    folder, name = posixpath.split(part_name)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+
+def resolve_target(part_name: str, target: str) -> str:
+    """Ruta de miembro ZIP de un Target relativo a la parte que lo referencia."""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part_name), target))
+
+# Orden de hijos exigido por el esquema WordprocessingML
+RPR_ORDER = [
+    "rStyle", "rFonts", "b", "bCs", "i", "iCs", "caps", "smallCaps", "strike", "dstrike",
+    "outline", "shadow", "emboss", "imprint", "noProof", "snapToGrid", "vanish", "webHidden",
+    "color", "spacing", "w", "kern", "position", "sz", "szCs", "highlight", "u", "effect",
+    "bdr", "shd", "fitText", "vertAlign", "rtl", "cs", "em", "lang", "eastAsianLayout",
+    "specVanish", "oMath",
+]
+PPR_ORDER = [
+    "pStyle", "keepNext", "keepLines", "pageBreakBefore", "framePr", "widowControl", "numPr",
+    "suppressLineNumbers", "pBdr", "shd", "tabs", "suppressAutoHyphens", "kinsoku", "wordWrap",
+    "overflowPunct", "topLinePunct", "autoSpaceDE", "autoSpaceDN", "bidi", "adjustRightInd",
+    "snapToGrid", "spacing", "ind", "contextualSpacing", "mirrorIndents", "suppressOverlap",
+    "jc", "textDirection", "textAlignment", "textboxTightWrap", "outlineLvl", "divId",
+    "cnfStyle", "rPr", "sectPr", "pPrChange",
+]
+STYLE_ORDER = [
+    "name", "aliases", "basedOn", "next", "link", "autoRedefine", "hidden", "uiPriority",
+    "semiHidden", "unhideWhenUsed", "qFormat", "locked", "personal", "personalCompose",
+    "personalReply", "rsid", "pPr", "rPr", "tblPr", "trPr", "tcPr", "tblStylePr",
+]
+SECTPR_ORDER = [
+    "headerReference", "footerReference", "footnotePr", "endnotePr", "type", "pgSz", "pgMar",
+    "paperSrc", "pgBorders", "lnNumType", "pgNumType", "cols", "formProt", "vAlign",
+    "noEndnote", "titlePg", "textDirection", "bidi", "rtlGutter", "docGrid", "printerSettings",
+    "sectPrChange",
+]
+
+
+def get_or_add(parent, tag: str, order: list):
+    """Devuelve el hijo w:<tag> o lo inserta respetando el orden del esquema."""
+    found = parent.find(w(tag))
+    if found is not None:
+        return found
+    el = etree.Element(w(tag))
+    rank = order.index(tag)
+    for i, child in enumerate(parent):
+        local = etree.QName(child).localname
+        if local in order and order.index(local) > rank:
+            parent.insert(i, el)
+            return el
+    parent.append(el)
+    return el
+
+# -------------------------
+# COPIA CRUDA DE MIEMBROS
+# -------------------------
+
+# Cabecera local ZIP (APPNOTE 4.3.7): firma, versiones, flags, metodo, hora, fecha,
+# CRC, tamanos y largos del nombre y del campo extra
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+LOCAL_SIGNATURE = b"PK\x03\x04"
+# Flags que la copia cruda sabe rehacer: data descriptor (se quita), opciones de
+# deflate y nombre UTF-8. Cifrado u otros bits van por la copia descomprimida.
+RAW_FLAGS = 0x08 | 0x06 | 0x800
+RAW_METHODS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+
+def _raw_copyable(zout: zipfile.ZipFile, info: zipfile.ZipInfo) -> bool:
+    """Sin ZIP64, flags raros ni metodos exoticos; y un ZipFile con la estructura conocida."""
+    return (info.compress_type in RAW_METHODS and not info.flag_bits & ~RAW_FLAGS
+            and max(info.file_size, info.compress_size) < zipfile.ZIP64_LIMIT
+            and isinstance(getattr(zout, "NameToInfo", None), dict) and hasattr(zout, "start_dir"))
+
+
+def copy_member_raw(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo, arcname: str = None):
+    """
+    Copia un miembro con sus bytes comprimidos tal cual (sin inflar ni volver a
+    deflactar). zin y zout no deben tener otros miembros abiertos. Un miembro que
+    no se puede copiar crudo (ZIP64, flags raros) se pasa descomprimido en streaming.
+    """
+    new = zipfile.ZipInfo(arcname or info.filename, info.date_time)
+    new.external_attr = info.external_attr
+    new.create_system = info.create_system
+    if not _raw_copyable(zout, info):
+        new.compress_type = info.compress_type if info.compress_type in RAW_METHODS else zipfile.ZIP_DEFLATED
+        new.file_size = info.file_size
+        with zin.open(info) as src, zout.open(new, "w", force_zip64=info.file_size >= zipfile.ZIP64_LIMIT) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        return new
+
+    src = zin.fp
+    src.seek(info.header_offset)
+    fields = LOCAL_HEADER.unpack(src.read(LOCAL_HEADER.size))
+    if fields[0] != LOCAL_SIGNATURE:
+        raise zipfile.BadZipFile(f"Cabecera local no valida: {info.filename}")
+    name_len, extra_len = fields[-2:]
+    src.seek(info.header_offset + LOCAL_HEADER.size + name_len + extra_len)
+
+    new.compress_type = info.compress_type
+    new.CRC = info.CRC
+    new.compress_size = info.compress_size
+    new.file_size = info.file_size
+    # Sin data descriptor: los tamanos ya van en la cabecera local
+    new.flag_bits = info.flag_bits & ~0x08
+
+    _begin_raw(zout, new)
+    remaining = info.compress_size
+    while remaining:
+        chunk = src.read(min(1 << 20, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Miembro truncado: {info.filename}")
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+    _end_raw(zout, new)
+    return new
+
+
+def _begin_raw(zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    info.header_offset = zout.fp.tell()
+    zout.fp.write(info.FileHeader())
+
+
+def _end_raw(zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """Registra el miembro ya escrito: el directorio central sale de filelist al cerrar."""
+    zout.filelist.append(info)
+    zout.NameToInfo[info.filename] = info
+    zout.start_dir = zout.fp.tell()
+
+class _MappedFile:
+    """Interfaz minima de archivo que zipfile necesita sobre un mmap de solo lectura."""
+
+    def __init__(self, mm):
+        self._mm = mm
+
+    def read(self, n: int = -1) -> bytes:
+        return self._mm.read() if n is None or n < 0 else self._mm.read(n)
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        self._mm.seek(pos, whence)
+        return self._mm.tell()
+
+    def tell(self) -> int:
+        return self._mm.tell()
+
+    def seekable(self) -> bool:
+        return True
+
+
+@contextmanager
+def open_mapped_zip(path: str):
+    """Abre un paquete via mmap: las lecturas salen del page cache sin buffers intermedios."""
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        zf = zipfile.ZipFile(_MappedFile(mm))
+        try:
+            yield zf
+        finally:
+            zf.close()
+
+# -------------------------
+# PARTES PEQUENAS ([Content_Types], .rels)
+# -------------------------
+
+def add_override(ct_root, part_name: str, content_type: str):
+    part_name = "/" + part_name.lstrip("/")
+    for el in ct_root.iter(f"{{{CT_NS}}}Override"):
+        if el.get("PartName") == part_name:
+            el.set("ContentType", content_type)
+            return
+    etree.SubElement(ct_root, f"{{{CT_NS}}}Override", PartName=part_name, ContentType=content_type)
+
+
+def add_default(ct_root, extension: str, content_type: str):
+    extension = extension.lower()
+    for el in ct_root.iter(f"{{{CT_NS}}}Default"):
+        if el.get("Extension", "").lower() == extension:
+            return
+    ct_root.insert(0, etree.Element(f"{{{CT_NS}}}Default", Extension=extension, ContentType=content_type))
+
+
+def next_rel_id(rels_root) -> str:
+    used = {el.get("Id") for el in rels_root}
+    n = len(used) + 1
+    while f"rId{n}" in used:
+        n += 1
+    return f"rId{n}"
+
+
+def add_relationship(rels_root, reltype: str, target: str, external: bool = False) -> str:
+    rid = next_rel_id(rels_root)
+    attrs = {"Id": rid, "Type": reltype, "Target": target}
+    if external:
+        attrs["TargetMode"] = "External"
+    etree.SubElement(rels_root, f"{{{PKG_REL_NS}}}Relationship", **attrs)
+    return rid
+
+
+def to_xml_bytes(root) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+# -------------------------
+# SERIALIZACION (DEFLATE EN PARALELO)
+# -------------------------
+
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+COMPRESSION_LEVELS = {"fast": 1, "balanced": 6, "small": 9}
+# Formatos ya comprimidos: deflactarlos gasta CPU sin reducir tamano
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".jfif", ".wdp", ".mp3", ".mp4", ".zip")
+
+
+def _rel_order(rel) -> tuple:
+    rid = rel.get("Id", "")
+    digits = rid.lstrip("rId")
+    return (0, int(digits), rid) if rid.startswith("rId") and digits.isdigit() else (1, 0, rid)
+
+
+def canonical_part(name: str, data: bytes) -> bytes:
+    """XML re-serializado; .rels por Id numerico y [Content_Types] por extension/parte."""
+    if not name.endswith((".xml", ".rels")):
+        return data
+    root = etree.fromstring(data)
+    if name.endswith(".rels"):
+        root[:] = sorted(root, key=_rel_order)
+    elif name == CONTENT_TYPES:
+        root[:] = sorted(root, key=lambda el: (etree.QName(el).localname,
+                                               el.get("Extension") or el.get("PartName") or ""))
+    return to_xml_bytes(root)
+
+
+def canonical_members(members: list) -> list:
+    """Orden fijo de miembros ([Content_Types] y _rels/.rels primero) con XML canonico."""
+    first = [m for key in (CONTENT_TYPES, "_rels/.rels") for m in members if m[0] == key]
+    rest = sorted((m for m in members if m[0] not in (CONTENT_TYPES, "_rels/.rels")), key=lambda m: m[0])
+    return [(name, canonical_part(name, data)) for name, data in first + rest]
+
+
+def compression_level(compression) -> int:
+    if isinstance(compression, int):
+        return max(0, min(9, compression))
+    if compression not in COMPRESSION_LEVELS:
+        raise ValueError(f"Compresion no valida: {compression} (use {', '.join(COMPRESSION_LEVELS)})")
+    return COMPRESSION_LEVELS[compression]
+
+
+def _prepare_member(level: int, member: tuple) -> tuple:
+    """Corre en un hilo: zlib.crc32 y la compresion liberan el GIL."""
+    name, data = member
+    crc = zlib.crc32(data)
+    if name.lower().endswith(STORED_EXTENSIONS) or level == 0:
+        return name, zipfile.ZIP_STORED, data, crc, len(data)
+    deflater = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = deflater.compress(data) + deflater.flush()
+    return name, zipfile.ZIP_DEFLATED, payload, crc, len(data)
+
+
+def write_package(out, members: list, compression="balanced", jobs: int = None, date_time: tuple = None):
+    """
+    Escribe [(miembro, bytes)] como ZIP en `out` (ruta o archivo). Cada miembro se
+    comprime en un pool de hilos y se escribe ya comprimido, en el orden recibido.
+    """
+    level = compression_level(compression)
+    date_time = date_time or time.localtime()[:6]
+    jobs = jobs or min(8, os.cpu_count() or 1)
+    if jobs > 1 and len(members) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            prepared = list(pool.map(partial(_prepare_member, level), members))
+    else:
+        prepared = [_prepare_member(level, m) for m in members]
+
+    with zipfile.ZipFile(out, "w") as zout:
+        for (_name, data), (name, method, payload, crc, size) in zip(members, prepared):
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = method
+            info.CRC, info.compress_size, info.file_size = crc, len(payload), size
+            info.create_system = 0
+            info.external_attr = 0o644 << 16
+            if not _raw_copyable(zout, info):
+                # ZIP64: zipfile arma las cabeceras extendidas
+                zout.writestr(info, data, compresslevel=level)
+                continue
+            _begin_raw(zout, info)
+            zout.fp.write(payload)
+            _end_raw(zout, info)
+
+# -------------------------
+# AUTOCOMPROBACION
+# -------------------------
+
+class _Unseekable(io.RawIOBase):
+    """Salida sin seek: zipfile escribe data descriptors (bit 0x08), como un ZIP en streaming."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.buffer.write(data)
+
+
+def self_check() -> list:
+    """
+    Ida y vuelta de copy_member_raw y write_package: miembros guardados, deflate,
+    vacios, nombre UTF-8, data descriptor, cabecera local ZIP64 y un metodo que va
+    por la copia descomprimida. Devuelve la lista de fallas (vacia si todo esta bien).
+    """
+    members = {
+        "[Content_Types].xml": b"<Types/>" * 50,
+        "word/media/image1.png": os.urandom(4096),
+        "word/vacio.xml": b"",
+        "word/gráfico.xml": "<t>ñandú</t>".encode("utf-8") * 200,
+        "word/zip64.xml": b"<zip64/>" * 300,
+        "word/bzip2.xml": b"<bz/>" * 300,
+    }
+    stream = _Unseekable()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            info = zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0))
+            info.compress_type = (zipfile.ZIP_STORED if name.endswith(".png") else
+                                  zipfile.ZIP_BZIP2 if "bzip2" in name else zipfile.ZIP_DEFLATED)
+            with zf.open(info, "w", force_zip64="zip64" in name) as dst:
+                dst.write(data)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path, out_path = os.path.join(tmp, "origen.zip"), os.path.join(tmp, "copia.zip")
+        with open(src_path, "wb") as f:
+            f.write(stream.buffer.getvalue())
+        with open_mapped_zip(src_path) as zin, zipfile.ZipFile(out_path, "w") as zout:
+            for info in zin.infolist():
+                arcname = "word/media/est_image1.png" if info.filename.endswith(".png") else None
+                copy_member_raw(zin, zout, info, arcname=arcname)
+        expected = {("word/media/est_image1.png" if n.endswith(".png") else n): d for n, d in members.items()}
+        try:
+            with zipfile.ZipFile(out_path) as zf:
+                got = {info.filename: zf.read(info) for info in zf.infolist()}
+                if got != expected:
+                    failures.append(f"copy_member_raw: miembros distintos {sorted(set(got) ^ set(expected))}")
+                if any(info.flag_bits & 0x08 for info in zf.infolist()):
+                    failures.append("copy_member_raw: quedo un data descriptor en la copia")
+        except (zipfile.BadZipFile, zlib.error) as exc:
+            failures.append(f"copy_member_raw: la copia no se puede leer ({exc})")
+
+        out = io.BytesIO()
+        write_package(out, list(members.items()), jobs=2)
+        with zipfile.ZipFile(out) as zf:
+            if zf.testzip() is not None or {i.filename: zf.read(i) for i in zf.infolist()} != members:
+                failures.append("write_package: el paquete no reproduce sus miembros")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades de paquete DOCX (ZIP/OPC)")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Ida y vuelta de la copia cruda de miembros y de write_package")
+    args = parser.parse_args()
+    if not args.self_check:
+        parser.error("Indique --self-check")
+    failures = self_check()
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if failures:
+        sys.exit(1)
+    print("[OK] Copia cruda y escritura de paquetes reproducen todos los miembros")
@@ -0,0 +1,266 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Cm, Emu
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    # Imagen que Pillow no reconoce o que pasa el limite de pixeles: culpa del archivo subido
+    IMAGE_ERRORS = (Image.DecompressionBombError, UnidentifiedImageError)
+except ImportError:
+    Image = None
+    IMAGE_ERRORS = ()
+
+from base_package import save_document
+from docx_package import COMPRESSION_LEVELS
+from format_rules import PAGE_A4_CM, UNAC_MARGINS_CM
+from templates import load_template, normalize_text, resolve_key, template_headings
+from toc import render_tocs
+from unac_logging import get_logger, setup_logging
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+LOSSLESS_EXTENSIONS = (".png", ".gif", ".bmp", ".tif", ".tiff")
+MANIFEST_NAMES = ("leyendas.json", "captions.json", "leyendas.csv", "captions.csv")
+TEXT_WIDTH_CM = PAGE_A4_CM[0] - UNAC_MARGINS_CM["left"] - UNAC_MARGINS_CM["right"]
+FIGURE_DPI = 200
+JPEG_QUALITY = 85
+SEQ_RE = re.compile(r"^\s*SEQ\s+(\S+)")
+# Normalizaciones en paralelo a la vez en este proceso: en el servidor, los pedidos
+# simultaneos esperan su turno en lugar de abrir cada uno jobs procesos mas
+NORMALIZE_SLOTS = threading.BoundedSemaphore(max(1, int(os.environ.get("UNAC_FIGURE_SLOTS", 1))))
+
+log = get_logger("figures")
+
+# -------------------------
+# LEYENDAS CON CAMPO SEQ
+# -------------------------
+
+def add_caption(paragraph, label: str, number: int, text: str = ""):
+    """'Figura N. texto' con N como campo SEQ, para que TOC \\c "Figura" lo recoja."""
+    paragraph.style = "Caption"
+    paragraph.add_run(f"{label} ")
+    fld = OxmlElement("w:fldSimple")
+    fld.set(qn("w:instr"), f" SEQ {label} \\* ARABIC ")
+    run = OxmlElement("w:r")
+    t = OxmlElement("w:t")
+    t.text = str(number)
+    run.append(t)
+    fld.append(run)
+    paragraph._p.append(fld)
+    if text:
+        paragraph.add_run(f". {text}")
+    return paragraph
+
+
+def renumber_captions(doc) -> dict:
+    """Ajusta en orden de documento el numero visible de cada campo SEQ; devuelve {rotulo: total}."""
+    counters = {}
+    for fld in doc.element.body.iter(qn("w:fldSimple")):
+        m = SEQ_RE.match(fld.get(qn("w:instr"), ""))
+        if not m:
+            continue
+        label = m.group(1)
+        counters[label] = counters.get(label, 0) + 1
+        texts = list(fld.iter(qn("w:t")))
+        if texts:
+            texts[0].text = str(counters[label])
+    return counters
+
+# -------------------------
+# NORMALIZACION DE IMAGENES (PROCESS POOL)
+# -------------------------
+
+def _read_source(source: tuple) -> bytes:
+    kind, container, name = source
+    if kind == "zip":
+        with zipfile.ZipFile(container) as zf:
+            return zf.read(name)
+    with open(os.path.join(container, name), "rb") as f:
+        return f.read()
+
+
+def normalize_image(source: tuple, max_width_px: int) -> dict:
+    """
+    Corre en un worker: lee la imagen, corrige la orientacion EXIF, reduce al ancho
+    de pagina y la recomprime sin metadatos (PNG para graficos, JPEG para fotos).
+    """
+    data = _read_source(source)
+    if Image is None:
+        return {"data": data, "width_px": None, "dpi": FIGURE_DPI}
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG: decodifica ya reducido (escalado DCT) en lugar de inflar la foto completa
+        img.draft("RGB", (max_width_px, max_width_px))
+        img = ImageOps.exif_transpose(img)
+        if img.width > max_width_px:
+            img.thumbnail((max_width_px, img.height), Image.LANCZOS, reducing_gap=2.0)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        out = io.BytesIO()
+        # Graficos y capturas sin perdida siguen en PNG; las fotos pasan a JPEG
+        if has_alpha or source[2].lower().endswith(LOSSLESS_EXTENSIONS):
+            img.save(out, "PNG", compress_level=6, dpi=(FIGURE_DPI, FIGURE_DPI))
+        else:
+            img.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, dpi=(FIGURE_DPI, FIGURE_DPI))
+        return {"data": out.getvalue(), "width_px": img.width, "dpi": FIGURE_DPI}
+
+
+def normalize_all(sources: list, jobs: int) -> list:
+    max_width_px = int(TEXT_WIDTH_CM / 2.54 * FIGURE_DPI)
+    if Image is None:
+        log.warning("Pillow no instalado; las figuras se insertan sin normalizar.")
+    if jobs <= 1 or len(sources) < 2:
+        return [normalize_image(src, max_width_px) for src in sources]
+    with NORMALIZE_SLOTS, ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(normalize_image, sources, [max_width_px] * len(sources), chunksize=4))
+
+# -------------------------
+# LOTE DE FIGURAS (CARPETA O ZIP)
+# -------------------------
+
+def _caption_from_name(name: str) -> str:
+    stem = os.path.splitext(os.path.basename(name))[0]
+    stem = re.sub(r"^\d+[\s._-]*", "", stem)
+    return stem.replace("_", " ").replace("-", " ").strip().capitalize()
+
+
+def _parse_manifest(name: str, data: bytes) -> dict:
+    """{archivo: {"leyenda", "seccion", "fuente"}} desde leyendas.json o leyendas.csv."""
+    text = data.decode("utf-8-sig")
+    if name.endswith(".json"):
+        raw = json.loads(text)
+        items = raw if isinstance(raw, list) else [dict(v, archivo=k) if isinstance(v, dict)
+                                                   else {"archivo": k, "leyenda": v} for k, v in raw.items()]
+    else:
+        items = list(csv.DictReader(io.StringIO(text)))
+    return {os.path.basename(item["archivo"]): item for item in items if item.get("archivo")}
+
+
+def collect_figures(path: str) -> list:
+    """Lista ordenada de figuras [{source, leyenda, seccion, fuente}] de una carpeta o ZIP."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [n for n in zf.namelist() if not n.endswith("/")]
+            manifest_name = next((n for n in names if os.path.basename(n).lower() in MANIFEST_NAMES), None)
+            manifest = _parse_manifest(manifest_name.lower(), zf.read(manifest_name)) if manifest_name else {}
+        sources = [("zip", path, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+    elif os.path.isdir(path):
+        names = sorted(os.listdir(path))
+        manifest_name = next((n for n in names if n.lower() in MANIFEST_NAMES), None)
+        manifest = {}
+        if manifest_name:
+            with open(os.path.join(path, manifest_name), "rb") as f:
+                manifest = _parse_manifest(manifest_name.lower(), f.read())
+        sources = [("dir", path, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+    else:
+        raise ValueError(f"Se esperaba una carpeta o un ZIP de figuras: {path}")
+
+    order = list(manifest)
+    figures = []
+    for source in sources:
+        meta = manifest.get(os.path.basename(source[2]), {})
+        figures.append({
+            "source": source,
+            "leyenda": meta.get("leyenda") or _caption_from_name(source[2]),
+            "seccion": meta.get("seccion", ""),
+            "fuente": meta.get("fuente", ""),
+        })
+    # El manifiesto manda el orden; el resto va por nombre de archivo
+    rank = {name: i for i, name in enumerate(order)}
+    figures.sort(key=lambda f: (rank.get(os.path.basename(f["source"][2]), len(rank)), f["source"][2]))
+    return figures
+
+# -------------------------
+# INSERCION EN EL DOCUMENTO
+# -------------------------
+
+def _default_section(fmt_type: str, cfg: dict) -> str:
+    return next((text for _level, text in template_headings(fmt_type, cfg)
+                 if normalize_text(text).lstrip("ivx. ").startswith("anexo")), "")
+
+
+def insert_figures(doc, figures: list, fmt_type: str, cfg: dict, jobs: int = 1) -> dict:
+    from markdown_ingest import BodyWriter
+
+    t0 = time.perf_counter()
+    images = normalize_all([f["source"] for f in figures], jobs)
+    t_norm = time.perf_counter() - t0
+
+    writer = BodyWriter(doc, fmt_type, cfg)
+    default_section = _default_section(fmt_type, cfg)
+    current, placed = None, 0
+    for number, (fig, img) in enumerate(zip(figures, images), start=1):
+        section = fig["seccion"] or default_section
+        if section != current:
+            current = section
+            if not (section and writer.open_anchor(section, reopen=True)):
+                log.warning("Seccion no encontrada para figuras: %s; van al final", section or "(sin anexos)")
+                writer.stop = doc.element.body.find(qn("w:sectPr"))
+
+        cap = add_caption(writer.paragraph(), "Figura", number, fig["leyenda"])
+        cap.paragraph_format.keep_with_next = True
+        p = writer.paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        width = Cm(TEXT_WIDTH_CM)
+        if img["width_px"]:
+            width = min(width, Emu(int(img["width_px"] / img["dpi"] * 914400)))
+        p.add_run().add_picture(io.BytesIO(img["data"]), width=width)
+        if fig["fuente"]:
+            writer.paragraph(f"Fuente: {fig['fuente']}")
+        placed += 1
+
+    counters = renumber_captions(doc)
+    render_tocs(doc)
+    return {
+        "figures": placed,
+        "normalize_s": round(t_norm, 2),
+        "bytes_out": sum(len(img["data"]) for img in images),
+        "captions": counters,
+    }
+
+
+def build_with_figures(fmt_type: str, sub_type: str, figures_path: str, output_path: str, jobs: int = 1,
+                       compression: str = "balanced") -> dict:
+    from markdown_ingest import render_template
+
+    fmt_type, sub_type = resolve_key(fmt_type, sub_type)
+    figures = collect_figures(figures_path)
+    # Plantilla intermedia: se vuelve a abrir enseguida, no vale la pena comprimirla mas
+    render_template(fmt_type, sub_type, output_path, compression="fast")
+    doc = Document(output_path)
+    stats = insert_figures(doc, figures, fmt_type, load_template(fmt_type, sub_type), jobs=jobs)
+    save_document(doc, output_path, compression=compression)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inserta un lote de figuras con leyendas numeradas en una plantilla UNAC")
+    parser.add_argument("figuras", help="Carpeta o ZIP con imagenes (y opcionalmente leyendas.json / leyendas.csv)")
+    parser.add_argument("salida", help="DOCX de salida")
+    parser.add_argument("--format", default="informe", help="proyecto | informe | maestria")
+    parser.add_argument("--sub-type", default="cuant", help="cuant | cual")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Procesos para normalizar imagenes")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_LEVELS), default="balanced",
+                        help="Nivel de deflate del DOCX (las imagenes se guardan sin recomprimir)")
+    args = parser.parse_args()
+    setup_logging()
+
+    t0 = time.perf_counter()
+    try:
+        stats = build_with_figures(args.format, args.sub_type, args.figuras, args.salida, jobs=max(1, args.jobs),
+                                   compression=args.compression)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile, *IMAGE_ERRORS) as exc:
+        print(f"[ERROR] No se pudieron insertar las figuras: {exc}")
+        sys.exit(1)
+    print(f"[OK] {stats['figures']} figuras insertadas en {time.perf_counter() - t0:.2f}s "
+          f"(normalizacion {stats['normalize_s']}s, {stats['bytes_out'] // 1024} KB de imagenes)")
@@ -0,0 +1,304 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+from lxml import etree
+
+from docx_package import DOCUMENT_PART, STYLES_PART, w
+from format_rules import PAGE_A4_CM, format_rules
+from templates import load_template, normalize_text, resolve_template_id, template_headings
+from unac_logging import setup_logging
+
+TWIPS_PER_CM = 1440 / 2.54
+MARGIN_TOLERANCE_CM = 0.1
+HEADING_NAME_RE = re.compile(r"^heading (\d)$")
+NUMBERING_RE = re.compile(r"^(?:cap(?:itulo|\.)\s+)?(?:[ivxlcdm]+|\d+(?:\.\d+)*)[.):-]?\s+")
+PARENS_RE = re.compile(r"\s*\(.*?\)\s*")
+
+
+def heading_key(text: str) -> str:
+    """Texto comparable de un titulo: sin tildes, numeracion ni notas entre parentesis."""
+    text = normalize_text(PARENS_RE.sub(" ", text))
+    return NUMBERING_RE.sub("", text).strip(" .:")
+
+
+def _check(check_id: str, ok: bool, message: str, severity: str = "error", **details) -> dict:
+    return {"id": check_id, "ok": ok, "severity": severity, "message": message, "details": details}
+
+# -------------------------
+# STYLES.XML
+# -------------------------
+
+def read_styles(zf: zipfile.ZipFile, style_levels: dict = None) -> dict:
+    """
+    Fuente del estilo Normal y estilos de titulo {styleId: nivel}: "Heading N", un
+    w:outlineLvl en el estilo o, por nombre, style_levels (estilos propios de la
+    familia en format_rules.HEADING_STYLES).
+    """
+    by_name = {name.lower(): level for name, level in (style_levels or {}).items()}
+    info = {"heading_ids": {}, "normal_font": None, "normal_size_pt": None, "default_font": None}
+    if STYLES_PART not in zf.namelist():
+        return info
+    with zf.open(STYLES_PART) as src:
+        for _event, el in etree.iterparse(src, tag=(w("style"), w("rPrDefault"))):
+            if el.tag == w("rPrDefault"):
+                fonts = el.find(f"{w('rPr')}/{w('rFonts')}")
+                if fonts is not None:
+                    info["default_font"] = fonts.get(w("ascii"))
+                continue
+            if el.get(w("type")) != "paragraph":
+                el.clear()
+                continue
+            name_el = el.find(w("name"))
+            name = (name_el.get(w("val")) if name_el is not None else "").lower()
+            style_id = el.get(w("styleId"))
+            if style_id == "Normal" or name == "normal":
+                fonts = el.find(f"{w('rPr')}/{w('rFonts')}")
+                size = el.find(f"{w('rPr')}/{w('sz')}")
+                info["normal_font"] = fonts.get(w("ascii")) if fonts is not None else None
+                info["normal_size_pt"] = int(size.get(w("val"))) / 2 if size is not None else None
+            m = HEADING_NAME_RE.match(name)
+            outline = el.find(f"{w('pPr')}/{w('outlineLvl')}")
+            if m:
+                info["heading_ids"][style_id] = int(m.group(1))
+            elif outline is not None and outline.get(w("val"), "").isdigit() and int(outline.get(w("val"))) < 9:
+                # outlineLvl 9 es "texto independiente"
+                info["heading_ids"][style_id] = int(outline.get(w("val"))) + 1
+            elif name in by_name:
+                info["heading_ids"][style_id] = by_name[name]
+            el.clear()
+    return info
+
+# -------------------------
+# DOCUMENT.XML EN STREAMING
+# -------------------------
+
+def scan_document(zf: zipfile.ZipFile, heading_ids: dict) -> dict:
+    scan = {"sections": [], "headings": [], "fields": [], "paragraphs": 0, "run_fonts": {}}
+    with zf.open(DOCUMENT_PART) as src:
+        for _event, el in etree.iterparse(src, tag=(w("p"), w("sectPr")), huge_tree=True):
+            if el.tag == w("sectPr"):
+                mar, sz = el.find(w("pgMar")), el.find(w("pgSz"))
+                scan["sections"].append({
+                    "margins_cm": {side: round(int(mar.get(w(side), 0)) / TWIPS_PER_CM, 2)
+                                   for side in ("left", "right", "top", "bottom")} if mar is not None else None,
+                    "page_cm": (round(int(sz.get(w("w"), 0)) / TWIPS_PER_CM, 2),
+                                round(int(sz.get(w("h"), 0)) / TWIPS_PER_CM, 2)) if sz is not None else None,
+                })
+                continue
+
+            scan["paragraphs"] += 1
+            for fld in el.iter(w("fldSimple")):
+                scan["fields"].append(fld.get(w("instr"), ""))
+            instr = "".join(t.text or "" for t in el.iter(w("instrText")))
+            if instr.strip():
+                scan["fields"].append(instr)
+            for fonts in el.iter(w("rFonts")):
+                name = fonts.get(w("ascii"))
+                if name and fonts.getparent().getparent().tag == w("r"):
+                    scan["run_fonts"][name] = scan["run_fonts"].get(name, 0) + 1
+
+            pstyle = el.find(f"{w('pPr')}/{w('pStyle')}")
+            level = heading_ids.get(pstyle.get(w("val"))) if pstyle is not None else None
+            if level:
+                text = "".join(t.text or "" for t in el.iter(w("t"))).strip()
+                if text:
+                    scan["headings"].append((level, text))
+
+            el.clear()
+            parent = el.getparent()
+            if parent is not None and parent.tag == w("body"):
+                while el.getprevious() is not None:
+                    del parent[0]
+    return scan
+
+# -------------------------
+# REGLAS
+# -------------------------
+
+def is_a4(page_cm) -> bool:
+    if not page_cm:
+        return False
+    short, long = sorted(page_cm)
+    return (abs(short - PAGE_A4_CM[0]) <= MARGIN_TOLERANCE_CM
+            and abs(long - PAGE_A4_CM[1]) <= MARGIN_TOLERANCE_CM)
+
+
+def expected_fields(fmt_type: str, cfg: dict) -> dict:
+    if fmt_type == "maestria":
+        return {
+            "toc": True,
+            "tablas": bool(cfg.get("include_list_of_tables", False)),
+            "figuras": bool(cfg.get("include_list_of_figures", False)),
+        }
+    if fmt_type == "informe":
+        # El generador prerenderiza solo el indice de contenido
+        return {"toc": "contenido" in cfg.get("preliminares", {}).get("indices", {}),
+                "tablas": False, "figuras": False}
+    return {"toc": False, "tablas": False, "figuras": False}
+
+
+def check_headings(expected: list, found: list) -> dict:
+    found_keys = [heading_key(text) for _level, text in found]
+    missing, out_of_order, pos = [], [], 0
+    for text in expected:
+        key = heading_key(text)
+        if not key:
+            continue
+        match = lambda fk: fk and (fk == key or fk.startswith(key) or key.startswith(fk))
+        idx = next((i for i in range(pos, len(found_keys)) if match(found_keys[i])), None)
+        if idx is not None:
+            pos = idx + 1
+        elif any(match(fk) for fk in found_keys[:pos]):
+            out_of_order.append(text)
+        else:
+            missing.append(text)
+    return {"missing": missing, "out_of_order": out_of_order}
+
+
+def check_docx(source, fmt_type: str, sub_type: str) -> dict:
+    """Valida un DOCX (ruta o stream seekable) contra una plantilla; devuelve un reporte."""
+    t0 = time.perf_counter()
+    cfg = load_template(fmt_type, sub_type)
+    rules = format_rules(fmt_type, cfg)
+
+    with zipfile.ZipFile(source) as zf:
+        styles = read_styles(zf, rules.get("heading_styles"))
+        scan = scan_document(zf, styles["heading_ids"])
+
+    checks = []
+
+    bad_margins = [
+        {"section": i + 1, "margins_cm": sec["margins_cm"]}
+        for i, sec in enumerate(scan["sections"])
+        if sec["margins_cm"] is None or any(
+            abs(sec["margins_cm"][side] - value) > MARGIN_TOLERANCE_CM
+            for side, value in rules["margins_cm"].items())
+    ]
+    checks.append(_check(
+        "margins", not bad_margins,
+        "Margenes conformes" if not bad_margins else f"{len(bad_margins)} seccion(es) con margenes distintos",
+        expected_cm=rules["margins_cm"], sections=bad_margins,
+    ))
+
+    bad_pages = [i + 1 for i, sec in enumerate(scan["sections"]) if not is_a4(sec["page_cm"])]
+    checks.append(_check("page_size", not bad_pages,
+                         "Tamano A4" if not bad_pages else "Secciones que no son A4", sections=bad_pages))
+
+    font = styles["normal_font"] or styles["default_font"]
+    font_ok = font == rules["font_name"]
+    size_ok = styles["normal_size_pt"] is not None and abs(styles["normal_size_pt"] - rules["font_size_pt"]) < 0.1
+    checks.append(_check(
+        "font", font_ok and size_ok,
+        f"Estilo Normal: {font} {styles['normal_size_pt']} pt "
+        f"(esperado {rules['font_name']} {rules['font_size_pt']:g} pt)",
+        font=font, size_pt=styles["normal_size_pt"],
+    ))
+
+    foreign = {name: n for name, n in scan["run_fonts"].items() if name != rules["font_name"]}
+    checks.append(_check(
+        "direct_fonts", not foreign,
+        "Sin fuentes ajenas en el texto" if not foreign else "Hay texto con fuentes distintas a la plantilla",
+        severity="warning", fonts=foreign,
+    ))
+
+    expected = [text for level, text in template_headings(fmt_type, cfg) if level == 1]
+    result = check_headings(expected, scan["headings"])
+    headings_ok = not result["missing"] and not result["out_of_order"]
+    checks.append(_check(
+        "headings", headings_ok,
+        "Titulos completos y en orden" if headings_ok else
+        f"{len(result['missing'])} titulo(s) faltante(s), {len(result['out_of_order'])} fuera de orden",
+        **result,
+    ))
+
+    fields = " | ".join(scan["fields"])
+    wanted = expected_fields(fmt_type, cfg)
+    has_toc = any("TOC" in f and "\\o" in f for f in scan["fields"])
+    for check_id, required, present, label in [
+        ("toc", wanted["toc"], has_toc, "Indice de contenido (campo TOC)"),
+        ("list_of_tables", wanted["tablas"], '"Tabla"' in fields, "Indice de tablas"),
+        ("list_of_figures", wanted["figuras"], '"Figura"' in fields, "Indice de figuras"),
+    ]:
+        if required:
+            checks.append(_check(check_id, present, f"{label}: {'presente' if present else 'no encontrado'}"))
+
+    errors = sum(1 for c in checks if not c["ok"] and c["severity"] == "error")
+    warnings = sum(1 for c in checks if not c["ok"] and c["severity"] == "warning")
+    return {
+        "ok": errors == 0,
+        "template": f"{fmt_type}/{sub_type}",
+        "summary": {"errors": errors, "warnings": warnings},
+        "checks": checks,
+        "stats": {
+            "paragraphs": scan["paragraphs"],
+            "headings": len(scan["headings"]),
+            "sections": len(scan["sections"]),
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        },
+    }
+
+
+def self_check() -> list:
+    """
+    Regresion: cada plantilla recien generada debe pasar su propio validador sin
+    ningun hallazgo (ni errores ni avisos). Devuelve [(plantilla, checks fallidos)].
+    """
+    from markdown_ingest import render_template
+    from templates import iter_templates
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt_type, sub_type, _path in iter_templates():
+            path = os.path.join(tmp, f"{fmt_type}_{sub_type}.docx")
+            render_template(fmt_type, sub_type, path)
+            report = check_docx(path, fmt_type, sub_type)
+            failed = [f"{c['id']}: {c['message']}" for c in report["checks"] if not c["ok"]]
+            if failed:
+                failures.append((f"{fmt_type}/{sub_type}", failed))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Valida una tesis DOCX contra una plantilla UNAC")
+    parser.add_argument("docx", nargs="*", help="Archivo(s) DOCX a validar")
+    parser.add_argument("--template", help="Ej.: maestria/cuant o unac_maestria_cuant")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Genera cada plantilla y verifica que pase el validador sin hallazgos")
+    args = parser.parse_args()
+
+    if args.self_check:
+        # Solo avisos: las lineas de cada documento generado no aportan aqui
+        setup_logging(level=logging.WARNING)
+        failures = self_check()
+        for key, failed in failures:
+            print(f"[ERROR] {key}: " + "; ".join(failed))
+        if failures:
+            sys.exit(1)
+        print("[OK] Todas las plantillas generadas pasan el validador")
+        sys.exit(0)
+    if not args.docx or not args.template:
+        parser.error("Indique los DOCX y --template (o --self-check)")
+
+    try:
+        fmt_type, sub_type = resolve_template_id(args.template)
+    except ValueError as exc:
+        print(f"[ERROR] {exc}")
+        sys.exit(2)
+
+    failed = 0
+    for path in args.docx:
+        try:
+            report = check_docx(path, fmt_type, sub_type)
+        except (OSError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError) as exc:
+            report = {"ok": False, "error": f"No se pudo leer el DOCX: {exc}"}
+        report["file"] = path
+        failed += 0 if report["ok"] else 1
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,69 @@
+# -------------------------
+# REGLAS DE FORMATO UNAC
+# -------------------------
+# Fuente unica de margenes, fuentes y titulos que aplican los generadores
+# (set_page_setup, configurar_formato_unac, aplicar_estilos_base) y que
+# reutilizan el restyler y el validador de tesis.
+
+PAGE_A4_CM = (21.0, 29.7)
+
+UNAC_MARGINS_CM = {"left": 3.5, "right": 2.5, "top": 3.0, "bottom": 3.0}
+
+# (nivel, tamano_pt, negrita) de los estilos "Heading N"
+HEADING_RULES = [
+    (1, 14, True), (2, 12, True), (3, 12, False), (4, 12, True), (5, 12, False),
+]
+
+# Estilos propios que cuentan como titulo (nivel de esquema); maestria e informe usan "Heading N"
+HEADING_STYLES = {
+    "proyecto": {"Titulo Pagina": 1, "Titulo Indice": 1, "Titulo Capitulo": 1, "Subtitulo Seccion": 2},
+}
+
+# Texto que dejan los generadores donde va el contenido del estudiante
+PLACEHOLDER = "{{COMPLETAR}}"
+
+PAGE_NUMBER_RULE = {"font": "Arial", "size_pt": 10, "align": "right"}
+
+
+def format_rules(fmt_type: str, cfg: dict) -> dict:
+    """Reglas efectivas de una plantilla segun la familia de su generador."""
+    if fmt_type == "maestria":
+        page_setup = cfg.get("page_setup", {})
+        margins = page_setup.get("margins_cm", {})
+        font_cfg = page_setup.get("font", {})
+        return {
+            "margins_cm": {k: float(margins.get(k, v)) for k, v in UNAC_MARGINS_CM.items()},
+            "font_name": font_cfg.get("name", "Arial"),
+            "font_size_pt": float(font_cfg.get("size_pt", 12)),
+            "line_spacing": None,
+            "headings": HEADING_RULES,
+        }
+
+    if fmt_type == "proyecto":
+        conf = cfg.get("configuracion", {})
+        return {
+            "margins_cm": dict(UNAC_MARGINS_CM),
+            "font_name": conf.get("fuente_normal", "Arial"),
+            "font_size_pt": float(conf.get("tamano_normal", 11)),
+            "line_spacing": 1.5,
+            "headings": HEADING_RULES,
+            "heading_styles": HEADING_STYLES["proyecto"],
+        }
+
+    # informe: configurar_formato_unac + agregar_titulo_formal (14 pt negrita)
+    return {
+        "margins_cm": dict(UNAC_MARGINS_CM),
+        "font_name": "Arial",
+        "font_size_pt": 12.0,
+        "line_spacing": 1.5,
+        "headings": HEADING_RULES,
+    }
+
+
+def citation_style(fmt_type: str, cfg: dict) -> str:
+    """Estilo de referencias exigido por la plantilla (APA por defecto)."""
+    if fmt_type == "informe":
+        return cfg.get("finales", {}).get("referencias", {}).get("estilo", "apa")
+    if fmt_type == "proyecto":
+        return cfg.get("configuracion", {}).get("estilo_citas", "apa")
+    return cfg.get("citation_style", "apa")
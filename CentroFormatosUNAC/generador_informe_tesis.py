@@ -3,17 +3,37 @@ import os
 import platform
 import subprocess
 import sys
-from docx import Document
 from docx.shared import Cm, Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 
+from base_package import new_document, save_document
+from doc_styles import block_style, page_breaks_to_properties, paragraph_style, set_style_font, styled_paragraph
+from format_rules import PAGE_A4_CM, UNAC_MARGINS_CM
+from generator_cli import parse_generator_args
+from parallel_render import incremental, render_parallel
+from progress import step as progress_step
+from schemas import check_template
+from template_bundle import cached_template, open_asset
+from toc import add_toc_field, render_tocs, toc_instr
+from unac_logging import get_logger
+from watch import watch_template
+from weight_report import build_section, collect_timings, emit_report
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FORMATS_DIR = os.path.join(BASE_DIR, "formats")
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 
+log = get_logger("generador_informe_tesis")
+
 def cargar_contenido(path_archivo):
+    if isinstance(path_archivo, dict):
+        # Contenido ya cargado (generacion masiva con campos reemplazados)
+        return path_archivo
+    data = cached_template(path_archivo)
+    if data is not None:
+        return data
     if not os.path.exists(path_archivo):
         nombre = os.path.basename(path_archivo)
         path_archivo = os.path.join(FORMATS_DIR, nombre)
@@ -22,46 +42,46 @@ def cargar_contenido(path_archivo):
         raise FileNotFoundError(f"No se encontro el JSON: {path_archivo}")
 
     with open(path_archivo, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        data = json.load(f)
+    check_template("informe", data, path_archivo)
+    return data
 
 def configurar_formato_unac(doc):
     for section in doc.sections:
-        section.page_width = Cm(21.0); section.page_height = Cm(29.7)
-        section.left_margin = Cm(3.5); section.right_margin = Cm(2.5)
-        section.top_margin = Cm(3.0); section.bottom_margin = Cm(3.0)
+        section.page_width = Cm(PAGE_A4_CM[0]); section.page_height = Cm(PAGE_A4_CM[1])
+        section.left_margin = Cm(UNAC_MARGINS_CM["left"]); section.right_margin = Cm(UNAC_MARGINS_CM["right"])
+        section.top_margin = Cm(UNAC_MARGINS_CM["top"]); section.bottom_margin = Cm(UNAC_MARGINS_CM["bottom"])
 
     style = doc.styles['Normal']
     style.font.name = 'Arial'; style.font.size = Pt(12)
     style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.ONE_POINT_FIVE
     style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
+    # Titulo formal y capitulos: Heading 1 (lo usan el TOC y el validador) con el formato UNAC
+    h1 = doc.styles['Heading 1']
+    set_style_font(h1, 'Arial'); h1.font.size = Pt(14); h1.font.bold = True
+    h1.font.color.rgb = RGBColor(0, 0, 0)
+    h1.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    h1.paragraph_format.space_before = Pt(0); h1.paragraph_format.space_after = Pt(12)
+
 def agregar_bloque(doc, texto, negrita=False, tamano=12, antes=0, despues=0, cursiva=False):
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE 
-    p.paragraph_format.space_before = Pt(antes)
-    p.paragraph_format.space_after = Pt(despues)
-    run = p.add_run(texto)
-    run.bold = negrita; run.italic = cursiva; run.font.size = Pt(tamano)
+    estilo = block_style(doc, 'Caratula', tamano, negrita, cursiva, align=WD_ALIGN_PARAGRAPH.CENTER,
+                         space_before=0, space_after=0, line_spacing_rule=WD_LINE_SPACING.SINGLE)
+    p = styled_paragraph(doc, texto, estilo)
+    if antes: p.paragraph_format.space_before = Pt(antes)
+    if despues: p.paragraph_format.space_after = Pt(despues)
     return p
 
 def agregar_titulo_formal(doc, texto, espaciado_antes=0):
-    h = doc.add_heading(level=1)
-    h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = h.add_run(texto)
-    run.font.name = 'Arial'; run.font.size = Pt(14); run.bold = True
-    run.font.color.rgb = RGBColor(0, 0, 0)
-    h.paragraph_format.space_before = Pt(espaciado_antes)
-    h.paragraph_format.space_after = Pt(12)
+    h = styled_paragraph(doc, texto, 'Heading1')
+    if espaciado_antes: h.paragraph_format.space_before = Pt(espaciado_antes)
+    return h
 
 def agregar_nota_guia(doc, texto):
     if not texto: return
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-    run = p.add_run(f"Nota: {texto}")
-    run.font.name = 'Arial'; run.font.size = Pt(10); run.italic = True
-    run.font.color.rgb = RGBColor(89, 89, 89) 
-    p.paragraph_format.space_after = Pt(12)
+    estilo = paragraph_style(doc, 'Nota Guia', size_pt=10, italic=True, color=RGBColor(89, 89, 89),
+                             align=WD_ALIGN_PARAGRAPH.JUSTIFY, space_after=12)
+    styled_paragraph(doc, f"Nota: {texto}", estilo)
 
 def crear_caratula_dinamica(doc, data):
     c = data['caratula']
@@ -69,11 +89,11 @@ def crear_caratula_dinamica(doc, data):
     agregar_bloque(doc, c['facultad'], negrita=True, tamano=14, despues=4)
     agregar_bloque(doc, c['escuela'], negrita=True, tamano=14, despues=25)
 
-    ruta_logo = os.path.join(ASSETS_DIR, "LogoUNAC.png")
-    if os.path.exists(ruta_logo):
+    logo = open_asset(os.path.join(ASSETS_DIR, "LogoUNAC.png"))
+    if logo is not None:
         p_logo = doc.add_paragraph()
         p_logo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_logo.add_run().add_picture(ruta_logo, width=Inches(3.2))
+        p_logo.add_run().add_picture(logo, width=Inches(3.2))
     else:
         agregar_bloque(doc, "[LOGO INSTITUCIONAL]", tamano=10, antes=40, despues=40)
 
@@ -92,34 +112,30 @@ def agregar_preliminares_dinamico(doc, data):
     doc.add_paragraph(); doc.add_page_break() 
     if 'dedicatoria' in p:
         agregar_titulo_formal(doc, p['dedicatoria']['titulo'])
-        doc.add_paragraph(p['dedicatoria']['texto']).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        doc.add_paragraph(p['dedicatoria']['texto'])
         doc.add_page_break()
     if 'resumen' in p:
         agregar_titulo_formal(doc, p['resumen']['titulo'])
-        doc.add_paragraph(p['resumen']['texto']).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        doc.add_paragraph(p['resumen']['texto'])
         doc.add_page_break()
     idx = p['indices']
     agregar_titulo_formal(doc, idx['contenido'])
-    doc.add_paragraph("(Generar Indice Automatico)").alignment = WD_ALIGN_PARAGRAPH.CENTER
+    add_toc_field(doc.add_paragraph(), toc_instr())
     doc.add_page_break()
     if 'introduccion' in p:
         agregar_titulo_formal(doc, p['introduccion']['titulo'])
-        doc.add_paragraph(p['introduccion']['texto']).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        doc.add_paragraph(p['introduccion']['texto'])
         doc.add_page_break()
 
 def agregar_cuerpo_dinamico(doc, data):
-    for cap in data['cuerpo']:
-        h = doc.add_heading(level=1)
-        h.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = h.add_run(cap['titulo'])
-        run.font.name = 'Arial'; run.font.size = Pt(14); run.bold = True
-        run.font.color.rgb = RGBColor(0, 0, 0)
+    estilo_sub = paragraph_style(doc, 'Subtitulo Guia', bold=True)
+    for k, cap in enumerate(data['cuerpo'], start=1):
+        progress_step("structure", k, len(data['cuerpo']))
+        h = styled_paragraph(doc, cap['titulo'], 'Heading1')
         h.paragraph_format.space_before = Pt(24); h.paragraph_format.space_after = Pt(18)
         if 'contenido' in cap:
             for item in cap['contenido']:
-                sub = doc.add_paragraph()
-                run_sub = sub.add_run(item['texto'])
-                run_sub.font.name = 'Arial'; run_sub.font.size = Pt(12); run_sub.bold = True
+                styled_paragraph(doc, item['texto'], estilo_sub)
         doc.add_page_break()
 
 def agregar_finales_dinamico(doc, data):
@@ -141,29 +157,46 @@ def agregar_numeracion_paginas(doc):
         run._r.append(fldChar1); run._r.append(instrText); run._r.append(fldChar2)
         run.font.name = 'Arial'; run.font.size = Pt(10)
 
-def generar_documento_core(ruta_json, ruta_salida):
+def generar_documento_core(ruta_json, ruta_salida, jobs=1, deterministic=False, compression="balanced"):
     data = cargar_contenido(ruta_json)
-    doc = Document()
+    doc = new_document()
     configurar_formato_unac(doc)
-    crear_caratula_dinamica(doc, data)
-    agregar_preliminares_dinamico(doc, data)
-    agregar_cuerpo_dinamico(doc, data)
-    agregar_finales_dinamico(doc, data)
-    agregar_numeracion_paginas(doc)
-    doc.save(ruta_salida)
-    # CORRECCION: Emoji quitado
-    print(f"[OK] Generado: {ruta_salida}")
+    with build_section("cover"):
+        crear_caratula_dinamica(doc, data)
+    # Preliminares incluye el indice (TOC)
+    with build_section("pre_pages"):
+        agregar_preliminares_dinamico(doc, data)
+    with build_section("structure"):
+        if jobs > 1 or incremental():
+            render_parallel("informe", doc, data, jobs)
+        else:
+            agregar_cuerpo_dinamico(doc, data)
+    with build_section("closing"):
+        agregar_finales_dinamico(doc, data)
+    with build_section("finalize"):
+        page_breaks_to_properties(doc)
+        render_tocs(doc)
+        agregar_numeracion_paginas(doc)
+    with build_section("save"):
+        save_document(doc, ruta_salida, deterministic=deterministic, compression=compression)
+    log.info("Generado: %s", ruta_salida, extra={"sample": True})
     return ruta_salida
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        path_json_arg = sys.argv[1]
-        path_output_arg = sys.argv[2]
+    args = parse_generator_args("Generador Informe de Tesis UNAC")
+    if args.watch:
+        watch_template(args.watch, lambda out: generar_documento_core(args.watch, out, compression="fast"),
+                       args.output)
+        sys.exit(0)
+    if args.output:
         try:
-            generar_documento_core(path_json_arg, path_output_arg)
+            with collect_timings() as timings:
+                ruta = generar_documento_core(args.json, args.output, jobs=args.jobs,
+                                              deterministic=args.deterministic, compression=args.compression)
+            if args.report is not None:
+                emit_report(ruta, timings, args.report or None)
         except Exception as e:
-            # CORRECCION: Emoji quitado
-            print(f"[ERROR] Error en generador: {str(e)}")
+            log.error("Error en generador: %s", e)
             sys.exit(1)
     else:
         print("="*40)
@@ -187,7 +220,11 @@ if __name__ == "__main__":
         json_path = os.path.join(FORMATS_DIR, json_file)
         
         try:
-            ruta = generar_documento_core(json_path, out_file)
+            with collect_timings() as timings:
+                ruta = generar_documento_core(json_path, out_file, jobs=args.jobs, deterministic=args.deterministic,
+                                       compression=args.compression)
+            if args.report is not None:
+                emit_report(ruta, timings, args.report or None)
             if platform.system() == 'Windows': os.startfile(ruta)
         except Exception as e:
             print(f"Error: {e}")
@@ -6,23 +6,41 @@ import sys
 from datetime import datetime
 
 from docx import Document
-from docx.shared import Pt, Cm, Mm
+from docx.shared import Pt, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 
+from format_rules import HEADING_RULES, PAGE_A4_CM, UNAC_MARGINS_CM
+from generator_cli import parse_generator_args
+from base_package import new_document, save_document
+from doc_styles import block_style, page_breaks_to_properties, paragraph_style, set_style_font, styled_paragraph
+from parallel_render import incremental, render_parallel
+from progress import step as progress_step
+from schemas import check_template
+from template_bundle import cached_template, open_asset, resolve_asset
+from toc import add_toc_field, caption_toc_instr, render_tocs, toc_instr
+from unac_logging import get_logger
+from watch import watch_template
+from weight_report import build_section, collect_timings, emit_report
+
+log = get_logger("generador_maestria")
+
 # -------------------------
 # UTILIDADES JSON / PATHS
 # -------------------------
 
 def load_json(path: str) -> dict:
+    cfg = cached_template(path)
+    if cfg is not None:
+        return cfg
     if not os.path.exists(path):
         raise FileNotFoundError(f"JSON no encontrado: {path}")
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def resolve_path(base_dir: str, maybe_rel: str) -> str:
-    return maybe_rel if os.path.isabs(maybe_rel) else os.path.join(base_dir, maybe_rel)
+        cfg = json.load(f)
+    # Plantilla mal formada: se rechaza antes de construir nada (el bundle ya viene validado)
+    check_template("maestria", cfg, path)
+    return cfg
 
 def resolve_config_path(base_dir: str, config_path: str) -> str:
     if os.path.isabs(config_path):
@@ -45,19 +63,19 @@ def open_document(path: str):
         else:
             subprocess.run(["xdg-open", path], check=False)
     except Exception as exc:
-        print(f"[WARN] No se pudo abrir el documento: {exc}")
+        log.warning("No se pudo abrir el documento: %s", exc)
 
 def set_page_setup(doc: Document, cfg: dict):
     page_setup = cfg.get("page_setup", {})
     margins = page_setup.get("margins_cm", {})
 
     sec = doc.sections[0]
-    sec.page_width = Mm(210); sec.page_height = Mm(297)
+    sec.page_width = Cm(PAGE_A4_CM[0]); sec.page_height = Cm(PAGE_A4_CM[1])
 
-    sec.left_margin = Cm(float(margins.get("left", 3.5)))
-    sec.right_margin = Cm(float(margins.get("right", 2.5)))
-    sec.top_margin = Cm(float(margins.get("top", 3.0)))
-    sec.bottom_margin = Cm(float(margins.get("bottom", 3.0)))
+    sec.left_margin = Cm(float(margins.get("left", UNAC_MARGINS_CM["left"])))
+    sec.right_margin = Cm(float(margins.get("right", UNAC_MARGINS_CM["right"])))
+    sec.top_margin = Cm(float(margins.get("top", UNAC_MARGINS_CM["top"])))
+    sec.bottom_margin = Cm(float(margins.get("bottom", UNAC_MARGINS_CM["bottom"])))
 
     font_cfg = page_setup.get("font", {})
     font_name = font_cfg.get("name", "Arial")
@@ -67,16 +85,15 @@ def set_page_setup(doc: Document, cfg: dict):
     normal.font.name = font_name
     normal.font.size = Pt(font_size)
 
-    # Estilos Heading
-    for level, size_pt, is_bold in [
-        (1, 14, True), (2, 12, True), (3, 12, False), (4, 12, True), (5, 12, False),
-    ]:
+    # Estilos Heading: la fuente va en el estilo, no en cada run del titulo
+    for level, size_pt, is_bold in HEADING_RULES:
         style_name = f"Heading {level}"
         if style_name in doc.styles:
             st = doc.styles[style_name]
-            st.font.name = font_name
+            set_style_font(st, font_name)
             st.font.size = Pt(size_pt)
             st.font.bold = is_bold
+            st.paragraph_format.space_after = Pt(0)
 
 def add_page_numbers(doc: Document, font_name: str = "Arial", font_size_pt: float = 10):
     for section in doc.sections:
@@ -93,24 +110,22 @@ def add_page_numbers(doc: Document, font_name: str = "Arial", font_size_pt: floa
         run._r.append(fld)
 
 def add_center_line(doc: Document, text: str, size=12, bold=False, uppercase=False, spacing_after=0):
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run(text.upper() if uppercase else text)
-    run.bold = bold
-    run.font.name = "Arial"
-    run.font.size = Pt(size)
-    p.paragraph_format.space_after = Pt(spacing_after)
+    style_id = block_style(doc, "Portada", size, bold, align=WD_ALIGN_PARAGRAPH.CENTER, space_after=0)
+    p = styled_paragraph(doc, text.upper() if uppercase else text, style_id)
+    if spacing_after:
+        p.paragraph_format.space_after = Pt(spacing_after)
     return p
 
 def add_heading(doc: Document, text: str, level: int = 1, spacing_after: int = 0):
-    p = doc.add_paragraph(text)
-    p.style = f"Heading {level}"
-    if p.runs:
-        p.runs[0].font.name = "Arial"
-        p.runs[0].font.size = Pt(12)
-    p.paragraph_format.space_after = Pt(spacing_after)
+    p = styled_paragraph(doc, text, f"Heading{level}")
+    if spacing_after:
+        p.paragraph_format.space_after = Pt(spacing_after)
     return p
 
+def add_index_title(doc: Document, text: str):
+    style_id = paragraph_style(doc, "Titulo Indice", bold=True, align=WD_ALIGN_PARAGRAPH.CENTER)
+    return styled_paragraph(doc, text, style_id)
+
 def add_page_blocks(doc: Document, blocks: list, default_title_level: int = 4):
     for blk in blocks:
         title = blk.get("title", "")
@@ -123,50 +138,35 @@ def add_page_blocks(doc: Document, blocks: list, default_title_level: int = 4):
         if page_break_after: doc.add_page_break()
 
 def add_center_logo(doc: Document, logo_path: str, width_cm: float = 3.5, spacing_after_pt: int = 6):
-    if not logo_path or not os.path.exists(logo_path):
-        print(f"[WARN] Logo no encontrado en: {logo_path}")
+    logo = open_asset(logo_path)
+    if logo is None:
+        log.warning("Logo no encontrado en: %s", logo_path)
         return
     p = doc.add_paragraph()
     p.alignment = WD_ALIGN_PARAGRAPH.CENTER
     run = p.add_run()
-    run.add_picture(logo_path, width=Cm(width_cm))
+    run.add_picture(logo, width=Cm(width_cm))
     p.paragraph_format.space_after = Pt(spacing_after_pt)
 
 # -------------------------
 # WORD: CAMPOS (INDICES)
 # -------------------------
 
-def add_field(paragraph, instr: str):
-    run = paragraph.add_run()
-    fld = OxmlElement("w:fldSimple")
-    fld.set(qn("w:instr"), instr)
-    run._r.append(fld)
-
 def add_toc_page(doc: Document, toc_cfg: dict):
-    p = doc.add_paragraph("INDICE")
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = p.runs[0]; r.bold = True; r.font.name = "Arial"; r.font.size = Pt(12)
-
+    add_index_title(doc, "INDICE")
     min_lv = int(toc_cfg.get("min_level", 1))
     max_lv = int(toc_cfg.get("max_level", 3))
-    toc_p = doc.add_paragraph()
-    add_field(toc_p, f'TOC \\\\o "{min_lv}-{max_lv}" \\\\h \\\\z \\\\u')
+    add_toc_field(doc.add_paragraph(), toc_instr(min_lv, max_lv))
     doc.add_page_break()
 
 def add_list_of_tables(doc: Document):
-    p = doc.add_paragraph("INDICE DE TABLAS")
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = p.runs[0]; r.bold = True; r.font.name = "Arial"; r.font.size = Pt(12)
-    lot_p = doc.add_paragraph()
-    add_field(lot_p, 'TOC \\\\h \\\\z \\\\c "Tabla"')
+    add_index_title(doc, "INDICE DE TABLAS")
+    add_toc_field(doc.add_paragraph(), caption_toc_instr("Tabla"))
     doc.add_page_break()
 
 def add_list_of_figures(doc: Document):
-    p = doc.add_paragraph("INDICE DE FIGURAS")
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r = p.runs[0]; r.bold = True; r.font.name = "Arial"; r.font.size = Pt(12)
-    lof_p = doc.add_paragraph()
-    add_field(lof_p, 'TOC \\\\h \\\\z \\\\c "Figura"')
+    add_index_title(doc, "INDICE DE FIGURAS")
+    add_toc_field(doc.add_paragraph(), caption_toc_instr("Figura"))
     doc.add_page_break()
 
 # -------------------------
@@ -175,10 +175,12 @@ def add_list_of_figures(doc: Document):
 
 def add_cover_from_cfg(doc: Document, cfg: dict, base_dir: str):
     cover = cfg["cover"]
-    # Buscamos el logo relativo al script
-    logo_path = resolve_path(base_dir, cfg.get("logo_path", ""))
-    
-    add_center_logo(doc, logo_path, width_cm=float(cover.get("logo_width_cm", 3.5)), spacing_after_pt=6)
+    # Logo relativo al script; una ruta fuera de su carpeta no se abre
+    logo_path = resolve_asset(cfg.get("logo_path", ""))
+    if logo_path is None and cfg.get("logo_path"):
+        log.warning("Logo fuera de la carpeta del generador, se omite: %s", cfg["logo_path"])
+
+    add_center_logo(doc, logo_path or "", width_cm=float(cover.get("logo_width_cm", 3.5)), spacing_after_pt=6)
 
     text_size = int(cover.get("text_size_pt", 12))
     title_size = int(cover.get("title_size_pt", 14))
@@ -206,10 +208,15 @@ def add_structure_from_cfg(doc: Document, cfg: dict):
     break_after_level1 = bool(rules.get("page_break_after_level_1", True))
     structure = cfg.get("structure", [])
     total = len(structure)
+    chapters = sum(1 for item in structure if int(item["level"]) == 1)
+    chapter = 0
 
     for i, item in enumerate(structure):
         lvl = int(item["level"])
         title = item["title"]
+        if lvl == 1:
+            chapter += 1
+            progress_step("structure", chapter, chapters)
         add_heading(doc, title, level=lvl)
 
         if add_placeholder and bool(item.get("placeholder", True)):
@@ -227,35 +234,49 @@ def add_structure_from_cfg(doc: Document, cfg: dict):
 # MAIN GENERATOR
 # -------------------------
 
-def generate(config_path: str, output_path_override: str = None):
+def generate(config_path: str, output_path_override: str = None, jobs: int = 1, deterministic: bool = False,
+             compression: str = "balanced"):
     # La carpeta base es donde esta este script
     base_dir = os.path.dirname(os.path.abspath(__file__))
     
-    # 1. Cargar configuración
-    if not os.path.exists(config_path):
-        # Intento de buscar en formats/ si solo nos pasaron el nombre
-        possible_path = os.path.join(base_dir, "formats", os.path.basename(config_path))
-        if os.path.exists(possible_path):
-            config_path = possible_path
-        else:
-            raise FileNotFoundError(f"Config JSON no encontrado en: {config_path}")
-
-    cfg = load_json(config_path)
+    # 1. Cargar configuración (o usar la ya cargada: generacion masiva con campos reemplazados)
+    if isinstance(config_path, dict):
+        cfg = config_path
+    else:
+        if not os.path.exists(config_path) and cached_template(config_path) is None:
+            # Intento de buscar en formats/ si solo nos pasaron el nombre
+            possible_path = os.path.join(base_dir, "formats", os.path.basename(config_path))
+            if os.path.exists(possible_path):
+                config_path = possible_path
+            else:
+                raise FileNotFoundError(f"Config JSON no encontrado en: {config_path}")
+        cfg = load_json(config_path)
 
     # 2. Crear Documento
-    doc = Document()
+    doc = new_document()
     set_page_setup(doc, cfg)
-    add_cover_from_cfg(doc, cfg, base_dir)
+    with build_section("cover"):
+        add_cover_from_cfg(doc, cfg, base_dir)
 
     pre_pages = cfg.get("pre_pages", [])
-    if pre_pages: add_page_blocks(doc, pre_pages, default_title_level=4)
+    with build_section("pre_pages"):
+        if pre_pages: add_page_blocks(doc, pre_pages, default_title_level=4)
 
-    add_toc_page(doc, cfg.get("toc", {"min_level": 1, "max_level": 3}))
-    if cfg.get("include_list_of_tables", False): add_list_of_tables(doc)
-    if cfg.get("include_list_of_figures", False): add_list_of_figures(doc)
+    with build_section("toc"):
+        add_toc_page(doc, cfg.get("toc", {"min_level": 1, "max_level": 3}))
+        if cfg.get("include_list_of_tables", False): add_list_of_tables(doc)
+        if cfg.get("include_list_of_figures", False): add_list_of_figures(doc)
 
-    add_structure_from_cfg(doc, cfg)
-    add_page_numbers(doc)
+    with build_section("structure"):
+        if jobs > 1 or incremental():
+            render_parallel("maestria", doc, cfg, jobs)
+        else:
+            add_structure_from_cfg(doc, cfg)
+    with build_section("finalize"):
+        page_breaks_to_properties(doc)
+        # Indices ya resueltos: el Word abre con el TOC lleno, sin pedir actualizar campos
+        render_tocs(doc)
+        add_page_numbers(doc)
 
     # 3. Guardar
     if output_path_override:
@@ -266,29 +287,36 @@ def generate(config_path: str, output_path_override: str = None):
         output_name = cfg.get("output_name", "output.docx")
         final_path = os.path.join(base_dir, output_name)
 
-    doc.save(final_path)
-    
-    # IMPORTANTE: Usamos [OK] en lugar de emojis para evitar crash en Windows
-    print(f"[OK] Documento guardado en: {final_path}")
+    with build_section("save"):
+        save_document(doc, final_path, deterministic=deterministic, compression=compression)
+    log.info("Documento guardado en: %s", final_path, extra={"sample": True})
 
     # Si NO estamos en modo servidor (output_override es None), abrimos el archivo
     if not output_path_override:
         open_document(final_path)
+    return final_path
 
 if __name__ == "__main__":
-    
+    args = parse_generator_args("Generador Maestria UNAC")
+
+    if args.watch:
+        watch_template(args.watch, lambda out: generate(args.watch, output_path_override=out, compression="fast"),
+                       args.output)
+        sys.exit(0)
+
     # ----------------------------------------------------
     # MODO SERVIDOR (AUTOMÁTICO)
-    # Recibe: script.py [json_path] [output_path]
+    # Recibe: script.py [json_path] [output_path] [--jobs N]
     # ----------------------------------------------------
-    if len(sys.argv) > 2:
-        json_arg = sys.argv[1]
-        output_arg = sys.argv[2]
-        
+    if args.output:
         try:
-            generate(json_arg, output_path_override=output_arg)
+            with collect_timings() as timings:
+                path = generate(args.json, output_path_override=args.output, jobs=args.jobs,
+                                deterministic=args.deterministic, compression=args.compression)
+            if args.report is not None:
+                emit_report(path, timings, args.report or None)
         except Exception as e:
-            print(f"[ERROR] Fallo critico: {e}")
+            log.error("Fallo critico: %s", e)
             sys.exit(1)
 
     # ----------------------------------------------------
@@ -311,4 +339,7 @@ if __name__ == "__main__":
         else: print("Opcion no valida"); sys.exit()
 
         config_path = os.path.join(base_dir, "formats", json_file)
-        generate(config_path)
\ No newline at end of file
+        with collect_timings() as timings:
+            path = generate(config_path, jobs=args.jobs, deterministic=args.deterministic, compression=args.compression)
+        if args.report is not None:
+            emit_report(path, timings, args.report or None)
\ No newline at end of file
@@ -3,13 +3,30 @@ import os
 import sys
 import platform
 import subprocess
-from docx import Document
 from docx.shared import Pt, Cm, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
 from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 
+from base_package import new_document, save_document
+from doc_styles import page_breaks_to_properties, paragraph_style, styled_paragraph
+from format_rules import HEADING_STYLES
+from generator_cli import parse_generator_args
+from parallel_render import incremental, render_parallel
+from progress import step as progress_step
+from schemas import check_template
+from template_bundle import cached_template, open_asset, resolve_asset
+from unac_logging import get_logger
+from watch import watch_template
+from weight_report import build_section, collect_timings, emit_report
+
+log = get_logger("generador_proyecto_tesis")
+# Seccion del reporte de peso segun el tipo de pagina; el resto cuenta como estructura
+SECCIONES_PAGINA = {"caratula": "cover", "lista": "pre_pages", "indice": "toc"}
+# Estilos de titulo con su nivel de esquema (los mismos que busca el validador)
+HEADING_LEVELS = HEADING_STYLES["proyecto"]
+
 class SistemasHenyerEngine:
     def __init__(self, json_path):
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,13 +35,28 @@ class SistemasHenyerEngine:
         if not os.path.isabs(json_path):
             json_path = os.path.join(self.base_dir, json_path)
 
-        if not os.path.exists(json_path):
-            raise FileNotFoundError(f"CRITICO: No se encontro el archivo de configuracion: {json_path}")
-            
-        with open(json_path, 'r', encoding='utf-8') as f:
-            self.data = json.load(f)
+        self.data = cached_template(json_path)
+        if self.data is None:
+            if not os.path.exists(json_path):
+                raise FileNotFoundError(f"CRITICO: No se encontro el archivo de configuracion: {json_path}")
+
+            with open(json_path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            check_template("proyecto", self.data, json_path)
         
-        self.doc = Document()
+        self._init_documento(new_document())
+
+    @classmethod
+    def from_data(cls, data, doc=None):
+        """Crea el motor desde un dict ya cargado (workers de render paralelo)."""
+        engine = cls.__new__(cls)
+        engine.base_dir = os.path.dirname(os.path.abspath(__file__))
+        engine.data = data
+        engine._init_documento(doc if doc is not None else new_document())
+        return engine
+
+    def _init_documento(self, doc):
+        self.doc = doc
         # Configuración por defecto
         self.conf = self.data.get('configuracion', {
             "fuente_normal": "Arial", 
@@ -34,6 +66,33 @@ class SistemasHenyerEngine:
             "fuente_tabla": "Arial Narrow",
             "tamano_tabla": 9
         })
+        self.definir_estilos()
+
+    def definir_estilos(self):
+        """Estilos con nombre del encabezado y de las paginas; se crean una vez por documento."""
+        fuente_tbl = self.conf.get('fuente_tabla', 'Arial Narrow')
+        tamano_tbl = self.conf.get('tamano_tabla', 9)
+        fuente = self.conf.get('fuente_normal', 'Arial')
+        tamano = self.conf.get('tamano_normal', 11)
+        self.estilos = {
+            'celda': paragraph_style(self.doc, 'Celda Encabezado', font=fuente_tbl, size_pt=tamano_tbl),
+            'celda_centro': paragraph_style(self.doc, 'Celda Encabezado Centrada', font=fuente_tbl, size_pt=tamano_tbl,
+                                            align=WD_ALIGN_PARAGRAPH.CENTER),
+            'celda_titulo': paragraph_style(self.doc, 'Celda Encabezado Titulo', font=fuente_tbl, size_pt=tamano_tbl,
+                                            bold=True, align=WD_ALIGN_PARAGRAPH.CENTER),
+            'titulo_pagina': paragraph_style(self.doc, 'Titulo Pagina', font=fuente, size_pt=14, bold=True,
+                                             align=WD_ALIGN_PARAGRAPH.CENTER,
+                                             outline_level=HEADING_LEVELS['Titulo Pagina']),
+            'titulo_indice': paragraph_style(self.doc, 'Titulo Indice', font=fuente, size_pt=tamano, bold=True,
+                                             align=WD_ALIGN_PARAGRAPH.CENTER,
+                                             outline_level=HEADING_LEVELS['Titulo Indice']),
+            'titulo_capitulo': paragraph_style(self.doc, 'Titulo Capitulo', font=fuente, size_pt=12, bold=True,
+                                               align=WD_ALIGN_PARAGRAPH.CENTER,
+                                               outline_level=HEADING_LEVELS['Titulo Capitulo']),
+            'subtitulo': paragraph_style(self.doc, 'Subtitulo Seccion', font=fuente, size_pt=tamano, bold=True,
+                                         outline_level=HEADING_LEVELS['Subtitulo Seccion']),
+            'indice_negrita': paragraph_style(self.doc, 'Entrada Indice Negrita', font=fuente, size_pt=tamano, bold=True),
+        }
 
     def _resolve_asset_path(self, filename_from_json):
         """
@@ -41,17 +100,18 @@ class SistemasHenyerEngine:
         1. Intenta la ruta tal cual viene del JSON.
         2. Si falla, limpia la ruta y busca solo el nombre del archivo en la carpeta actual.
         3. Si falla, intenta un nombre por defecto 'LogoUNAC.png'.
+        Solo dentro de la carpeta del generador: una ruta que salga de ahi no se abre.
         """
         # Opción A: Ruta combinada (base_dir + ruta_json)
         # Esto fallaba antes porque duplicaba la carpeta 'Formato_ProyectoDeTesis'
-        path_A = os.path.join(self.base_dir, filename_from_json)
+        path_A = resolve_asset(filename_from_json) or ""
         if os.path.exists(path_A):
             return path_A
             
         # Opción B: Limpieza de ruta (SOLUCIÓN CLAVE)
         # Si el JSON dice 'Carpeta/foto.png', extraemos solo 'foto.png' y buscamos aquí.
         clean_name = os.path.basename(filename_from_json)
-        path_B = os.path.join(self.base_dir, clean_name)
+        path_B = resolve_asset(clean_name) or ""
         if os.path.exists(path_B):
             return path_B
 
@@ -96,17 +156,18 @@ class SistemasHenyerEngine:
         # --- LOGO ---
         celda_logo = table.cell(0, 0).merge(table.cell(3, 0))
         p_logo = celda_logo.paragraphs[0]
-        p_logo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p_logo._p.style = self.estilos['celda_centro']
         
         # 1. Obtenemos nombre del JSON o usamos default
         nombre_logo = self.conf.get('ruta_logo', 'assets/LogoUNAC.png')
         # 2. Resolvemos la ruta absoluta con la nueva lógica inteligente
         ruta_logo = self._resolve_asset_path(nombre_logo)
+        logo = open_asset(ruta_logo)
 
-        if os.path.exists(ruta_logo):
+        if logo is not None:
             run_img = p_logo.add_run()
             # Ajustamos el ancho para que quepa bien en la celda
-            run_img.add_picture(ruta_logo, width=Cm(2.2))
+            run_img.add_picture(logo, width=Cm(2.2))
         else:
             # Debug visual en el Word si falla
             p_logo.add_run("LOGO\nNO ENCONTRADO").bold = True
@@ -114,9 +175,8 @@ class SistemasHenyerEngine:
         # --- TITULO I+D+i+e ---
         celda_idie = table.cell(0, 1).merge(table.cell(0, 4))
         celda_idie.text = "I + D + i + e"
-        celda_idie.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        celda_idie.paragraphs[0]._p.style = self.estilos['celda_titulo']
         celda_idie.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-        celda_idie.paragraphs[0].runs[0].bold = True
         self.set_cell_background(celda_idie, self.conf.get('color_encabezado', 'D9D9D9'))
 
         # --- RESTO DE LA TABLA ---
@@ -136,16 +196,11 @@ class SistemasHenyerEngine:
         page_para.add_run(" de ")
         self.add_field(page_para, "NUMPAGES")
 
-        fuente_tbl = self.conf.get('fuente_tabla', 'Arial Narrow')
-        tamano_tbl = self.conf.get('tamano_tabla', 9)
-        
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    for run in p.runs:
-                        run.font.name = fuente_tbl
-                        run.font.size = Pt(tamano_tbl)
-        
+        # Un pStyle por parrafo de celda en lugar de fuente y tamano en cada run
+        for p in table._tbl.iter(qn('w:p')):
+            if p.style is None:
+                p.style = self.estilos['celda']
+
         self.doc.add_paragraph().paragraph_format.space_after = Pt(10)
 
     def aplicar_estilos_base(self):
@@ -154,59 +209,76 @@ class SistemasHenyerEngine:
         style.font.size = Pt(self.conf.get('tamano_normal', 11))
         style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.ONE_POINT_FIVE
 
-    def construir(self, output_path):
-        self.aplicar_estilos_base()
-        paginas = self.data.get('paginas', [])
-        
-        for i, pag in enumerate(paginas):
-            if i > 0: self.doc.add_page_break()
+    def render_pagina(self, i, pag):
+        if i > 0: self.doc.add_page_break()
+        with build_section("header_tables"):
             self.insertar_tabla_encabezado()
-            
-            tipo = pag.get('tipo', 'generico')
-            
-            if tipo in ['caratula', 'lista']:
-                if pag.get('titulo'):
-                    p = self.doc.add_paragraph(pag['titulo'])
-                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    p.runs[0].bold = True; p.runs[0].font.size = Pt(14)
-                for item in pag.get('items', []): self.doc.add_paragraph(item)
-
-            elif tipo == 'indice':
-                p = self.doc.add_paragraph(pag.get('titulo', 'INDICE'))
-                p.alignment = WD_ALIGN_PARAGRAPH.CENTER; p.runs[0].bold = True
-                for item in pag.get('items', []):
+
+        tipo = pag.get('tipo', 'generico')
+
+        if tipo in ['caratula', 'lista']:
+            if pag.get('titulo'):
+                styled_paragraph(self.doc, pag['titulo'], self.estilos['titulo_pagina'])
+            for item in pag.get('items', []): self.doc.add_paragraph(item)
+
+        elif tipo == 'indice':
+            styled_paragraph(self.doc, pag.get('titulo', 'INDICE'), self.estilos['titulo_indice'])
+            for item in pag.get('items', []):
+                if item.get('bold'):
+                    para = styled_paragraph(self.doc, item.get('texto', ''), self.estilos['indice_negrita'])
+                else:
                     para = self.doc.add_paragraph(item.get('texto', ''))
-                    para.paragraph_format.left_indent = Cm(item.get('indent', 0) * 0.7)
-                    if item.get('bold'): para.runs[0].bold = True
-
-            elif tipo == 'contenido_detallado':
-                for idx_cap, cap in enumerate(pag.get('capitulos', [])):
-                    if idx_cap > 0: self.doc.add_paragraph()
-                    if cap.get('titulo'):
-                        t = self.doc.add_paragraph(cap['titulo'])
-                        t.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        t.runs[0].bold = True; t.runs[0].font.size = Pt(12)
-                    for sec in cap.get('secciones', []):
-                        if sec.get('sub'): 
-                            st = self.doc.add_paragraph(sec['sub'])
-                            st.runs[0].bold = True
-                        if sec.get('texto'):
-                            self.doc.add_paragraph(sec['texto']).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+                if item.get('indent'):
+                    para.paragraph_format.left_indent = Cm(item['indent'] * 0.7)
+
+        elif tipo == 'contenido_detallado':
+            for idx_cap, cap in enumerate(pag.get('capitulos', [])):
+                if idx_cap > 0: self.doc.add_paragraph()
+                if cap.get('titulo'):
+                    styled_paragraph(self.doc, cap['titulo'], self.estilos['titulo_capitulo'])
+                for sec in cap.get('secciones', []):
+                    if sec.get('sub'):
+                        styled_paragraph(self.doc, sec['sub'], self.estilos['subtitulo'])
+                    if sec.get('texto'):
+                        self.doc.add_paragraph(sec['texto']).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+    def construir(self, output_path, jobs=1, deterministic=False, compression="balanced"):
+        self.aplicar_estilos_base()
+        paginas = self.data.get('paginas', [])
+
+        if jobs > 1 or incremental():
+            with build_section("structure"):
+                render_parallel("proyecto", self.doc, self.data, jobs)
+        else:
+            for i, pag in enumerate(paginas):
+                with build_section(SECCIONES_PAGINA.get(pag.get('tipo'), "structure")):
+                    progress_step("pages", i + 1, len(paginas))
+                    self.render_pagina(i, pag)
+        with build_section("finalize"):
+            page_breaks_to_properties(self.doc)
 
         full_output_path = os.path.abspath(output_path)
-        self.doc.save(full_output_path)
-        print(f"[OK] Documento generado: {full_output_path}")
+        with build_section("save"):
+            save_document(self.doc, full_output_path, deterministic=deterministic, compression=compression)
+        log.info("Documento generado: %s", full_output_path, extra={"sample": True})
+        return full_output_path
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        json_path_arg = sys.argv[1]
-        output_path_arg = sys.argv[2]
-        
+    args = parse_generator_args("Generador Proyecto de Tesis UNAC")
+    if args.watch:
+        watch_template(args.watch, lambda out: SistemasHenyerEngine(args.watch).construir(out, compression="fast"),
+                       args.output)
+        sys.exit(0)
+    if args.output:
         try:
-            engine = SistemasHenyerEngine(json_path_arg)
-            engine.construir(output_path_arg)
+            with collect_timings() as timings:
+                engine = SistemasHenyerEngine(args.json)
+                ruta = engine.construir(args.output, jobs=args.jobs, deterministic=args.deterministic,
+                                        compression=args.compression)
+            if args.report is not None:
+                emit_report(ruta, timings, args.report or None)
         except Exception as e:
-            print(f"[ERROR] Error en generador: {str(e)}")
+            log.error("Error en generador: %s", e)
             sys.exit(1)
 
     else:
@@ -235,8 +307,12 @@ if __name__ == "__main__":
         
         if os.path.exists(json_path):
             try:
-                engine = SistemasHenyerEngine(json_path)
-                engine.construir(out_name)
+                with collect_timings() as timings:
+                    engine = SistemasHenyerEngine(json_path)
+                    ruta = engine.construir(out_name, jobs=args.jobs, deterministic=args.deterministic,
+                                            compression=args.compression)
+                if args.report is not None:
+                    emit_report(ruta, timings, args.report or None)
                 if platform.system() == 'Windows': os.startfile(out_name)
             except Exception as e:
                 print(f"Error: {e}")
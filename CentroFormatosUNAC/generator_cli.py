@@ -0,0 +1,45 @@
+import argparse
+import os
+
+from docx_package import COMPRESSION_LEVELS
+from unac_logging import setup_logging
+
+
+def parse_generator_args(description: str, argv=None):
+    """
+    Argumentos comunes de los generadores.
+    Modo servidor: script.py <json> <salida> [opciones]
+    Sin <salida> se muestra el menu interactivo.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("json", nargs="?", help="Ruta del JSON de la plantilla")
+    parser.add_argument("output", nargs="?", help="Ruta del DOCX de salida")
+    parser.add_argument(
+        "--jobs", type=int, default=int(os.environ.get("UNAC_RENDER_JOBS", 1)),
+        help="Procesos para renderizar capitulos en paralelo (1 = secuencial)",
+    )
+    parser.add_argument(
+        "--deterministic", action="store_true", default=os.environ.get("UNAC_DETERMINISTIC") == "1",
+        help="Salida reproducible: mismas entradas, mismos bytes (fechas fijas, ZIP normalizado)",
+    )
+    parser.add_argument(
+        "--compression", choices=sorted(COMPRESSION_LEVELS),
+        default=os.environ.get("UNAC_COMPRESSION", "balanced"),
+        help="Nivel de deflate del DOCX: fast (rapido), balanced o small (menor tamano)",
+    )
+    parser.add_argument(
+        "--report", nargs="?", const="", metavar="JSON",
+        help="Reporte de peso (partes, media, elementos, tiempo por seccion); por defecto <salida>.weight.json",
+    )
+    parser.add_argument(
+        "--watch", metavar="JSON",
+        help="Modo autor: vuelve a generar al guardar el JSON o sus assets (salida: <salida> o <json>.docx)",
+    )
+    args = parser.parse_args(argv)
+    args.jobs = max(1, args.jobs)
+    if args.watch and args.json and not args.output:
+        # --watch JSON [salida]: el unico posicional es la salida
+        args.json, args.output = None, args.json
+    # Lanzado por un servidor, UNAC_REQUEST_ID y UNAC_LOG_FORMAT llegan por el entorno
+    setup_logging()
+    return args
@@ -15,5 +15,8 @@ if exist "%PYTHON_EXE%" (
 echo Instalando dependencias desde requirements.txt...
 "%PYTHON_CMD%" -m pip install -r "%SCRIPT_DIR%requirements.txt"
 
+echo Compilando plantillas...
+"%PYTHON_CMD%" "%SCRIPT_DIR%template_bundle.py" compile-templates
+
 echo Iniciando servidor...
 "%PYTHON_CMD%" "%SCRIPT_DIR%server.py"
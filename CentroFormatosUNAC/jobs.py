@@ -0,0 +1,176 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from progress import TERMINAL_STAGES
+from unac_logging import current_request_id, get_logger
+from worker_pool import JobCancelled
+
+PREPARE_WORKERS = int(os.environ.get("UNAC_PREPARE_WORKERS", 2))
+# Trabajos terminados que se conservan para que /generate los recoja
+KEEP_S = 300
+KEEP_MAX = 64
+# Eventos de progreso que se guardan por trabajo (los clientes SSE los repiten desde el inicio)
+EVENTS_MAX = 500
+
+log = get_logger("jobs")
+
+
+class Job:
+    def __init__(self, key: str, label: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.label = label
+        # Pedido que lanzo el trabajo; los que se enganchan despues lo ven en sus logs
+        self.request_id = current_request_id()
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.future = None
+        self.cancel = threading.Event()
+        self.events = []
+        self.changed = threading.Condition()
+        self.emit({"stage": "queued"})
+
+    def emit(self, event: dict):
+        """Agrega un evento de progreso; su id es la posicion (Last-Event-ID en SSE)."""
+        with self.changed:
+            if len(self.events) >= EVENTS_MAX and event["stage"] not in TERMINAL_STAGES:
+                return
+            self.events.append(dict(event, id=len(self.events),
+                                    t_ms=round((time.time() - self.created) * 1000)))
+            self.changed.notify_all()
+
+    def set_status(self, status: str, error: str = None):
+        self.status, self.error = status, error
+        if status == "running":
+            self.started = time.time()
+        elif status in TERMINAL_STAGES:
+            self.finished = time.time()
+        event = {"stage": "started" if status == "running" else status}
+        if error:
+            event["error"] = error
+        self.emit(event)
+
+    def events_after(self, last_id: int, timeout: float) -> tuple:
+        """(eventos con id > last_id, terminado); espera hasta timeout si no hay nuevos."""
+        with self.changed:
+            if len(self.events) <= last_id + 1 and not self.finished:
+                self.changed.wait(timeout)
+            finished = bool(self.events) and self.events[-1]["stage"] in TERMINAL_STAGES
+            return self.events[last_id + 1:], finished
+
+    def result(self, timeout: float = None):
+        return self.future.result(timeout=timeout)
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("queued", "running", "done")
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        if self.started:
+            elapsed = round(((self.finished or time.time()) - self.started) * 1000)
+        return {
+            "id": self.id,
+            "label": self.label,
+            "status": self.status,
+            "request_id": self.request_id,
+            "elapsed_ms": elapsed,
+            "error": self.error,
+            # Ultima etapa, para quien consulta sin SSE
+            "progress": self.events[-1] if self.events else None,
+        }
+
+
+class JobManager:
+    """
+    Renders en segundo plano deduplicados por clave: un segundo pedido con la misma
+    clave (otro /prepare o el /generate final) se engancha al trabajo en curso.
+    """
+
+    def __init__(self, workers: int = PREPARE_WORKERS, keep_s: float = KEEP_S, keep_max: int = KEEP_MAX):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="unac-job")
+        self.keep_s = keep_s
+        self.keep_max = keep_max
+        self.by_id = {}
+        self.by_key = {}
+        self.lock = threading.Lock()
+
+    def _run(self, job: Job, fn, args):
+        """
+        fn recibe cancel=<Event> para cortar el trabajo si se cancela ya iniciado y
+        progress=<callable> para publicar sus etapas en job.events.
+        """
+        job.set_status("running")
+        try:
+            result = fn(*args, cancel=job.cancel, progress=job.emit)
+        except JobCancelled as exc:
+            job.set_status("cancelled", str(exc))
+            log.warning("Trabajo %s cancelado: %s", job.label, exc, extra={"job": job.id})
+            raise
+        except Exception as exc:
+            job.set_status("failed", str(exc))
+            log.error("Trabajo %s fallo: %s", job.label, exc, extra={"job": job.id})
+            raise
+        else:
+            job.set_status("done")
+            return result
+
+    def _prune(self):
+        now = time.time()
+        done = sorted((j for j in self.by_id.values() if j.finished), key=lambda j: j.finished)
+        stale = [j for j in done if now - j.finished > self.keep_s]
+        stale += done[len(stale):max(len(stale), len(done) - self.keep_max)]
+        for job in stale:
+            self.by_id.pop(job.id, None)
+            if self.by_key.get(job.key) is job:
+                del self.by_key[job.key]
+
+    def submit(self, key: str, fn, *args, label: str = "") -> tuple:
+        """Devuelve (job, enganchado); un trabajo fallido no se reutiliza."""
+        with self.lock:
+            self._prune()
+            job = self.by_key.get(key)
+            if job is not None and job.ok:
+                return job, True
+            job = Job(key, label)
+            self.by_id[job.id] = job
+            self.by_key[key] = job
+            # El hilo del pool hereda el contexto (request id) de quien lanzo el trabajo
+            ctx = contextvars.copy_context()
+            job.future = self.pool.submit(ctx.run, self._run, job, fn, args)
+            return job, False
+
+    def cancel(self, job_id: str):
+        """Cancela un trabajo en cola o en curso; devuelve el job (o None si no existe)."""
+        with self.lock:
+            job = self.by_id.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return job
+            if self.by_key.get(job.key) is job:
+                del self.by_key[job.key]
+        job.cancel.set()
+        if job.future.cancel():
+            job.set_status("cancelled", "Cancelado en cola")
+        return job
+
+    def counts(self) -> dict:
+        with self.lock:
+            counts = {}
+            for job in self.by_id.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.by_id.get(job_id)
+
+    def find(self, key: str):
+        with self.lock:
+            return self.by_key.get(key)
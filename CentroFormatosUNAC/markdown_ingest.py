@@ -0,0 +1,476 @@
+import argparse
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.image.exceptions import UnrecognizedImageError
+from docx.oxml.ns import qn
+from docx.shared import Cm, Pt
+
+from base_package import save_document
+from bibliography import CITATION_STYLES, Bibliography, references_heading
+from doc_styles import starts_new_page
+from docx_package import COMPRESSION_LEVELS
+from figures import add_caption, renumber_captions
+from format_checker import heading_key
+from format_rules import PLACEHOLDER, citation_style
+from preview import CHARS_PER_LINE, LINES_PER_PAGE
+from schemas import check_template
+from templates import load_template, resolve_key, template_headings, template_path
+from toc import render_tocs
+from unac_logging import get_logger, setup_logging
+
+FIGURE_WIDTH_CM = 14
+HANGING_INDENT_CM = 1.27
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+BULLET_RE = re.compile(r"^\s*[-*+]\s+(.*)$")
+ORDERED_RE = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+FIGURE_RE = re.compile(r"^!\[(.*?)\]\((.+?)\)\s*$")
+TABLE_CAPTION_RE = re.compile(r"^(?:Tabla|Table):\s*(.+)$")
+FOOTNOTE_DEF_RE = re.compile(r"^\[\^([^\]]+)\]:\s*(.*)$")
+TABLE_SEP_RE = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+# _enfasis_ y __negrita__ solo en limite de palabra: Variable_de_interes queda tal cual
+INLINE_RE = re.compile(r"(\*\*.+?\*\*|(?<!\w)__(?!\s).+?(?<!\s)__(?!\w)|\*.+?\*|(?<!\w)_(?!\s).+?(?<!\s)_(?!\w)"
+                       r"|`.+?`|\[\^[^\]]+\])")
+
+log = get_logger("markdown_ingest")
+
+# -------------------------
+# PARSER MARKDOWN (GENERADOR DE BLOQUES)
+# -------------------------
+
+def _table_cells(line: str) -> list:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def iter_blocks(lines):
+    """
+    Convierte lineas Markdown en bloques (tipo, ...) sin cargar el archivo completo.
+    Solo se retiene el parrafo o la tabla en curso.
+    """
+    para, table = [], None
+
+    def flush():
+        nonlocal para, table
+        if para:
+            yield ("paragraph", " ".join(para))
+            para = []
+        if table is not None:
+            yield ("table", table)
+            table = None
+
+    for raw in lines:
+        line = raw.rstrip("\n").rstrip()
+        if table is not None and not line.startswith("|"):
+            yield from flush()
+
+        if not line.strip():
+            yield from flush()
+            continue
+
+        if line.startswith("|"):
+            if para:
+                yield from flush()
+            if table is None:
+                table = [_table_cells(line)]
+            elif not TABLE_SEP_RE.match(line):
+                table.append(_table_cells(line))
+            continue
+
+        m = HEADING_RE.match(line)
+        if m:
+            yield from flush()
+            yield ("heading", len(m.group(1)), m.group(2))
+            continue
+        m = FIGURE_RE.match(line.strip())
+        if m:
+            yield from flush()
+            yield ("figure", m.group(2), m.group(1))
+            continue
+        m = TABLE_CAPTION_RE.match(line)
+        if m:
+            yield from flush()
+            yield ("caption", "Tabla", m.group(1))
+            continue
+        m = FOOTNOTE_DEF_RE.match(line)
+        if m:
+            yield from flush()
+            yield ("footnote", m.group(1), m.group(2))
+            continue
+        m = BULLET_RE.match(line) or ORDERED_RE.match(line)
+        if m:
+            yield from flush()
+            yield ("list", m.re is ORDERED_RE, m.group(1))
+            continue
+        para.append(line.strip())
+
+    yield from flush()
+
+# -------------------------
+# ESCRITURA EN EL DOCUMENTO
+# -------------------------
+
+class BodyWriter:
+    """Inserta bloques Markdown bajo los titulos de la plantilla, en el orden del archivo."""
+
+    def __init__(self, doc, fmt_type: str, cfg: dict, base_dir: str = None, bibliography=None):
+        self.doc = doc
+        self.base_dir = base_dir
+        self.bibliography = bibliography
+        self.body = doc.element.body
+        self.stop = None
+        self.footnotes = {}
+        self.captions = {}
+        # Parrafos con citas: sus sufijos 2020a/2020b se resuelven al final del cuerpo
+        self.cited_paragraphs = []
+        self.stats = {"anchors": 0, "blocks": 0, "skipped": 0, "chars": 0}
+
+        keys = {heading_key(text) for _level, text in template_headings(fmt_type, cfg)}
+        keys.discard("")
+        # Ultima aparicion con estilo de titulo; si no hay, la ultima (los indices repiten titulos)
+        candidates = {}
+        for p in self.body.iterchildren(qn("w:p")):
+            text = "".join(t.text or "" for t in p.iter(qn("w:t"))).strip()
+            key = heading_key(text) if text else ""
+            if key in keys:
+                styled = self._style(p).startswith("Heading")
+                prev = candidates.get(key)
+                if prev is None or styled or not prev[1]:
+                    candidates[key] = (p, styled)
+        ordered = sorted(candidates.items(), key=lambda kv: self.body.index(kv[1][0]))
+        self.anchors = [(key, p) for key, (p, _styled) in ordered]
+        self.anchor_elements = {id(p) for _key, p in self.anchors}
+        self.used = set()
+
+    @staticmethod
+    def _style(p) -> str:
+        pstyle = p.find(f"{qn('w:pPr')}/{qn('w:pStyle')}")
+        return pstyle.get(qn("w:val")) if pstyle is not None else ""
+
+    def _ends_section(self, el) -> bool:
+        if el.tag == qn("w:sectPr") or id(el) in self.anchor_elements:
+            return True
+        return starts_new_page(el)
+
+    def open_anchor(self, title: str, reopen: bool = False) -> bool:
+        key = heading_key(title)
+        match = lambda k: k == key or k.startswith(key) or key.startswith(k)
+        found = next(((i, p) for i, (k, p) in enumerate(self.anchors)
+                      if (reopen or i not in self.used) and match(k)), None)
+        if not key or found is None:
+            return False
+        idx, anchor = found
+        self.used.add(idx)
+        stop = anchor.getnext()
+        while stop is not None and not self._ends_section(stop):
+            nxt = stop.getnext()
+            if stop.tag == qn("w:p") and "".join(t.text or "" for t in stop.iter(qn("w:t"))).strip() == PLACEHOLDER:
+                self.body.remove(stop)
+            stop = nxt
+        self.stop = stop
+        self.stats["anchors"] += 1
+        return True
+
+    def _place(self, el):
+        if self.stop is not None:
+            self.stop.addprevious(el)
+        else:
+            self.body.append(el)
+
+    def _add_runs(self, paragraph, text: str):
+        if self.bibliography is not None:
+            cited = self.bibliography.cite(text)
+            if cited != text:
+                self.cited_paragraphs.append(paragraph)
+            text = cited
+        for part in INLINE_RE.split(text):
+            if not part:
+                continue
+            if part.startswith("[^"):
+                ref = part[2:-1]
+                run = paragraph.add_run(str(self.footnotes.setdefault(ref, len(self.footnotes) + 1)))
+                run.font.superscript = True
+            elif part[:2] in ("**", "__") and len(part) > 4:
+                paragraph.add_run(part[2:-2]).bold = True
+            elif part[0] in "*_" and len(part) > 2:
+                paragraph.add_run(part[1:-1]).italic = True
+            elif part[0] == "`" and len(part) > 2:
+                paragraph.add_run(part[1:-1]).font.name = "Courier New"
+            else:
+                paragraph.add_run(part)
+
+    def paragraph(self, text: str = "", style: str = None):
+        p = self.doc.add_paragraph(style=style)
+        if text:
+            self._add_runs(p, text)
+        self._place(p._p)
+        self.stats["chars"] += len(text)
+        return p
+
+    def caption(self, label: str, text: str):
+        # Numero provisional; renumber_captions lo ajusta al orden final del documento
+        self.captions[label] = self.captions.get(label, 0) + 1
+        p = add_caption(self.paragraph(), label, self.captions[label], text)
+        p.paragraph_format.keep_with_next = True
+        self.stats["chars"] += len(text)
+        return p
+
+    def write(self, block):
+        kind = block[0]
+        if kind == "heading":
+            _kind, level, text = block
+            if self.open_anchor(text):
+                return
+            if not self.stats["anchors"]:
+                self.stats["skipped"] += 1
+                return
+            self.paragraph(text, style=f"Heading {min(level, 9)}")
+
+        elif not self.stats["anchors"]:
+            # Contenido antes del primer titulo reconocido
+            self.stats["skipped"] += 1
+            return
+
+        elif kind == "paragraph":
+            self.paragraph(block[1]).alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+        elif kind == "list":
+            _kind, ordered, text = block
+            self.paragraph(text, style="List Number" if ordered else "List Bullet")
+
+        elif kind == "table":
+            rows = block[1]
+            cols = max(len(r) for r in rows)
+            table = self.doc.add_table(rows=len(rows), cols=cols)
+            table.style = "Table Grid"
+            for r, row in enumerate(rows):
+                for c, text in enumerate(row):
+                    cell = table.cell(r, c).paragraphs[0]
+                    self._add_runs(cell, text)
+                    if r == 0:
+                        for run in cell.runs:
+                            run.bold = True
+            self._place(table._tbl)
+            self.stats["chars"] += sum(len(t) for row in rows for t in row)
+
+        elif kind == "caption":
+            _kind, label, text = block
+            self.caption(label, text)
+
+        elif kind == "figure":
+            _kind, path, caption = block
+            self.caption("Figura", caption)
+            # Sin base_dir (contenido subido al servidor) no se leen archivos locales
+            full = os.path.join(self.base_dir, path) if self.base_dir is not None else None
+            if full and os.path.isfile(full):
+                p = self.paragraph()
+                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                try:
+                    p.add_run().add_picture(full, width=Cm(FIGURE_WIDTH_CM))
+                except UnrecognizedImageError:
+                    log.warning("Formato de imagen no reconocido: %s", full)
+                    p.add_run(f"[Figura no valida: {path}]")
+            else:
+                if full:
+                    log.warning("Figura no encontrada: %s", full)
+                self.paragraph(f"[Figura: {path}]")
+
+        elif kind == "footnote":
+            # Notas sin parte footnotes.xml: se escriben donde el autor las define
+            _kind, ref, text = block
+            number = self.footnotes.setdefault(ref, len(self.footnotes) + 1)
+            note = self.paragraph(f"{number}. {text}")
+            for run in note.runs:
+                run.font.size = Pt(9)
+
+        self.stats["blocks"] += 1
+
+    def resolve_citations(self):
+        """Segunda pasada: con todas las citas leidas, las marcas pasan a 2020a, 2020b..."""
+        self.bibliography.finish()
+        for paragraph in self.cited_paragraphs:
+            for t in paragraph._p.iter(qn("w:t")):
+                if t.text:
+                    t.text = self.bibliography.resolve(t.text)
+
+    def write_references(self, heading: str) -> int:
+        """Lista de referencias ordenada, con sangria francesa, bajo el titulo de la plantilla."""
+        entries = self.bibliography.references()
+        if entries and not (heading and self.open_anchor(heading, reopen=True)):
+            log.warning("La plantilla no tiene titulo de referencias; se agregan al final del contenido")
+        for segments in entries:
+            p = self.doc.add_paragraph()
+            for text, italic in segments:
+                run = p.add_run(text)
+                if italic:
+                    run.italic = True
+            p.paragraph_format.left_indent = Cm(HANGING_INDENT_CM)
+            p.paragraph_format.first_line_indent = Cm(-HANGING_INDENT_CM)
+            self._place(p._p)
+        return len(entries)
+
+
+def ingest_markdown(doc, lines, fmt_type: str, cfg: dict, base_dir: str = None, bibliography=None) -> dict:
+    """Vuelca el Markdown (iterable de lineas) en el documento ya generado."""
+    writer = BodyWriter(doc, fmt_type, cfg, base_dir=base_dir, bibliography=bibliography)
+    for block in iter_blocks(lines):
+        writer.write(block)
+    stats = dict(writer.stats)
+    stats["captions"] = renumber_captions(doc)
+    if bibliography is not None:
+        writer.resolve_citations()
+        heading = references_heading(template_headings(fmt_type, cfg))
+        stats["references"] = writer.write_references(heading)
+        stats["missing_citations"] = sorted(bibliography.missing)
+    # Los titulos y leyendas nuevos entran al indice ya prerenderizado
+    stats["toc"] = render_tocs(doc)
+    stats["pages"] = round(stats["chars"] / (CHARS_PER_LINE * LINES_PER_PAGE), 1)
+    return stats
+
+# -------------------------
+# PLANTILLA + MARKDOWN
+# -------------------------
+
+def render_template(fmt_type: str, sub_type: str, output_path: str, jobs: int = 1, deterministic: bool = False,
+                    compression: str = "balanced", cfg: dict = None):
+    """
+    Genera la plantilla en el mismo proceso con el generador de su familia. Con cfg
+    se usa ese contenido (ya cargado y modificado) en lugar del JSON de la plantilla.
+    """
+    if cfg is not None:
+        check_template(fmt_type, cfg)
+    source = cfg if cfg is not None else template_path(fmt_type, sub_type)
+    if fmt_type == "maestria":
+        from generador_maestria import generate
+        generate(source, output_path_override=output_path, jobs=jobs, deterministic=deterministic,
+                 compression=compression)
+    elif fmt_type == "informe":
+        from generador_informe_tesis import generar_documento_core
+        generar_documento_core(source, output_path, jobs=jobs, deterministic=deterministic,
+                               compression=compression)
+    else:
+        from generador_proyecto_tesis import SistemasHenyerEngine
+        engine = SistemasHenyerEngine.from_data(cfg) if cfg is not None else SistemasHenyerEngine(source)
+        engine.construir(output_path, jobs=jobs, deterministic=deterministic, compression=compression)
+
+
+def build_with_markdown(fmt_type: str, sub_type: str, lines, output_path: str,
+                        base_dir: str = None, jobs: int = 1, bib_text: str = None, style: str = None,
+                        compression: str = "balanced") -> dict:
+    fmt_type, sub_type = resolve_key(fmt_type, sub_type)
+    cfg = load_template(fmt_type, sub_type)
+    bibliography = None
+    if bib_text:
+        bibliography = Bibliography.from_text(bib_text, style=style or citation_style(fmt_type, cfg))
+    render_template(fmt_type, sub_type, output_path, jobs=jobs, compression="fast")
+    doc = Document(output_path)
+    stats = ingest_markdown(doc, lines, fmt_type, cfg, base_dir=base_dir, bibliography=bibliography)
+    save_document(doc, output_path, compression=compression)
+    return stats
+
+# -------------------------
+# BENCHMARK
+# -------------------------
+
+def synthetic_markdown(pages: int):
+    """Markdown de prueba de ~pages paginas repartido en los titulos de la plantilla."""
+    sentence = "El presente estudio analiza la variable de interes en la poblacion objetivo. "
+    per_page = CHARS_PER_LINE * LINES_PER_PAGE
+    for page in range(pages):
+        if page % 10 == 0:
+            yield f"## Seccion {page // 10 + 1}\n"
+            yield "\n"
+        written = 0
+        while written < per_page:
+            text = sentence * 6
+            yield text + "\n"
+            yield "\n"
+            written += len(text)
+        if page % 5 == 0:
+            yield "- Primer punto con **enfasis** y una nota[^n%d]\n" % page
+            yield "- Segundo punto\n"
+            yield "\n"
+            yield "| Indicador | Valor |\n"
+            yield "|---|---|\n"
+            yield f"| Pagina | {page} |\n"
+            yield "\n"
+            yield "[^n%d]: Nota de la pagina %d.\n" % (page, page)
+            yield "\n"
+
+
+def run_bench(fmt_type: str, sub_type: str, pages: int) -> dict:
+    fmt_type, sub_type = resolve_key(fmt_type, sub_type)
+    cfg = load_template(fmt_type, sub_type)
+    first = template_headings(fmt_type, cfg)
+    anchor = next((text for level, text in first if level == 1), first[0][1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base.docx")
+        render_template(fmt_type, sub_type, base)
+        doc = Document(base)
+        t0 = time.perf_counter()
+        lines = iter([f"# {anchor}\n", "\n"])
+        stats = ingest_markdown(doc, (line for src in (lines, synthetic_markdown(pages)) for line in src),
+                                fmt_type, cfg)
+        t_ingest = time.perf_counter() - t0
+        out = io.BytesIO()
+        save_document(doc, out)
+        t_total = time.perf_counter() - t0
+    return {
+        "pages": stats["pages"],
+        "blocks": stats["blocks"],
+        "ingest_s": round(t_ingest, 2),
+        "total_s": round(t_total, 2),
+        "pages_per_s": round(stats["pages"] / t_total, 1) if t_total else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera una plantilla UNAC con los capitulos escritos en Markdown")
+    parser.add_argument("markdown", nargs="?", help="Archivo .md con titulos iguales a los de la plantilla")
+    parser.add_argument("salida", nargs="?", help="DOCX de salida")
+    parser.add_argument("--format", default="informe", help="proyecto | informe | maestria")
+    parser.add_argument("--sub-type", default="cuant", help="cuant | cual")
+    parser.add_argument("--jobs", type=int, default=1, help="Procesos para generar la plantilla")
+    parser.add_argument("--bib", help="Bibliografia BibTeX (.bib) o CSL-JSON (.json) para las citas [@clave]")
+    parser.add_argument("--style", choices=CITATION_STYLES, help="Estilo de citas (por defecto el de la plantilla)")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_LEVELS), default="balanced",
+                        help="Nivel de deflate del DOCX: fast, balanced o small")
+    parser.add_argument("--bench", type=int, metavar="PAGINAS", help="Mide paginas/segundo con texto sintetico")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.bench:
+        result = run_bench(args.format, args.sub_type, args.bench)
+        print(f"[OK] {result['pages']} paginas, {result['blocks']} bloques: ingesta {result['ingest_s']}s, "
+              f"total {result['total_s']}s ({result['pages_per_s']} paginas/s)")
+        sys.exit(0)
+
+    if not args.markdown or not args.salida:
+        parser.error("se requieren markdown y salida (o --bench)")
+    try:
+        bib_text = None
+        if args.bib:
+            with open(args.bib, "r", encoding="utf-8") as f:
+                bib_text = f.read()
+        with open(args.markdown, "r", encoding="utf-8") as md:
+            stats = build_with_markdown(args.format, args.sub_type, md, args.salida,
+                                        base_dir=os.path.dirname(os.path.abspath(args.markdown)),
+                                        jobs=max(1, args.jobs), bib_text=bib_text, style=args.style,
+                                        compression=args.compression)
+    except (OSError, ValueError) as exc:
+        print(f"[ERROR] No se pudo generar: {exc}")
+        sys.exit(1)
+    print(f"[OK] {stats['anchors']} titulos completados, ~{stats['pages']} paginas de contenido")
+    if stats["skipped"]:
+        print(f"[WARN] {stats['skipped']} bloque(s) antes del primer titulo reconocido se omitieron")
+    if "references" in stats:
+        print(f"[OK] {stats['references']} referencias en la lista final")
+    if stats.get("missing_citations"):
+        print(f"[WARN] Claves sin entrada en la bibliografia: {', '.join(stats['missing_citations'])}")
@@ -0,0 +1,348 @@
+import argparse
+import posixpath
+import sys
+import time
+import zipfile
+
+from lxml import etree
+
+from docx_package import (
+    CONTENT_TYPES, CT_NS, DOCUMENT_PART, DOCUMENT_RELS, PKG_REL_NS, R_NS, STYLES_PART,
+    add_default, add_override, add_relationship, copy_member_raw, open_mapped_zip,
+    rels_path, resolve_target, to_xml_bytes, w,
+)
+from format_checker import heading_key, read_styles
+from format_rules import HEADING_STYLES, PLACEHOLDER
+
+WP_DOCPR = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr"
+STYLE_REFS = ("pStyle", "rStyle", "tblStyle")
+# Referencias a partes que no se copian (notas, comentarios, listas del estudiante)
+DROPPED_REFS = ("footnoteReference", "endnoteReference", "commentReference",
+                "commentRangeStart", "commentRangeEnd")
+REWRITTEN = {CONTENT_TYPES, DOCUMENT_PART, DOCUMENT_RELS}
+# La plantilla puede ser de cualquier familia: se aceptan sus estilos de titulo propios
+TEMPLATE_HEADING_STYLES = {name: level for styles in HEADING_STYLES.values() for name, level in styles.items()}
+
+
+def _rels_map(zf: zipfile.ZipFile, part_name: str) -> dict:
+    """{rId: (tipo, target, externo)} del .rels de una parte (vacio si no tiene)."""
+    name = rels_path(part_name)
+    if name not in zf.NameToInfo:
+        return {}
+    return {
+        el.get("Id"): (el.get("Type"), el.get("Target"), el.get("TargetMode") == "External")
+        for el in etree.fromstring(zf.read(name))
+    }
+
+
+def _style_ids(zf: zipfile.ZipFile) -> set:
+    if STYLES_PART not in zf.NameToInfo:
+        return set()
+    root = etree.fromstring(zf.read(STYLES_PART))
+    return {el.get(w("styleId")) for el in root.iter(w("style"))}
+
+
+def _is_heading(p, heading_ids: dict) -> int:
+    pstyle = p.find(f"{w('pPr')}/{w('pStyle')}")
+    return heading_ids.get(pstyle.get(w("val")), 0) if pstyle is not None else 0
+
+
+def _paragraph_text(p) -> str:
+    return "".join(t.text or "" for t in p.iter(w("t"))).strip()
+
+
+def _ends_template_section(el, heading_ids: dict) -> bool:
+    """Limite del bloque de un titulo: otro titulo, un salto de pagina (explicito o
+    pageBreakBefore) o de seccion."""
+    if el.tag == w("sectPr"):
+        return True
+    if el.tag != w("p"):
+        return False
+    if _is_heading(el, heading_ids) or el.find(f"{w('pPr')}/{w('sectPr')}") is not None:
+        return True
+    if el.find(f"{w('pPr')}/{w('pageBreakBefore')}") is not None:
+        return True
+    return any(br.get(w("type")) == "page" for br in el.iter(w("br")))
+
+# -------------------------
+# COPIA DE PARTES (MEDIA, GRAFICOS, OBJETOS)
+# -------------------------
+
+class PartCopier:
+    """Copia partes del paquete del estudiante (y sus .rels, recursivamente) con nombre nuevo."""
+
+    def __init__(self, zin: zipfile.ZipFile, taken: set, ct_src, ct_dst):
+        self.zin = zin
+        self.taken = taken
+        self.ct_src = ct_src
+        self.ct_dst = ct_dst
+        self.renamed = {}
+        self.rels_parts = {}
+
+    def _new_name(self, part_name: str) -> str:
+        folder, name = posixpath.split(part_name)
+        candidate, n = posixpath.join(folder, f"est_{name}"), 1
+        while candidate in self.taken:
+            n += 1
+            candidate = posixpath.join(folder, f"est{n}_{name}")
+        self.taken.add(candidate)
+        return candidate
+
+    def _content_type(self, old: str, new: str):
+        for el in self.ct_src.iter(f"{{{CT_NS}}}Override"):
+            if el.get("PartName") == "/" + old:
+                add_override(self.ct_dst, new, el.get("ContentType"))
+                return
+        ext = posixpath.splitext(old)[1].lstrip(".").lower()
+        for el in self.ct_src.iter(f"{{{CT_NS}}}Default"):
+            if el.get("Extension", "").lower() == ext:
+                add_default(self.ct_dst, ext, el.get("ContentType"))
+                return
+
+    def copy(self, part_name: str) -> str:
+        if part_name in self.renamed:
+            return self.renamed[part_name]
+        if part_name not in self.zin.NameToInfo:
+            raise ValueError(f"Parte referenciada inexistente: {part_name}")
+        new = self.renamed[part_name] = self._new_name(part_name)
+        self._content_type(part_name, new)
+
+        rels = _rels_map(self.zin, part_name)
+        if rels:
+            root = etree.Element(f"{{{PKG_REL_NS}}}Relationships", nsmap={None: PKG_REL_NS})
+            for rid, (reltype, target, external) in rels.items():
+                if not external:
+                    target = posixpath.relpath(self.copy(resolve_target(part_name, target)),
+                                               posixpath.dirname(new))
+                attrs = {"Id": rid, "Type": reltype, "Target": target}
+                if external:
+                    attrs["TargetMode"] = "External"
+                etree.SubElement(root, f"{{{PKG_REL_NS}}}Relationship", **attrs)
+            self.rels_parts[rels_path(new)] = to_xml_bytes(root)
+        return new
+
+    def write(self, zout: zipfile.ZipFile):
+        for name, data in self.rels_parts.items():
+            zout.writestr(name, data)
+        # Bytes comprimidos tal cual: las imagenes no se inflan ni se recomprimen
+        for old, new in self.renamed.items():
+            copy_member_raw(self.zin, zout, self.zin.NameToInfo[old], arcname=new)
+
+# -------------------------
+# CONTENIDO DEL ESTUDIANTE
+# -------------------------
+
+class ContentAdapter:
+    """Adapta bloques del body del estudiante al paquete de la plantilla."""
+
+    def __init__(self, student_rels: dict, copier: PartCopier, doc_rels, tpl_styles: set,
+                 tpl_heading_by_level: dict, st_heading_ids: dict, docpr_start: int, bookmark_start: int):
+        self.student_rels = student_rels
+        self.copier = copier
+        self.doc_rels = doc_rels
+        self.tpl_styles = tpl_styles
+        self.tpl_heading_by_level = tpl_heading_by_level
+        self.st_heading_ids = st_heading_ids
+        self.rid_map = {}
+        self.next_docpr = docpr_start
+        self.bookmark_offset = bookmark_start
+        self.stats = {"dropped_refs": 0, "dropped_lists": 0, "parts": 0, "external_links": 0}
+
+    def _map_rid(self, rid: str) -> str:
+        if rid in self.rid_map:
+            return self.rid_map[rid]
+        if rid not in self.student_rels:
+            return rid
+        reltype, target, external = self.student_rels[rid]
+        if external:
+            new_rid = add_relationship(self.doc_rels, reltype, target, external=True)
+            self.stats["external_links"] += 1
+        else:
+            new_part = self.copier.copy(resolve_target(DOCUMENT_PART, target))
+            new_rid = add_relationship(self.doc_rels, reltype,
+                                       posixpath.relpath(new_part, posixpath.dirname(DOCUMENT_PART)))
+            self.stats["parts"] += 1
+        self.rid_map[rid] = new_rid
+        return new_rid
+
+    def adapt(self, block):
+        for sect in list(block.iter(w("sectPr"))):
+            sect.getparent().remove(sect)
+        for tag in DROPPED_REFS:
+            for ref in list(block.iter(w(tag))):
+                parent = ref.getparent()
+                # La marca de nota vive sola en su run: se quita el run completo
+                target = parent if parent.tag == w("r") and len(parent) <= 2 else ref
+                target.getparent().remove(target)
+                self.stats["dropped_refs"] += 1
+        for num_pr in list(block.iter(w("numPr"))):
+            num_pr.getparent().remove(num_pr)
+            self.stats["dropped_lists"] += 1
+
+        for tag in STYLE_REFS:
+            for ref in list(block.iter(w(tag))):
+                val = ref.get(w("val"))
+                level = self.st_heading_ids.get(val) if tag == "pStyle" else None
+                if level and level in self.tpl_heading_by_level:
+                    ref.set(w("val"), self.tpl_heading_by_level[level])
+                elif val not in self.tpl_styles:
+                    ref.getparent().remove(ref)
+
+        for el in block.iter():
+            for attr, rid in el.attrib.items():
+                if attr.startswith(f"{{{R_NS}}}"):
+                    el.set(attr, self._map_rid(rid))
+            if el.tag == WP_DOCPR:
+                el.set("id", str(self.next_docpr))
+                self.next_docpr += 1
+            elif el.tag in (w("bookmarkStart"), w("bookmarkEnd")) and el.get(w("id")) is not None:
+                el.set(w("id"), str(int(el.get(w("id"))) + self.bookmark_offset))
+        return block
+
+
+def split_sections(zin: zipfile.ZipFile, heading_ids: dict, adapter: ContentAdapter):
+    """Recorre el body del estudiante en streaming y lo corta en (titulo, nivel, bloques)."""
+    sections = [(None, 0, [])]
+    with zin.open(DOCUMENT_PART) as src:
+        for _event, el in etree.iterparse(src, huge_tree=True):
+            parent = el.getparent()
+            if parent is None or parent.tag != w("body") or el.tag == w("sectPr"):
+                continue
+            level = _is_heading(el, heading_ids) if el.tag == w("p") else 0
+            text = _paragraph_text(el) if level else ""
+            block = adapter.adapt(el)
+            parent.remove(block)
+            if level and text:
+                sections.append((text, level, [block]))
+            else:
+                sections[-1][2].append(block)
+    return sections
+
+# -------------------------
+# MERGE
+# -------------------------
+
+def _match_headings(sections: list, tpl_headings: list) -> list:
+    """Asigna cada seccion del estudiante a un titulo de la plantilla (o None)."""
+    used, pos, placement = set(), 0, []
+    keys = [heading_key(text) for _el, text in tpl_headings]
+    for title, _level, _blocks in sections:
+        key = heading_key(title) if title else ""
+        match = lambda i: keys[i] and i not in used and (
+            keys[i] == key or keys[i].startswith(key) or key.startswith(keys[i]))
+        idx = None
+        if key:
+            idx = next((i for i in range(pos, len(keys)) if match(i)), None)
+            if idx is None:
+                idx = next((i for i in range(pos) if match(i)), None)
+        if idx is not None:
+            used.add(idx)
+            pos = idx + 1
+        placement.append(idx)
+    return placement
+
+
+def _group_sections(sections: list, placement: list) -> list:
+    """Los subtitulos sin equivalente siguen dentro de la seccion ubicada que los contiene."""
+    groups, open_level = [], None
+    for (title, level, blocks), idx in zip(sections, placement):
+        if idx is None and groups and open_level is not None and level > open_level:
+            groups[-1][2].extend(blocks)
+            continue
+        open_level = level if idx is not None else None
+        if blocks:
+            groups.append((idx, title, list(blocks)))
+    return groups
+
+
+def merge_content(template_path: str, content_path: str, output_path: str) -> dict:
+    stats = {"sections": 0, "placed": 0, "unplaced_blocks": 0}
+    with open_mapped_zip(template_path) as ztpl, open_mapped_zip(content_path) as zst, \
+            zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zout:
+        for zf, label in ((ztpl, "plantilla"), (zst, "contenido")):
+            if DOCUMENT_PART not in zf.NameToInfo:
+                raise ValueError(f"El DOCX de {label} no es valido (falta {DOCUMENT_PART})")
+
+        doc_root = etree.fromstring(ztpl.read(DOCUMENT_PART))
+        doc_rels = etree.fromstring(ztpl.read(DOCUMENT_RELS))
+        ct_root = etree.fromstring(ztpl.read(CONTENT_TYPES))
+        body = doc_root.find(w("body"))
+
+        tpl_heading_ids = read_styles(ztpl, TEMPLATE_HEADING_STYLES)["heading_ids"]
+        st_heading_ids = read_styles(zst)["heading_ids"]
+        tpl_headings = [(p, _paragraph_text(p)) for p in body.iter(w("p")) if _is_heading(p, tpl_heading_ids)]
+        # Titulos del estudiante: el estilo que mas usa la plantilla en ese nivel
+        # (proyecto tiene varios de nivel 1: pagina, indice, capitulo)
+        used = {}
+        for p, _text in tpl_headings:
+            style_id = p.find(f"{w('pPr')}/{w('pStyle')}").get(w("val"))
+            used[style_id] = used.get(style_id, 0) + 1
+        by_level = {}
+        for style_id, level in sorted(tpl_heading_ids.items(), key=lambda item: -used.get(item[0], 0)):
+            by_level.setdefault(level, style_id)
+
+        copier = PartCopier(zst, set(ztpl.NameToInfo), etree.fromstring(zst.read(CONTENT_TYPES)), ct_root)
+        adapter = ContentAdapter(
+            _rels_map(zst, DOCUMENT_PART), copier, doc_rels, _style_ids(ztpl), by_level, st_heading_ids,
+            docpr_start=1 + max((int(el.get("id", 0)) for el in body.iter(WP_DOCPR)), default=0),
+            bookmark_start=1 + max((int(el.get(w("id"), 0)) for el in body.iter(w("bookmarkStart"))),
+                                   default=-1),
+        )
+        sections = split_sections(zst, st_heading_ids, adapter)
+
+        placement = _match_headings(sections, tpl_headings)
+        final_sect = body.find(w("sectPr"))
+        for idx, title, blocks in _group_sections(sections, placement):
+            stats["sections"] += 1
+            if idx is None:
+                # Sin titulo equivalente: al final del documento, con su propio titulo
+                stats["unplaced_blocks"] += len(blocks)
+                for block in blocks:
+                    final_sect.addprevious(block) if final_sect is not None else body.append(block)
+                continue
+            stats["placed"] += 1
+            anchor = tpl_headings[idx][0]
+            # La plantilla ya trae el titulo: se descarta el del estudiante
+            blocks = blocks[1:] if title else blocks
+            stop = anchor.getnext()
+            while stop is not None and not _ends_template_section(stop, tpl_heading_ids):
+                nxt = stop.getnext()
+                # El contenido reemplaza al marcador {{COMPLETAR}} de la plantilla
+                if stop.tag == w("p") and _paragraph_text(stop) == PLACEHOLDER:
+                    body.remove(stop)
+                stop = nxt
+            for block in blocks:
+                stop.addprevious(block) if stop is not None else body.append(block)
+
+        zout.writestr(CONTENT_TYPES, to_xml_bytes(ct_root))
+        zout.writestr(DOCUMENT_RELS, to_xml_bytes(doc_rels))
+        zout.writestr(DOCUMENT_PART, to_xml_bytes(doc_root))
+        for info in ztpl.infolist():
+            if info.filename not in REWRITTEN:
+                copy_member_raw(ztpl, zout, info)
+        copier.write(zout)
+
+    stats.update(adapter.stats)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inserta el contenido de un DOCX del estudiante en una plantilla UNAC")
+    parser.add_argument("plantilla", help="DOCX generado (p. ej. docs/UNAC_PROYECTO_CUANT.docx)")
+    parser.add_argument("contenido", help="DOCX con los capitulos del estudiante")
+    parser.add_argument("salida", help="DOCX combinado")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        stats = merge_content(args.plantilla, args.contenido, args.salida)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError) as exc:
+        print(f"[ERROR] No se pudo combinar: {exc}")
+        sys.exit(1)
+    print(f"[OK] Documento combinado: {args.salida} ({stats['placed']} secciones ubicadas, "
+          f"{stats['parts']} partes copiadas sin recomprimir, {time.perf_counter() - t0:.2f}s)")
+    if stats["unplaced_blocks"]:
+        print(f"[WARN] {stats['unplaced_blocks']} bloque(s) sin titulo equivalente quedaron al final")
+    if stats["dropped_refs"] or stats["dropped_lists"]:
+        print(f"[WARN] Se omitieron {stats['dropped_refs']} referencia(s) a notas/comentarios "
+              f"y {stats['dropped_lists']} numeracion(es) de lista")
@@ -0,0 +1,234 @@
+import contextvars
+import hashlib
+import importlib
+import io
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+from base_package import new_document
+from progress import step as progress_step
+
+GENERATOR_MODULES = {
+    "maestria": "generador_maestria",
+    "informe": "generador_informe_tesis",
+    "proyecto": "generador_proyecto_tesis",
+}
+
+# Lista de unidades de cada familia; el resto del JSON es contexto comun de los chunks
+UNIT_KEYS = {"maestria": "structure", "informe": "cuerpo", "proyecto": "paginas"}
+
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WP_DOCPR = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr"
+
+# -------------------------
+# PARTICION EN CHUNKS
+# -------------------------
+
+def _balanced(groups: list, n: int) -> list:
+    """Agrupa unidades contiguas en <= n chunks de tamano parecido."""
+    total = sum(len(g) for g in groups)
+    target = max(1, -(-total // n))
+    chunks, cur, size = [], [], 0
+    for g in groups:
+        if cur and size + len(g) > target and len(chunks) < n - 1:
+            chunks.append(cur); cur, size = [], 0
+        cur.extend(g); size += len(g)
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def split_chunks(family: str, cfg: dict, n: int) -> list:
+    if family == "maestria":
+        structure = cfg.get("structure", [])
+        rules = cfg.get("structure_rules", {})
+        break_after_level1 = bool(rules.get("page_break_after_level_1", True))
+        # Un capitulo = un titulo de nivel 1 con sus subtitulos
+        groups = []
+        for item in structure:
+            if int(item["level"]) == 1 or not groups:
+                groups.append([])
+            groups[-1].append(item)
+        chunks = _balanced(groups, n)
+        specs = []
+        for k, items in enumerate(chunks):
+            nxt = chunks[k + 1][0] if k + 1 < len(chunks) else None
+            # Mismo criterio que add_structure_from_cfg en la frontera del chunk
+            brk = (break_after_level1 and nxt is not None
+                   and int(items[-1]["level"]) == 1 and int(nxt["level"]) == 1)
+            specs.append({"items": items, "break_after": brk})
+        return specs
+
+    if family == "informe":
+        return [{"items": chunk} for chunk in _balanced([[cap] for cap in cfg.get("cuerpo", [])], n)]
+
+    if family == "proyecto":
+        indexed = [[(i, pag)] for i, pag in enumerate(cfg.get("paginas", []))]
+        return [{"items": chunk} for chunk in _balanced(indexed, n)]
+
+    raise ValueError(f"Familia sin soporte de render paralelo: {family}")
+
+# -------------------------
+# RENDER DE UN CHUNK
+# -------------------------
+
+def render_into(family: str, doc, cfg: dict, spec: dict):
+    gen = importlib.import_module(GENERATOR_MODULES[family])
+    if family == "maestria":
+        gen.add_structure_from_cfg(doc, dict(cfg, structure=spec["items"]))
+        if spec.get("break_after"):
+            doc.add_page_break()
+    elif family == "informe":
+        gen.agregar_cuerpo_dinamico(doc, dict(cfg, cuerpo=spec["items"]))
+    elif family == "proyecto":
+        engine = gen.SistemasHenyerEngine.from_data(cfg, doc=doc)
+        for i, pag in spec["items"]:
+            engine.render_pagina(i, pag)
+
+
+def render_chunk(family: str, cfg: dict, spec: dict) -> dict:
+    """Corre en un proceso worker: renderiza el chunk y devuelve el XML del body."""
+    doc = new_document()
+    render_into(family, doc, cfg, spec)
+    body = doc.element.body
+    for sect in body.findall(qn("w:sectPr")):
+        body.remove(sect)
+
+    rels = {}
+    for el in body.iter():
+        for attr, rid in el.attrib.items():
+            if not attr.startswith("{%s}" % R_NS) or rid in rels:
+                continue
+            rel = doc.part.rels[rid]
+            if rel.is_external:
+                rels[rid] = ("external", rel.reltype, rel.target_ref)
+            elif rel.reltype == RT.IMAGE:
+                rels[rid] = ("image", rel.reltype, rel.target_part.blob)
+
+    # Estilos creados dentro del chunk (p. ej. 'Subtitulo Guia'): viajan con el fragmento
+    used = {el.get(qn("w:val")) for el in body.iter(qn("w:pStyle"), qn("w:rStyle"), qn("w:tblStyle"))}
+    styles = [etree.tostring(style) for style in doc.styles.element.findall(qn("w:style"))
+              if style.get(qn("w:styleId")) in used]
+    return {"xml": etree.tostring(body), "rels": rels, "styles": styles}
+
+# -------------------------
+# MERGE
+# -------------------------
+
+def merge_fragment(doc, fragment: dict, next_docpr_id: int) -> int:
+    """Inserta el body del fragmento antes del sectPr final, renumerando rIds y docPr."""
+    rid_map = {}
+    for old_rid, (kind, reltype, payload) in fragment["rels"].items():
+        if kind == "image":
+            rid_map[old_rid], _image = doc.part.get_or_add_image(io.BytesIO(payload))
+        else:
+            rid_map[old_rid] = doc.part.relate_to(payload, reltype, is_external=True)
+
+    styles = doc.styles.element
+    have = {style.get(qn("w:styleId")) for style in styles.findall(qn("w:style"))}
+    for xml in fragment.get("styles", ()):
+        style = parse_xml(xml)
+        if style.get(qn("w:styleId")) not in have:
+            styles.append(style)
+            have.add(style.get(qn("w:styleId")))
+
+    frag_body = parse_xml(fragment["xml"])
+    for el in frag_body.iter():
+        for attr, rid in el.attrib.items():
+            if attr.startswith("{%s}" % R_NS) and rid in rid_map:
+                el.set(attr, rid_map[rid])
+        if el.tag == WP_DOCPR:
+            el.set("id", str(next_docpr_id))
+            if el.get("name", "").startswith("Picture "):
+                el.set("name", f"Picture {next_docpr_id}")
+            next_docpr_id += 1
+
+    body = doc.element.body
+    sect = body.find(qn("w:sectPr"))
+    for child in list(frag_body):
+        if sect is not None:
+            sect.addprevious(child)
+        else:
+            body.append(child)
+    return next_docpr_id
+
+
+def render_parallel(family: str, doc, cfg: dict, jobs: int):
+    if _CHUNK_CACHE.get() is not None:
+        render_incremental(family, doc, cfg)
+        return
+    specs = split_chunks(family, cfg, jobs)
+    if len(specs) < 2:
+        for spec in specs:
+            render_into(family, doc, cfg, spec)
+        return
+
+    next_id = 1 + max((int(el.get("id", 0)) for el in doc.element.body.iter(WP_DOCPR)), default=0)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(specs))) as pool:
+        # map conserva el orden de los chunks
+        fragments = pool.map(render_chunk, [family] * len(specs), [cfg] * len(specs), specs)
+        for k, fragment in enumerate(fragments, start=1):
+            progress_step("structure", k, len(specs))
+            next_id = merge_fragment(doc, fragment, next_id)
+
+# -------------------------
+# CACHE DE CHUNKS (MODO WATCH)
+# -------------------------
+
+_CHUNK_CACHE = contextvars.ContextVar("unac_chunk_cache", default=None)
+
+
+@contextmanager
+def chunk_cache(cache: dict, salt: str = ""):
+    """
+    Dentro del bloque, render_parallel arma el cuerpo con un chunk por capitulo o
+    pagina y reutiliza los fragmentos de 'cache' cuyo contenido no cambio. 'salt'
+    entra en todas las claves (firma de los assets: un logo nuevo invalida todo).
+    """
+    stats = {"reused": 0, "rendered": 0}
+    token = _CHUNK_CACHE.set((cache, salt, stats))
+    try:
+        yield stats
+    finally:
+        _CHUNK_CACHE.reset(token)
+
+
+def incremental() -> bool:
+    return _CHUNK_CACHE.get() is not None
+
+
+def _chunk_key(family: str, context: bytes, spec: dict, salt: str) -> str:
+    h = hashlib.sha1(family.encode("utf-8"))
+    h.update(context)
+    h.update(pickle.dumps(spec, protocol=4))
+    h.update(salt.encode("utf-8"))
+    return h.hexdigest()
+
+
+def render_incremental(family: str, doc, cfg: dict):
+    """Secuencial y en este proceso: solo se renderizan los chunks nuevos o cambiados."""
+    cache, salt, stats = _CHUNK_CACHE.get()
+    units = cfg.get(UNIT_KEYS[family], [])
+    specs = split_chunks(family, cfg, max(1, len(units)))
+    context = pickle.dumps({k: v for k, v in cfg.items() if k != UNIT_KEYS[family]}, protocol=4)
+    next_id = 1 + max((int(el.get("id", 0)) for el in doc.element.body.iter(WP_DOCPR)), default=0)
+    live = {}
+    for spec in specs:
+        key = _chunk_key(family, context, spec, salt)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = render_chunk(family, cfg, spec)
+            stats["rendered"] += 1
+        else:
+            stats["reused"] += 1
+        live[key] = fragment
+        next_id = merge_fragment(doc, fragment, next_id)
+    # Solo quedan los fragmentos del ultimo render
+    cache.clear()
+    cache.update(live)
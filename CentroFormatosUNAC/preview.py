@@ -0,0 +1,266 @@
+import hashlib
+import html
+import math
+import os
+import threading
+
+from templates import ENFOQUES, load_template, template_path
+
+# Estimacion gruesa de maquetacion A4 (Arial 12, margenes UNAC)
+CHARS_PER_LINE = 80
+LINES_PER_PAGE = 32
+BLOCK_LINES = {"logo": 6, "table": 5, "field": 3}
+
+# -------------------------
+# PAGINAS LOGICAS DESDE EL JSON
+# -------------------------
+# Cada pagina es una lista de bloques {"kind", "text", "level"} en el mismo
+# orden en que los generadores escriben los parrafos y saltos de pagina.
+
+def _block(kind: str, text: str = "", level: int = 0, **extra) -> dict:
+    return dict(kind=kind, text=str(text), level=level, **extra)
+
+
+def _pages_maestria(cfg: dict) -> list:
+    pages, cur = [], []
+    cover = cfg.get("cover", {})
+    cur.append(_block("logo"))
+    for text, bold in [
+        (cover.get("universidad_linea", ""), True),
+        (cover.get("unidad", ""), False),
+        (f'"{cover.get("titulo", "")}"', True),
+        (f"TESIS PARA OPTAR EL GRADO ACADEMICO DE {cover.get('grado_maestria', '')}", True),
+        (cover.get("autor", ""), False),
+        (cover.get("asesor", ""), False),
+        (f"LINEA DE INVESTIGACION: {cover.get('linea', '')}", False),
+        (f"{cover.get('ciudad', '')}, {cover.get('anio', '')}", False),
+        (cover.get("pais", "PERU"), False),
+    ]:
+        cur.append(_block("center", text.upper(), bold=bold))
+    pages.append(cur); cur = []
+
+    for blk in cfg.get("pre_pages", []):
+        if blk.get("title"):
+            cur.append(_block("heading", blk["title"], int(blk.get("title_level", 4))))
+        cur.extend(_block("text", line) for line in blk.get("lines", []))
+        if blk.get("page_break_after", True):
+            pages.append(cur); cur = []
+
+    toc = cfg.get("toc", {"min_level": 1, "max_level": 3})
+    cur += [_block("center", "INDICE", bold=True),
+            _block("field", f"Tabla de contenido (niveles {toc.get('min_level', 1)}-{toc.get('max_level', 3)})")]
+    pages.append(cur); cur = []
+    if cfg.get("include_list_of_tables", False):
+        pages.append([_block("center", "INDICE DE TABLAS", bold=True), _block("field", "Indice de tablas")])
+    if cfg.get("include_list_of_figures", False):
+        pages.append([_block("center", "INDICE DE FIGURAS", bold=True), _block("field", "Indice de figuras")])
+
+    rules = cfg.get("structure_rules", {})
+    add_placeholder = bool(rules.get("add_placeholder_after_heading", True))
+    break_after_level1 = bool(rules.get("page_break_after_level_1", True))
+    structure = cfg.get("structure", [])
+    for i, item in enumerate(structure):
+        lvl = int(item["level"])
+        cur.append(_block("heading", item["title"], lvl))
+        if add_placeholder and bool(item.get("placeholder", True)):
+            cur.append(_block("placeholder", "{{COMPLETAR}}"))
+        cur.extend(_block("text", line) for line in item.get("lines", []))
+        if break_after_level1 and lvl == 1 and i < len(structure) - 1:
+            if int(structure[i + 1]["level"]) == 1:
+                pages.append(cur); cur = []
+    pages.append(cur)
+    return pages
+
+
+def _pages_informe(cfg: dict) -> list:
+    pages = []
+    c = cfg.get("caratula", {})
+    cur = [_block("center", c.get(k, ""), bold=True) for k in ("universidad", "facultad", "escuela")]
+    cur.append(_block("logo"))
+    for key, bold in [("tipo_documento", True), ("titulo_placeholder", True), ("frase_grado", False),
+                      ("grado_objetivo", True), ("label_autor", True), ("label_asesor", True),
+                      ("label_linea", False), ("fecha", False), ("pais", True)]:
+        cur.append(_block("center", c.get(key, ""), bold=bold))
+    pages.append(cur)
+
+    pre = cfg.get("preliminares", {})
+    for key in ("dedicatoria", "resumen"):
+        if key in pre:
+            pages.append([_block("heading", pre[key]["titulo"], 1), _block("text", pre[key]["texto"])])
+    if "indices" in pre:
+        pages.append([_block("heading", pre["indices"]["contenido"], 1), _block("field", "Tabla de contenido")])
+    if "introduccion" in pre:
+        pages.append([_block("heading", pre["introduccion"]["titulo"], 1),
+                      _block("text", pre["introduccion"]["texto"])])
+
+    for cap in cfg.get("cuerpo", []):
+        cur = [_block("heading", cap["titulo"], 1)]
+        cur.extend(_block("heading", item["texto"], 2) for item in cap.get("contenido", []))
+        pages.append(cur)
+
+    fin = cfg.get("finales", {})
+    if "referencias" in fin:
+        pages.append([_block("heading", fin["referencias"]["titulo"], 1)])
+    if "anexos" in fin:
+        pages.append([_block("heading", fin["anexos"]["titulo_seccion"], 1)])
+    return pages
+
+
+def _pages_proyecto(cfg: dict) -> list:
+    pages = []
+    for pag in cfg.get("paginas", []):
+        cur = [_block("table", "I + D + i + e  |  PROYECTO DE INVESTIGACION - TESIS")]
+        tipo = pag.get("tipo", "generico")
+        if tipo in ("caratula", "lista"):
+            if pag.get("titulo"):
+                cur.append(_block("heading", pag["titulo"], 1))
+            cur.extend(_block("text", item) for item in pag.get("items", []))
+        elif tipo == "indice":
+            cur.append(_block("heading", pag.get("titulo", "INDICE"), 1))
+            for item in pag.get("items", []):
+                cur.append(_block("text", item.get("texto", ""), indent=int(item.get("indent", 0)),
+                                  bold=bool(item.get("bold"))))
+        elif tipo == "contenido_detallado":
+            for cap in pag.get("capitulos", []):
+                if cap.get("titulo"):
+                    cur.append(_block("heading", cap["titulo"], 1))
+                for sec in cap.get("secciones", []):
+                    if sec.get("sub"):
+                        cur.append(_block("heading", sec["sub"], 2))
+                    if sec.get("texto"):
+                        cur.append(_block("text", sec["texto"]))
+        pages.append(cur)
+    return pages
+
+
+PAGE_BUILDERS = {
+    "maestria": _pages_maestria,
+    "informe": _pages_informe,
+    "proyecto": _pages_proyecto,
+}
+
+# -------------------------
+# OUTLINE / ESTIMACION DE PAGINAS
+# -------------------------
+
+def _block_lines(blk: dict) -> int:
+    if blk["kind"] in BLOCK_LINES:
+        return BLOCK_LINES[blk["kind"]]
+    lines = sum(max(1, math.ceil(len(part) / CHARS_PER_LINE)) for part in blk["text"].split("\n"))
+    return lines + (1 if blk["kind"] == "heading" else 0)
+
+
+def build_outline(fmt_type: str, cfg: dict) -> dict:
+    pages = PAGE_BUILDERS[fmt_type](cfg)
+    headings, page_no = [], 1
+    for n, blocks in enumerate(pages):
+        used = 0
+        for blk in blocks:
+            if blk["kind"] == "heading":
+                headings.append({
+                    "level": blk["level"],
+                    "text": blk["text"],
+                    "page": page_no + used // LINES_PER_PAGE,
+                    "logical_page": n + 1,
+                })
+            used += _block_lines(blk)
+        page_no += max(1, math.ceil(used / LINES_PER_PAGE))
+    return {
+        "headings": headings,
+        "logical_pages": len(pages),
+        "estimated_pages": page_no - 1,
+        "pages": pages,
+    }
+
+# -------------------------
+# HTML
+# -------------------------
+
+PREVIEW_CSS = """
+body { background: #e9e6df; font-family: Arial, sans-serif; margin: 0; padding: 24px; }
+.meta { max-width: 794px; margin: 0 auto 16px; color: #444; font-size: 14px; }
+.page { background: #fff; width: 794px; min-height: 1123px; margin: 0 auto 24px; box-sizing: border-box;
+        padding: 113px 94px 113px 132px; box-shadow: 0 6px 18px rgba(0,0,0,.15); position: relative; }
+.page .num { position: absolute; right: 94px; bottom: 48px; font-size: 10pt; color: #777; }
+.center { text-align: center; text-transform: none; margin: 6pt 0; }
+.bold { font-weight: bold; }
+h1 { font-size: 14pt; } h2, h3, h4, h5 { font-size: 12pt; }
+.placeholder { color: #9d2c2c; font-family: monospace; }
+.field, .logo, .table { border: 1px dashed #999; color: #666; padding: 10px; margin: 10px 0; text-align: center; font-size: 10pt; }
+.logo { height: 90px; line-height: 70px; width: 140px; margin: 0 auto 12px; }
+"""
+
+
+def render_html(fmt_type: str, sub_type: str, outline: dict) -> str:
+    esc = html.escape
+    out = [
+        "<!DOCTYPE html><html lang=\"es\"><head><meta charset=\"UTF-8\">",
+        f"<title>Vista previa {esc(fmt_type)} / {esc(sub_type)}</title>",
+        f"<style>{PREVIEW_CSS}</style></head><body>",
+        f"<div class=\"meta\">Vista previa de <b>{esc(fmt_type)}</b> ({esc(ENFOQUES.get(sub_type, sub_type))}) "
+        f"&middot; {len(outline['headings'])} titulos &middot; ~{outline['estimated_pages']} paginas</div>",
+    ]
+    for n, blocks in enumerate(outline["pages"], start=1):
+        out.append("<section class=\"page\">")
+        for blk in blocks:
+            kind, text = blk["kind"], esc(blk["text"])
+            if kind == "heading":
+                lvl = min(max(blk["level"], 1), 5)
+                out.append(f"<h{lvl}>{text}</h{lvl}>")
+            elif kind == "center":
+                cls = "center bold" if blk.get("bold") else "center"
+                out.append(f"<p class=\"{cls}\">{text}</p>")
+            elif kind == "placeholder":
+                out.append(f"<p class=\"placeholder\">{text}</p>")
+            elif kind == "logo":
+                out.append("<div class=\"logo\">LOGO UNAC</div>")
+            elif kind in ("field", "table"):
+                out.append(f"<div class=\"{kind}\">{text}</div>")
+            else:
+                indent = blk.get("indent", 0) * 0.7
+                cls = " class=\"bold\"" if blk.get("bold") else ""
+                out.append(f"<p{cls} style=\"margin-left:{indent}cm\">{text}</p>")
+        out.append(f"<span class=\"num\">{n}</span></section>")
+    out.append("</body></html>")
+    return "".join(out)
+
+# -------------------------
+# CACHE
+# -------------------------
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def get_preview(fmt_type: str, sub_type: str) -> dict:
+    """Devuelve {"html", "outline", "etag"} cacheado mientras el JSON no cambie."""
+    path = template_path(fmt_type, sub_type)
+    try:
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+
+    key = (fmt_type, sub_type)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit and hit[0] == signature:
+            return hit[1]
+
+    cfg = load_template(fmt_type, sub_type)
+    outline = build_outline(fmt_type, cfg)
+    page_html = render_html(fmt_type, sub_type, outline)
+    result = {
+        "html": page_html,
+        "outline": {
+            "format": fmt_type,
+            "sub_type": sub_type,
+            "headings": outline["headings"],
+            "logical_pages": outline["logical_pages"],
+            "estimated_pages": outline["estimated_pages"],
+        },
+        "etag": hashlib.sha1(page_html.encode("utf-8")).hexdigest(),
+    }
+    with _LOCK:
+        _CACHE[key] = (signature, result)
+    return result
@@ -0,0 +1,44 @@
+import contextvars
+from contextlib import contextmanager
+
+# Etapas que ve el cliente (GET /jobs/<id>/events)
+STAGES = ("queued", "started", "rendering", "serializing", "done", "failed", "cancelled")
+TERMINAL_STAGES = ("done", "failed", "cancelled")
+# Secciones de build_section() que no son etapa propia (van dentro de otra)
+NESTED_SECTIONS = ("header_tables",)
+SECTION_STAGES = {"save": "serializing"}
+
+_SINK = contextvars.ContextVar("unac_progress", default=None)
+
+
+@contextmanager
+def progress_sink(callback):
+    """callback(evento) recibe las etapas que emita lo que se genere dentro del bloque."""
+    token = _SINK.set(callback)
+    try:
+        yield
+    finally:
+        _SINK.reset(token)
+
+
+def emit(stage: str, **fields):
+    """Sin progress_sink() activo no hace nada: los generadores llaman siempre."""
+    sink = _SINK.get()
+    if sink is not None:
+        sink(dict(fields, stage=stage))
+
+
+def section_started(name: str):
+    """Entrada de build_section(): cada seccion de primer nivel es una etapa."""
+    if _SINK.get() is None or name in NESTED_SECTIONS:
+        return
+    stage = SECTION_STAGES.get(name, "rendering")
+    if stage == "rendering":
+        emit(stage, section=name)
+    else:
+        emit(stage)
+
+
+def step(section: str, k: int, total: int):
+    """Avance dentro de una seccion (capitulo k de N)."""
+    emit("rendering", section=section, step=k, total=total)
@@ -0,0 +1,466 @@
+import argparse
+import atexit
+import bisect
+import hashlib
+import hmac
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from shared_cache import get_shared_cache, render_key
+from schemas import validate_render_request
+from templates import BASE_DIR, apply_overrides, iter_templates, load_template, resolve_key
+from unac_logging import REQUEST_ID_HEADER, current_request_id, get_logger, install_request_ids, setup_logging
+from weight_report import collect_timings
+from worker_pool import WALL_TIMEOUT_S, JobTimeout, WorkerPool
+
+VNODES = 64
+HEALTH_INTERVAL_S = float(os.environ.get("UNAC_FARM_HEALTH_S", 5))
+HEALTH_TIMEOUT_S = 2
+# Por encima del limite del worker, para recibir su 504 en lugar de cortar antes
+RENDER_TIMEOUT_S = float(os.environ.get("UNAC_FARM_TIMEOUT_S", WALL_TIMEOUT_S + 10))
+# Sondeos fallidos seguidos antes de sacar un worker del anillo
+FAIL_THRESHOLD = 2
+# Altas y bajas por HTTP (POST/DELETE /farm/workers) solo con este token; sin el,
+# los workers salen unicamente de UNAC_RENDER_WORKERS
+FARM_TOKEN_ENV = "UNAC_FARM_TOKEN"
+FARM_TOKEN_HEADER = "X-Farm-Token"
+MAX_ATTEMPTS = 3
+RENDER_OPTIONS = ("jobs", "deterministic", "compression", "overrides")
+
+log = get_logger("render_farm")
+
+
+class FarmError(RuntimeError):
+    """Ningun worker pudo atender el render."""
+
+# -------------------------
+# ANILLO DE HASH CONSISTENTE
+# -------------------------
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Cada worker ocupa VNODES puntos del anillo; una clave va al primer punto a su
+    derecha. Al entrar o salir un worker solo cambian de dueno ~1/N de las claves,
+    el resto sigue cayendo en el mismo worker (caches calientes).
+    """
+
+    def __init__(self, nodes=(), vnodes: int = VNODES):
+        self.vnodes = vnodes
+        self.points = []
+        self.owners = {}
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> set:
+        return set(self.owners.values())
+
+    def add(self, node: str):
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+                self.owners[point] = node
+
+    def remove(self, node: str):
+        self.points = [p for p in self.points if self.owners[p] != node]
+        self.owners = {p: n for p, n in self.owners.items() if n != node}
+
+    def preference(self, key: str) -> list:
+        """Workers distintos en orden de recorrido: el dueno primero, luego los reintentos."""
+        if not self.points:
+            return []
+        start = bisect.bisect(self.points, _hash(key))
+        order, total = [], len(self.nodes)
+        for k in range(len(self.points)):
+            node = self.owners[self.points[(start + k) % len(self.points)]]
+            if node not in order:
+                order.append(node)
+                if len(order) == total:
+                    break
+        return order
+
+# -------------------------
+# WORKER DE RENDER (HTTP)
+# -------------------------
+
+def render_bytes(fmt_type: str, sub_type: str, options: dict) -> bytes:
+    """
+    Genera la plantilla en este proceso y devuelve el DOCX en memoria. Lo que ya
+    renderizo cualquier proceso del equipo sale de la cache compartida.
+    """
+    cache = get_shared_cache()
+    key = render_key(fmt_type, sub_type, options) if cache else None
+    if cache:
+        payload = cache.get(key)
+        if payload is not None:
+            return payload
+    payload = _render_fresh(fmt_type, sub_type, options)
+    if cache:
+        cache.put(key, payload)
+    return payload
+
+
+def _render_fresh(fmt_type: str, sub_type: str, options: dict) -> bytes:
+    from markdown_ingest import render_template
+
+    jobs = max(1, min(int(options.get("jobs") or 1), os.cpu_count() or 1))
+    overrides = options.get("overrides")
+    cfg = apply_overrides(load_template(fmt_type, sub_type), overrides) if overrides else None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "render.docx")
+        render_template(fmt_type, sub_type, path, jobs=jobs,
+                        deterministic=bool(options.get("deterministic")),
+                        compression=options.get("compression") or "balanced", cfg=cfg)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def render_with_report(fmt_type: str, sub_type: str, options: dict) -> tuple:
+    """
+    (docx_bytes, segundos por seccion). Siempre genera, sin leer la cache: los tiempos
+    son de este render. El resultado igual se publica en la cache compartida.
+    """
+    with collect_timings() as timings:
+        payload = _render_fresh(fmt_type, sub_type, options)
+    cache = get_shared_cache()
+    if cache:
+        cache.put(render_key(fmt_type, sub_type, options), payload)
+    return payload, timings
+
+
+def create_worker_app(name: str):
+    from flask import Flask, Response, jsonify, request
+
+    app = Flask(__name__)
+    # X-Request-Id del coordinador: los logs del worker se cruzan con los del pedido original
+    install_request_ids(app)
+    # Los renders corren en procesos hijos con tiempo, CPU y memoria limitados
+    pool = WorkerPool()
+    state = {"renders": 0, "failures": 0, "started": time.time()}
+    cache = get_shared_cache()
+
+    @app.route("/health")
+    def health():
+        return jsonify({
+            "ok": True,
+            "worker": name,
+            "pid": os.getpid(),
+            "busy": pool.busy > 0,
+            "renders": state["renders"],
+            "failures": state["failures"],
+            "uptime_s": round(time.time() - state["started"], 1),
+            "cache": cache.stats() if cache else None,
+            "pool": pool.metrics(),
+        })
+
+    @app.route("/render", methods=["POST"])
+    def render():
+        data = request.json or {}
+        problems = validate_render_request(data)
+        if problems:
+            return jsonify({"error": "Pedido no valido: " + "; ".join(problems)}), 400
+        try:
+            fmt_type, sub_type = resolve_key(data.get("format"), data.get("sub_type"))
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        t0 = time.perf_counter()
+        try:
+            payload = pool.run(render_bytes, fmt_type, sub_type, data)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        except JobTimeout as exc:
+            state["failures"] += 1
+            return jsonify({"error": str(exc)}), 504
+        except Exception as exc:
+            state["failures"] += 1
+            log.error("Render %s/%s fallo en %s: %s", fmt_type, sub_type, name, exc)
+            return jsonify({"error": str(exc)}), 500
+        state["renders"] += 1
+        ms = round((time.perf_counter() - t0) * 1000)
+        log.info("%s/%s renderizado (%s ms)", fmt_type, sub_type, ms, extra={"sample": True, "ms": ms})
+        resp = Response(payload, mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        resp.headers["X-Render-Worker"] = name
+        resp.headers["X-Render-Ms"] = str(ms)
+        return resp
+
+    return app
+
+
+def token_authorized(token: str) -> bool:
+    expected = os.environ.get(FARM_TOKEN_ENV, "")
+    return bool(expected) and hmac.compare_digest((token or "").encode("utf-8"), expected.encode("utf-8"))
+
+
+def _register(coordinator: str, url: str, method: str):
+    req = urllib.request.Request(
+        f"{coordinator.rstrip('/')}/farm/workers", data=json.dumps({"url": url}).encode("utf-8"),
+        headers={"Content-Type": "application/json", FARM_TOKEN_HEADER: os.environ.get(FARM_TOKEN_ENV, "")},
+        method=method,
+    )
+    try:
+        urllib.request.urlopen(req, timeout=HEALTH_TIMEOUT_S).close()
+        return True
+    except (urllib.error.URLError, OSError) as exc:
+        log.warning("No se pudo %s %s en %s: %s", "registrar" if method == "POST" else "retirar", url, coordinator, exc)
+        return False
+
+
+def run_worker(host: str, port: int, coordinator: str = None):
+    url = f"http://{host}:{port}"
+    setup_logging("json")
+    app = create_worker_app(url)
+    if coordinator:
+        # El registro espera a que el servidor HTTP este escuchando
+        threading.Timer(1.0, _register, (coordinator, url, "POST")).start()
+        atexit.register(_register, coordinator, url, "DELETE")
+    log.info("Worker de render en %s (pid %s)", url, os.getpid())
+    app.run(host=host, port=port, threaded=True)
+
+# -------------------------
+# COORDINADOR
+# -------------------------
+
+def _error_detail(exc: urllib.error.HTTPError) -> str:
+    detail = exc.read().decode("utf-8", errors="replace")
+    try:
+        return json.loads(detail).get("error", detail)
+    except (ValueError, AttributeError):
+        return detail
+
+
+class RenderFarm:
+    """Enruta renders a workers HTTP por hash consistente de 'formato/subtipo'."""
+
+    def __init__(self, workers=(), health_interval: float = HEALTH_INTERVAL_S, timeout: float = RENDER_TIMEOUT_S):
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.ring = HashRing()
+        self.workers = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for url in workers:
+            self.add_worker(url)
+
+    @classmethod
+    def from_env(cls):
+        """UNAC_RENDER_WORKERS=http://host:5101,http://host:5102 (vacio = sin granja)."""
+        urls = [u.strip() for u in os.environ.get("UNAC_RENDER_WORKERS", "").split(",") if u.strip()]
+        return cls(urls)
+
+    def __bool__(self):
+        """Solo con workers sanos en el anillo; si todos caen, se renderiza en local."""
+        with self.lock:
+            return bool(self.ring.nodes)
+
+    # -------------------------
+    # ALTAS, BAJAS Y SALUD
+    # -------------------------
+
+    def add_worker(self, url: str) -> bool:
+        url = url.rstrip("/")
+        with self.lock:
+            self.workers.setdefault(url, {"healthy": False, "failures": 0, "renders": 0, "last_check": None})
+        return self.check(url)
+
+    def remove_worker(self, url: str) -> bool:
+        url = url.rstrip("/")
+        with self.lock:
+            self.ring.remove(url)
+            return self.workers.pop(url, None) is not None
+
+    def _set_health(self, url: str, healthy: bool, reason: str = ""):
+        with self.lock:
+            info = self.workers.get(url)
+            if info is None:
+                return
+            info["last_check"] = time.time()
+            if healthy:
+                info["failures"] = 0
+                if not info["healthy"]:
+                    info["healthy"] = True
+                    self.ring.add(url)
+                    log.info("Worker en el anillo: %s (%s activos)", url, len(self.ring.nodes))
+                return
+            info["failures"] += 1
+            if info["healthy"] and (info["failures"] >= FAIL_THRESHOLD or reason == "render"):
+                info["healthy"] = False
+                self.ring.remove(url)
+                log.warning("Worker fuera del anillo: %s (%s activos)", url, len(self.ring.nodes))
+
+    def check(self, url: str) -> bool:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=HEALTH_TIMEOUT_S) as resp:
+                healthy = json.loads(resp.read()).get("ok") is True
+        except (urllib.error.URLError, OSError, ValueError):
+            healthy = False
+        self._set_health(url, healthy)
+        return healthy
+
+    def check_all(self):
+        for url in list(self.workers):
+            self.check(url)
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_all()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._health_loop, name="farm-health", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # -------------------------
+    # RENDER CON REINTENTOS
+    # -------------------------
+
+    def route(self, fmt_type: str, sub_type: str) -> list:
+        with self.lock:
+            return self.ring.preference(f"{fmt_type}/{sub_type}")
+
+    def _post(self, url: str, body: dict) -> tuple:
+        req = urllib.request.Request(
+            f"{url}/render", data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", REQUEST_ID_HEADER: current_request_id() or ""}, method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return resp.read(), resp.headers.get("X-Render-Ms")
+
+    def render(self, fmt_type: str, sub_type: str, options: dict = None) -> tuple:
+        """
+        Devuelve (docx_bytes, worker). Un 4xx del worker es error del pedido y un 504
+        es la plantilla agotando su tiempo: no se reintentan. Caidas, timeouts de red
+        y otros 5xx sacan al worker del anillo y se prueba el siguiente del recorrido.
+        """
+        body = {"format": fmt_type, "sub_type": sub_type}
+        body.update({k: v for k, v in (options or {}).items() if k in RENDER_OPTIONS and v is not None})
+        errors = []
+        for url in self.route(fmt_type, sub_type)[:MAX_ATTEMPTS]:
+            try:
+                payload, ms = self._post(url, body)
+            except urllib.error.HTTPError as exc:
+                if 400 <= exc.code < 500:
+                    raise ValueError(_error_detail(exc))
+                if exc.code == 504:
+                    # La plantilla agoto el tiempo en un worker sano: reintentar solo colgaria otro
+                    raise FarmError(f"{url}: {_error_detail(exc)}")
+                errors.append(f"{url}: HTTP {exc.code}")
+            except (urllib.error.URLError, OSError) as exc:
+                errors.append(f"{url}: {exc}")
+            else:
+                with self.lock:
+                    if url in self.workers:
+                        self.workers[url]["renders"] += 1
+                log.info("%s/%s renderizado en %s (%s ms)", fmt_type, sub_type, url, ms,
+                         extra={"sample": True, "worker": url})
+                return payload, url
+            self._set_health(url, False, reason="render")
+        raise FarmError("Ningun worker disponible" + (f" ({'; '.join(errors)})" if errors else ""))
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "workers": {url: dict(info) for url, info in self.workers.items()},
+                "active": sorted(self.ring.nodes),
+                "routes": {f"{f}/{s}": self.ring.preference(f"{f}/{s}")[:1] for f, s, _p in iter_templates()},
+            }
+
+# -------------------------
+# CLUSTER LOCAL (PRUEBAS EN LOCALHOST)
+# -------------------------
+
+def spawn_local_workers(count: int, base_port: int, host: str = "127.0.0.1") -> list:
+    procs = []
+    for k in range(count):
+        cmd = [sys.executable, os.path.abspath(__file__), "worker", "--host", host, "--port", str(base_port + k)]
+        procs.append((f"http://{host}:{base_port + k}", subprocess.Popen(cmd, cwd=BASE_DIR)))
+    return procs
+
+
+def wait_healthy(farm: RenderFarm, urls: list, timeout: float = 30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(farm.check(url) for url in urls):
+            return True
+        time.sleep(0.3)
+    return False
+
+
+def smoke_test(farm: RenderFarm, procs: list) -> bool:
+    """Renderiza todas las plantillas, mata al dueno de una y comprueba reintento y reequilibrio."""
+    keys = [(f, s) for f, s, _p in iter_templates()]
+    before = {key: farm.render(*key, {"deterministic": True})[1] for key in keys}
+    victim_key = keys[0]
+    victim = before[victim_key]
+    dict(procs)[victim].terminate()
+    dict(procs)[victim].wait()
+    print(f"[OK] Worker detenido: {victim}")
+
+    payload, served_by = farm.render(*victim_key, {"deterministic": True})
+    after = {key: farm.route(*key)[0] for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    ok = served_by != victim and len(payload) > 0 and all(before[key] == victim for key in moved)
+    print(f"[{'OK' if ok else 'ERROR'}] Reintento en {served_by}; claves reasignadas: "
+          f"{', '.join('/'.join(k) for k in moved) or 'ninguna'} (solo las del worker caido)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Granja de render UNAC: workers HTTP y coordinador con hash consistente")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_worker = sub.add_parser("worker", help="Inicia un worker de render")
+    p_worker.add_argument("--host", default="127.0.0.1")
+    p_worker.add_argument("--port", type=int, default=5101)
+    p_worker.add_argument("--coordinator", help="URL del server.py coordinador para registrarse "
+                          "(p. ej. http://127.0.0.1:5000; ambos con el mismo UNAC_FARM_TOKEN)")
+
+    p_cluster = sub.add_parser("cluster", help="Levanta N workers locales")
+    p_cluster.add_argument("--workers", type=int, default=3)
+    p_cluster.add_argument("--base-port", type=int, default=5101)
+    p_cluster.add_argument("--smoke", action="store_true", help="Prueba de enrutamiento, reintento y reequilibrio y sale")
+    args = parser.parse_args()
+
+    if args.cmd == "worker":
+        run_worker(args.host, args.port, args.coordinator)
+        sys.exit(0)
+
+    setup_logging()
+
+    procs = spawn_local_workers(args.workers, args.base_port)
+    farm = RenderFarm()
+    try:
+        urls = [url for url, _proc in procs]
+        for url in urls:
+            farm.add_worker(url)
+        if not wait_healthy(farm, urls):
+            print("[ERROR] Los workers no respondieron a /health")
+            sys.exit(1)
+        print(f"[OK] {len(urls)} workers activos. Para usarlos desde server.py:")
+        print(f"     UNAC_RENDER_WORKERS={','.join(urls)}")
+        if args.smoke:
+            sys.exit(0 if smoke_test(farm, procs) else 1)
+        for url, proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _url, proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
@@ -0,0 +1,257 @@
+import argparse
+import re
+import sys
+import time
+import zipfile
+
+from lxml import etree
+
+from docx_package import (
+    CONTENT_TYPES, CT_FOOTER, DOCUMENT_PART, DOCUMENT_RELS, PPR_ORDER, RPR_ORDER, RT_FOOTER,
+    SECTPR_ORDER, STYLE_ORDER, STYLES_PART, W_NS, R_NS, add_override, add_relationship,
+    copy_member_raw, get_or_add, to_xml_bytes, w,
+)
+from format_rules import PAGE_A4_CM, PAGE_NUMBER_RULE, format_rules
+from templates import load_template, resolve_key
+
+FOOTER_PART = "word/footer_unac.xml"
+HEADING_NAME_RE = re.compile(r"^heading (\d)$")
+REWRITTEN = {CONTENT_TYPES, DOCUMENT_PART, DOCUMENT_RELS, STYLES_PART, FOOTER_PART}
+
+
+def cm_to_twips(cm: float) -> str:
+    return str(int(round(cm * 1440 / 2.54)))
+
+
+def pt_to_half_points(pt: float) -> str:
+    return str(int(round(pt * 2)))
+
+# -------------------------
+# PROPIEDADES DE RUN / ESTILO
+# -------------------------
+
+def set_fonts(rpr, font_name: str):
+    fonts = get_or_add(rpr, "rFonts", RPR_ORDER)
+    for attr in ("asciiTheme", "hAnsiTheme", "cstheme", "eastAsiaTheme"):
+        fonts.attrib.pop(w(attr), None)
+    for attr in ("ascii", "hAnsi", "cs"):
+        fonts.set(w(attr), font_name)
+
+
+def set_size(rpr, size_pt: float):
+    for tag in ("sz", "szCs"):
+        get_or_add(rpr, tag, RPR_ORDER).set(w("val"), pt_to_half_points(size_pt))
+
+
+def set_bold(rpr, bold: bool):
+    get_or_add(rpr, "b", RPR_ORDER).set(w("val"), "1" if bold else "0")
+
+
+def restyle_styles(root, rules: dict) -> dict:
+    """Aplica fuente, tamano y titulos a styles.xml. Devuelve {styleId: nivel}."""
+    heading_rules = {level: (size, bold) for level, size, bold in rules["headings"]}
+    heading_ids = {}
+
+    rpr_default = root.find(f"{w('docDefaults')}/{w('rPrDefault')}/{w('rPr')}")
+    if rpr_default is not None:
+        set_fonts(rpr_default, rules["font_name"])
+
+    for style in root.iter(w("style")):
+        if style.get(w("type")) != "paragraph":
+            continue
+        name_el = style.find(w("name"))
+        name = (name_el.get(w("val")) if name_el is not None else "").lower()
+        style_id = style.get(w("styleId"))
+
+        if style_id == "Normal" or name == "normal":
+            rpr = get_or_add(style, "rPr", STYLE_ORDER)
+            set_fonts(rpr, rules["font_name"])
+            set_size(rpr, rules["font_size_pt"])
+            if rules["line_spacing"]:
+                ppr = get_or_add(style, "pPr", STYLE_ORDER)
+                spacing = get_or_add(ppr, "spacing", PPR_ORDER)
+                spacing.set(w("line"), str(int(240 * rules["line_spacing"])))
+                spacing.set(w("lineRule"), "auto")
+            continue
+
+        m = HEADING_NAME_RE.match(name)
+        if m and int(m.group(1)) in heading_rules:
+            level = int(m.group(1))
+            size, bold = heading_rules[level]
+            rpr = get_or_add(style, "rPr", STYLE_ORDER)
+            set_fonts(rpr, rules["font_name"])
+            set_size(rpr, size)
+            set_bold(rpr, bold)
+            heading_ids[style_id] = level
+
+    return heading_ids
+
+
+def footer_xml(rule: dict = PAGE_NUMBER_RULE) -> bytes:
+    ftr = etree.Element(w("ftr"), nsmap={"w": W_NS, "r": R_NS})
+    p = etree.SubElement(ftr, w("p"))
+    ppr = etree.SubElement(p, w("pPr"))
+    etree.SubElement(ppr, w("jc")).set(w("val"), rule["align"])
+    r = etree.SubElement(p, w("r"))
+    rpr = etree.SubElement(r, w("rPr"))
+    set_fonts(rpr, rule["font"])
+    set_size(rpr, rule["size_pt"])
+    etree.SubElement(r, w("fldSimple")).set(w("instr"), "PAGE")
+    return to_xml_bytes(ftr)
+
+# -------------------------
+# DOCUMENT.XML EN STREAMING
+# -------------------------
+
+def fix_sectpr(sect, rules: dict, footer_rid: str):
+    pg_sz = get_or_add(sect, "pgSz", SECTPR_ORDER)
+    landscape = pg_sz.get(w("orient")) == "landscape"
+    width, height = (PAGE_A4_CM[1], PAGE_A4_CM[0]) if landscape else PAGE_A4_CM
+    pg_sz.set(w("w"), cm_to_twips(width))
+    pg_sz.set(w("h"), cm_to_twips(height))
+
+    pg_mar = get_or_add(sect, "pgMar", SECTPR_ORDER)
+    for side, value in rules["margins_cm"].items():
+        pg_mar.set(w(side), cm_to_twips(value))
+    for attr, default in (("header", "708"), ("footer", "708"), ("gutter", "0")):
+        if pg_mar.get(w(attr)) is None:
+            pg_mar.set(w(attr), default)
+
+    for ref in sect.findall(w("footerReference")):
+        if ref.get(w("type")) in (None, "default"):
+            sect.remove(ref)
+    ref = etree.Element(w("footerReference"))
+    ref.set(w("type"), "default")
+    ref.set(f"{{{R_NS}}}id", footer_rid)
+    headers = sect.findall(w("headerReference"))
+    sect.insert(sect.index(headers[-1]) + 1 if headers else 0, ref)
+
+
+def restyle_block(el, rules: dict, heading_ids: dict, footer_rid: str):
+    for sect in el.iter(w("sectPr")):
+        fix_sectpr(sect, rules, footer_rid)
+
+    for p in el.iter(w("p")):
+        pstyle = p.find(f"{w('pPr')}/{w('pStyle')}")
+        is_heading = pstyle is not None and pstyle.get(w("val")) in heading_ids
+        for rpr in p.iter(w("rPr")):
+            if rpr.getparent().tag != w("r"):
+                continue
+            fonts = rpr.find(w("rFonts"))
+            if fonts is not None:
+                set_fonts(rpr, rules["font_name"])
+            if is_heading:
+                # El estilo del titulo manda sobre el formato directo
+                for tag in ("b", "bCs", "sz", "szCs"):
+                    for child in rpr.findall(w(tag)):
+                        rpr.remove(child)
+
+
+XMLNS_RE = re.compile(rb'\sxmlns(?::[\w.-]+)?="[^"]*"')
+
+
+def _open_tag(el) -> bytes:
+    shell = etree.Element(el.tag, dict(el.attrib), nsmap=el.nsmap)
+    return etree.tostring(shell)[:-2] + b">"
+
+
+def _close_tag(el) -> bytes:
+    qname = etree.QName(el)
+    return f"</{el.prefix}:{qname.localname}>".encode() if el.prefix else f"</{qname.localname}>".encode()
+
+
+def _serialize_block(el, inherited: set) -> bytes:
+    """Serializa un hijo de w:body sin repetir los xmlns ya declarados en w:document."""
+    xml = etree.tostring(el, with_tail=False)
+    end = xml.index(b">")
+    head = XMLNS_RE.sub(lambda m: b"" if m.group(0).strip() in inherited else m.group(0), xml[:end])
+    return head + xml[end:]
+
+
+def stream_document(src, out, rules: dict, heading_ids: dict, footer_rid: str):
+    """Reescribe document.xml bloque a bloque (hijos de w:body) con memoria acotada."""
+    body_tag, doc_tag = w("body"), w("document")
+    inherited = set()
+    out.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+    for event, el in etree.iterparse(src, events=("start", "end"), huge_tree=True):
+        if event == "start":
+            if el.tag in (doc_tag, body_tag):
+                tag = _open_tag(el)
+                if el.tag == doc_tag:
+                    inherited = {m.group(0).strip() for m in XMLNS_RE.finditer(tag)}
+                else:
+                    tag = XMLNS_RE.sub(b"", tag)
+                out.write(tag)
+            continue
+
+        if el.tag in (body_tag, doc_tag):
+            out.write(_close_tag(el))
+            continue
+
+        parent = el.getparent()
+        if parent is not None and (parent.tag == body_tag or parent.tag == doc_tag):
+            restyle_block(el, rules, heading_ids, footer_rid)
+            out.write(_serialize_block(el, inherited))
+            el.clear()
+            while el.getprevious() is not None:
+                del parent[0]
+
+# -------------------------
+# PAQUETE COMPLETO
+# -------------------------
+
+def restyle_docx(src_path: str, dst_path: str, rules: dict) -> dict:
+    stats = {"parts_rewritten": 0, "parts_copied": 0}
+    with zipfile.ZipFile(src_path) as zin, zipfile.ZipFile(dst_path, "w", zipfile.ZIP_DEFLATED) as zout:
+        names = set(zin.namelist())
+        if DOCUMENT_PART not in names:
+            raise ValueError("El archivo no es un DOCX valido (falta word/document.xml)")
+
+        ct_root = etree.fromstring(zin.read(CONTENT_TYPES))
+        rels_root = etree.fromstring(zin.read(DOCUMENT_RELS))
+        footer_rid = add_relationship(rels_root, RT_FOOTER, FOOTER_PART.split("/", 1)[1])
+        add_override(ct_root, FOOTER_PART, CT_FOOTER)
+
+        heading_ids = {}
+        if STYLES_PART in names:
+            styles_root = etree.fromstring(zin.read(STYLES_PART))
+            heading_ids = restyle_styles(styles_root, rules)
+            zout.writestr(STYLES_PART, to_xml_bytes(styles_root))
+
+        zout.writestr(CONTENT_TYPES, to_xml_bytes(ct_root))
+        zout.writestr(DOCUMENT_RELS, to_xml_bytes(rels_root))
+        zout.writestr(FOOTER_PART, footer_xml())
+        with zin.open(DOCUMENT_PART) as src, zout.open(DOCUMENT_PART, "w", force_zip64=True) as out:
+            stream_document(src, out, rules, heading_ids, footer_rid)
+        stats["parts_rewritten"] = 5 if STYLES_PART in names else 4
+
+        # Media, temas, encabezados, etc. pasan sin descomprimir
+        for info in zin.infolist():
+            if info.filename not in REWRITTEN:
+                copy_member_raw(zin, zout, info)
+                stats["parts_copied"] += 1
+    return stats
+
+
+def restyle_with_template(src_path: str, dst_path: str, fmt_type: str, sub_type: str) -> dict:
+    fmt_type, sub_type = resolve_key(fmt_type, sub_type)
+    rules = format_rules(fmt_type, load_template(fmt_type, sub_type))
+    return restyle_docx(src_path, dst_path, rules)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aplica el formato UNAC a un DOCX existente")
+    parser.add_argument("entrada", help="DOCX del estudiante")
+    parser.add_argument("salida", help="DOCX reformateado")
+    parser.add_argument("--format", default="informe", help="proyecto | informe | maestria")
+    parser.add_argument("--sub-type", default="cuant", help="cuant | cual")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        stats = restyle_with_template(args.entrada, args.salida, args.format, args.sub_type)
+    except (OSError, ValueError, zipfile.BadZipFile, etree.XMLSyntaxError) as exc:
+        print(f"[ERROR] No se pudo reformatear: {exc}")
+        sys.exit(1)
+    print(f"[OK] Documento reformateado: {args.salida} "
+          f"({stats['parts_copied']} partes copiadas sin cambios, {time.perf_counter() - t0:.2f}s)")
@@ -0,0 +1,272 @@
+from docx_package import COMPRESSION_LEVELS
+
+# -------------------------
+# ESQUEMAS POR FAMILIA DE GENERADOR
+# -------------------------
+# Subconjunto minimo de JSON Schema: type, required, properties, items, enum y
+# additional (False: claves fuera de properties son error).
+
+NUMBER = (int, float)
+
+_STR = {"type": str}
+_NUM = {"type": NUMBER}
+_CITATION_STYLE = {"type": str, "enum": ["apa", "iso690"]}
+
+
+def _obj(required=(), **properties):
+    return {"type": dict, "required": list(required), "properties": properties}
+
+
+def _list_of(item):
+    return {"type": list, "items": item}
+
+
+MAESTRIA_SCHEMA = _obj(
+    ["cover", "structure"],
+    logo_path=_STR,
+    output_name=_STR,
+    page_setup=_obj(
+        margins_cm=_obj(left=_NUM, right=_NUM, top=_NUM, bottom=_NUM),
+        font=_obj(name=_STR, size_pt=_NUM),
+    ),
+    cover=_obj(
+        ["universidad_linea", "unidad", "titulo", "grado_maestria", "autor", "asesor", "linea", "anio"],
+        universidad_linea=_STR, unidad=_STR, titulo=_STR, grado_maestria=_STR,
+        autor=_STR, asesor=_STR, linea=_STR, ciudad=_STR, anio=_STR, pais=_STR,
+        logo_width_cm=_NUM, title_size_pt=_NUM, text_size_pt=_NUM,
+    ),
+    pre_pages=_list_of(_obj(
+        title=_STR, title_level={"type": int}, lines=_list_of(_STR),
+        page_break_after={"type": bool},
+    )),
+    toc=_obj(min_level={"type": int}, max_level={"type": int}),
+    include_list_of_tables={"type": bool},
+    include_list_of_figures={"type": bool},
+    citation_style=_CITATION_STYLE,
+    structure_rules=_obj(
+        add_placeholder_after_heading={"type": bool},
+        page_break_after_level_1={"type": bool},
+    ),
+    structure=_list_of(_obj(
+        ["level", "title"],
+        level={"type": int, "enum": [1, 2, 3, 4, 5]}, title=_STR,
+        placeholder={"type": bool}, lines=_list_of(_STR),
+    )),
+)
+
+INFORME_SCHEMA = _obj(
+    ["caratula", "preliminares", "cuerpo", "finales"],
+    caratula=_obj(
+        ["universidad", "facultad", "escuela", "tipo_documento", "titulo_placeholder",
+         "frase_grado", "grado_objetivo", "label_autor", "label_asesor", "label_linea",
+         "fecha", "pais"],
+        universidad=_STR, facultad=_STR, escuela=_STR, tipo_documento=_STR,
+        titulo_placeholder=_STR, frase_grado=_STR, grado_objetivo=_STR,
+        label_autor=_STR, label_asesor=_STR, label_linea=_STR, fecha=_STR, pais=_STR,
+    ),
+    preliminares=_obj(
+        ["indices"],
+        dedicatoria=_obj(["titulo", "texto"], titulo=_STR, texto=_STR),
+        resumen=_obj(["titulo", "texto"], titulo=_STR, texto=_STR),
+        indices=_obj(["contenido"], contenido=_STR, tablas=_STR, figuras=_STR),
+        introduccion=_obj(["titulo", "texto"], titulo=_STR, texto=_STR),
+    ),
+    cuerpo=_list_of(_obj(
+        ["titulo"],
+        titulo=_STR,
+        contenido=_list_of(_obj(["texto"], texto=_STR, nota=_STR)),
+    )),
+    finales=_obj(
+        ["referencias", "anexos"],
+        referencias=_obj(["titulo"], titulo=_STR, nota=_STR, estilo=_CITATION_STYLE),
+        anexos=_obj(["titulo_seccion"], titulo_seccion=_STR),
+    ),
+)
+
+PROYECTO_SCHEMA = _obj(
+    ["paginas"],
+    configuracion=_obj(
+        nombre_archivo=_STR, fuente_normal=_STR, tamano_normal=_NUM,
+        fuente_tabla=_STR, tamano_tabla=_NUM, ruta_logo=_STR, color_encabezado=_STR,
+        estilo_citas=_CITATION_STYLE,
+    ),
+    paginas=_list_of(_obj(
+        tipo={"type": str, "enum": ["caratula", "lista", "indice", "contenido_detallado", "generico"]},
+        titulo=_STR,
+        capitulos=_list_of(_obj(
+            titulo=_STR,
+            secciones=_list_of(_obj(sub=_STR, texto=_STR)),
+        )),
+    )),
+)
+
+TEMPLATE_SCHEMAS = {
+    "maestria": MAESTRIA_SCHEMA,
+    "informe": INFORME_SCHEMA,
+    "proyecto": PROYECTO_SCHEMA,
+}
+
+
+# Cuerpo de /generate, /prepare y del /render de la granja (null = no enviado)
+RENDER_REQUEST_SCHEMA = dict(
+    _obj(
+        ["format", "sub_type"],
+        format=_STR, sub_type=_STR,
+        jobs={"type": int}, deterministic={"type": bool}, report={"type": bool},
+        compression={"type": str, "enum": sorted(COMPRESSION_LEVELS)},
+        # {ruta.con.puntos: valor} sobre el JSON de la plantilla, p. ej. {"cover.autor": "..."}
+        overrides={"type": dict},
+    ),
+    additional=False,
+)
+
+# -------------------------
+# VALIDADORES COMPILADOS
+# -------------------------
+
+def compile_schema(schema: dict):
+    """
+    Convierte el esquema en una funcion check(valor, ruta="$") -> [errores], armada una
+    sola vez: tipos, claves y sub-validadores quedan resueltos en closures y un valor
+    valido solo cuesta isinstance y busquedas en dicts.
+    """
+    expected = schema.get("type")
+    types = None if expected is None else (expected if isinstance(expected, tuple) else (expected,))
+    type_names = "/".join(t.__name__ for t in types or ())
+    # bool es subclase de int: no aceptarlo donde se espera un numero
+    reject_bool = types is not None and bool not in types
+    enum = schema.get("enum")
+    required = tuple(schema.get("required", ()))
+    properties = schema.get("properties", {})
+    fields = tuple((key, f".{key}", compile_schema(sub)) for key, sub in properties.items())
+    closed = schema.get("additional", True) is False
+    items = compile_schema(schema["items"]) if "items" in schema else None
+
+    if not (enum or required or fields or closed or items):
+        if types is None:
+            return lambda value, path="$": []
+
+        def check_leaf(value, path="$"):
+            if isinstance(value, types) and not (reject_bool and isinstance(value, bool)):
+                return []
+            return [f"{path}: se esperaba {type_names}, llego {type(value).__name__}"]
+        return check_leaf
+
+    def check(value, path="$"):
+        if types is not None and (not isinstance(value, types) or (reject_bool and isinstance(value, bool))):
+            return [f"{path}: se esperaba {type_names}, llego {type(value).__name__}"]
+        errors = []
+        if enum is not None and value not in enum:
+            errors.append(f"{path}: valor {value!r} no permitido (opciones: {', '.join(map(str, enum))})")
+        if isinstance(value, dict):
+            for key in required:
+                if key not in value:
+                    errors.append(f"{path}: falta la clave '{key}'")
+            for key, suffix, sub in fields:
+                if key in value:
+                    found = sub(value[key], path + suffix)
+                    if found:
+                        errors.extend(found)
+            if closed:
+                errors.extend(f"{path}: clave no reconocida '{key}'" for key in value if key not in properties)
+        if items is not None and isinstance(value, list):
+            for i, item in enumerate(value):
+                found = items(item, f"{path}[{i}]")
+                if found:
+                    errors.extend(found)
+        return errors
+    return check
+
+
+_COMPILED = {}
+
+
+def _compiled(schema: dict):
+    # Se guarda el esquema junto a la funcion: su id no se reutiliza mientras este en el dict
+    entry = _COMPILED.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        entry = _COMPILED[id(schema)] = (schema, compile_schema(schema))
+    return entry[1]
+
+
+def validate(schema: dict, value, path: str = "$") -> list:
+    return _compiled(schema)(value, path)
+
+
+TEMPLATE_VALIDATORS = {family: _compiled(schema) for family, schema in TEMPLATE_SCHEMAS.items()}
+check_render_request = _compiled(RENDER_REQUEST_SCHEMA)
+
+
+def validate_template(family: str, cfg) -> list:
+    if family not in TEMPLATE_VALIDATORS:
+        return [f"$: familia de generador desconocida '{family}'"]
+    return TEMPLATE_VALIDATORS[family](cfg)
+
+
+def check_template(family: str, cfg, source: str = ""):
+    """Para los generadores al cargar el JSON: ValueError antes de empezar a construir."""
+    problems = validate_template(family, cfg)
+    if problems:
+        more = f" (y {len(problems) - 3} mas)" if len(problems) > 3 else ""
+        raise ValueError(f"Plantilla {family} invalida{' ' + source if source else ''}: "
+                         + "; ".join(problems[:3]) + more)
+
+# -------------------------
+# PEDIDOS DE RENDER
+# -------------------------
+
+# Lo unico que un pedido HTTP puede reemplazar: los textos de la portada. Rutas de
+# archivos (logo_path, ruta_logo), estilos y estructura solo cambian en el JSON.
+COVER_SECTIONS = {"maestria": "cover", "informe": "caratula"}
+
+
+def _cover_text_fields(family: str) -> frozenset:
+    section = COVER_SECTIONS.get(family)
+    if section is None:
+        return frozenset()
+    props = TEMPLATE_SCHEMAS[family]["properties"][section]["properties"]
+    return frozenset(f"{section}.{key}" for key, sub in props.items() if sub.get("type") is str)
+
+
+REQUEST_OVERRIDE_FIELDS = {family: _cover_text_fields(family) for family in TEMPLATE_SCHEMAS}
+
+
+def override_schema(family: str, path: str):
+    """Sub-esquema de una ruta con puntos (los indices de lista son numeros) o None si no existe."""
+    node = TEMPLATE_SCHEMAS.get(family)
+    for key in path.split("."):
+        if node is None:
+            return None
+        if "items" in node and key.isdigit():
+            node = node["items"]
+        else:
+            node = node.get("properties", {}).get(key)
+    return node
+
+
+def validate_overrides(family: str, overrides: dict) -> list:
+    """Overrides de un pedido: solo REQUEST_OVERRIDE_FIELDS, con el tipo de su esquema."""
+    allowed = REQUEST_OVERRIDE_FIELDS.get(family, frozenset())
+    errors = []
+    for path, value in overrides.items():
+        if path not in allowed:
+            fields = ", ".join(sorted(allowed)) or "ninguno"
+            errors.append(f"$.overrides: la ruta '{path}' no se puede reemplazar en un pedido {family} "
+                          f"(permitidos: {fields})")
+        else:
+            errors.extend(validate(override_schema(family, path), value, f"$.overrides['{path}']"))
+    return errors
+
+
+def validate_render_request(data, family: str = None) -> list:
+    """
+    Errores del cuerpo de un pedido de render (vacio si es valido). Con family se
+    revisan tambien las rutas y tipos de overrides contra el esquema de esa familia.
+    """
+    if not isinstance(data, dict):
+        return [f"$: se esperaba dict, llego {type(data).__name__}"]
+    data = {k: v for k, v in data.items() if v is not None}
+    errors = check_render_request(data)
+    if not errors and family and data.get("overrides"):
+        errors = validate_overrides(family, data["overrides"])
+    return errors
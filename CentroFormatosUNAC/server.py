@@ -1,49 +1,65 @@
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, Response, request, send_file, jsonify, make_response
+from werkzeug.utils import secure_filename
 try:
     from flask_cors import CORS
 except ImportError:
     CORS = None
 import os
 import subprocess
-import sys
 import platform
+import io
+import json
+import tempfile
+import time
+import zipfile
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+
+from lxml import etree
+
+from bibliography import parse_bibliography
+from catalog import TemplateCatalog
+from docx_package import COMPRESSION_LEVELS
+from figures import IMAGE_ERRORS, build_with_figures
+from format_checker import check_docx
+from jobs import JobManager
+from markdown_ingest import build_with_markdown
+from preview import get_preview
+from render_farm import (
+    FARM_TOKEN_ENV, FARM_TOKEN_HEADER, RENDER_TIMEOUT_S, FarmError, RenderFarm, render_bytes, render_with_report,
+    token_authorized,
+)
+from restyler import restyle_with_template
+from schemas import validate_overrides, validate_render_request
+from shared_cache import get_shared_cache, render_key
+from templates import (
+    BASE_DIR, DOCS_DIR, check_override_path, checked_template, output_filename, resolve_key, resolve_template_id,
+)
+from unac_logging import get_logger, install_request_ids, setup_logging
+from weight_report import report_summary, sidecar_path, weight_report, write_report
+from worker_pool import POOL_WORKERS, JobCancelled, JobTimeout, WorkerPool
+
+# Comentario SSE cada N s sin eventos: mantiene viva la conexion tras proxies
+SSE_KEEPALIVE_S = 15
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+STREAM_CHUNK = 64 * 1024
+
+# JSON por defecto (UNAC_LOG_FORMAT=text para leerlo en consola); los hijos lo heredan
+setup_logging("json")
+log = get_logger("server")
 
 app = Flask(__name__)
+# Cada pedido lleva un request id (X-Request-Id) que sigue al render en jobs, pool y granja
+install_request_ids(app)
 if CORS:
     CORS(app)
 else:
-    print("[WARN] flask_cors no instalado; CORS desactivado.")
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOCS_DIR = os.path.join(BASE_DIR, "docs")
-
-SCRIPTS_CONFIG = {
-    "proyecto": {
-        "script": "generador_proyecto_tesis.py",
-        "jsons": {
-            "cuant": os.path.join("formats", "proyecto", "unac_proyecto_cuant.json"),
-            "cual": os.path.join("formats", "proyecto", "unac_proyecto_cual.json"),
-        },
-    },
-    "informe": {
-        "script": "generador_informe_tesis.py",
-        "jsons": {
-            "cuant": os.path.join("formats", "informe", "unac_informe_cuant.json"),
-            "cual": os.path.join("formats", "informe", "unac_informe_cual.json"),
-        },
-    },
-    "maestria": {
-        "script": "generador_maestria.py",
-        "jsons": {
-            "cuant": os.path.join("formats", "maestria", "unac_maestria_cuant.json"),
-            "cual": os.path.join("formats", "maestria", "unac_maestria_cual.json"),
-        },
-    },
-}
-
-ALIASES = {
-    "pregrado": "informe",
-}
+    log.warning("flask_cors no instalado; CORS desactivado.")
+
+CATALOG = TemplateCatalog(DOCS_DIR).build()
+# Sin UNAC_RENDER_WORKERS ni workers registrados, /generate renderiza en este equipo
+FARM = RenderFarm.from_env().start()
+JOBS = JobManager()
+POOL = WorkerPool()
 
 
 def open_document(path: str) -> None:
@@ -55,7 +71,48 @@ def open_document(path: str) -> None:
         else:
             subprocess.run(["xdg-open", path], check=False)
     except Exception as exc:
-        print(f"[WARN] No se pudo abrir el documento: {exc}")
+        log.warning("No se pudo abrir el documento: %s", exc)
+
+
+def compression_message() -> str:
+    return f"compression debe ser uno de: {', '.join(sorted(COMPRESSION_LEVELS))}"
+
+
+def compression_error():
+    return jsonify({"error": compression_message()}), 400
+
+
+def temp_output(suffix: str = ".docx") -> str:
+    """Salida propia del pedido en DOCS_DIR: dos subidas con el mismo nombre no se pisan."""
+    os.makedirs(DOCS_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="salida_", suffix=suffix, dir=DOCS_DIR)
+    os.close(fd)
+    return path
+
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def send_and_discard(path: str, download_name: str):
+    """
+    Envia el DOCX en streaming y lo borra al terminar o cortarse la descarga
+    (send_file no corre call_on_close con direct_passthrough).
+    """
+    def stream():
+        try:
+            with open(path, "rb") as f:
+                yield from iter(lambda: f.read(STREAM_CHUNK), b"")
+        finally:
+            discard(path)
+
+    response = Response(stream(), mimetype=DOCX_MIME)
+    response.headers["Content-Length"] = str(os.path.getsize(path))
+    response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    return response
 
 
 @app.route("/")
@@ -66,59 +123,425 @@ def index():
     return send_file(os.path.join(BASE_DIR, "index.html"))
 
 
-@app.route("/generate", methods=["POST"])
-def generate_document():
+@app.route("/catalog")
+def catalog():
+    return jsonify({"templates": CATALOG.list()})
+
+
+@app.route("/catalog/search")
+def catalog_search():
+    query = request.args.get("q", "")
     try:
-        data = request.json or {}
-        fmt_type = (data.get("format") or "").strip().lower()
-        sub_type = (data.get("sub_type") or "").strip().lower()
+        limit = max(1, int(request.args.get("limit", 20)))
+    except ValueError:
+        return jsonify({"error": "Parametro limit no valido"}), 400
+    return jsonify({"query": query, "results": CATALOG.search(query, limit=limit)})
 
-        if fmt_type in ALIASES:
-            fmt_type = ALIASES[fmt_type]
 
-        if fmt_type not in SCRIPTS_CONFIG:
-            return jsonify({"error": "Formato no valido"}), 400
+def _preview_response(fmt_type: str, sub_type: str, outline: bool):
+    try:
+        fmt_type, sub_type = resolve_key(fmt_type, sub_type)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    try:
+        preview = get_preview(fmt_type, sub_type)
+    except FileNotFoundError as exc:
+        return jsonify({"error": str(exc)}), 500
 
-        config = SCRIPTS_CONFIG[fmt_type]
-        if sub_type not in config["jsons"]:
-            return jsonify({"error": "Subtipo no valido"}), 400
+    if outline:
+        response = jsonify(preview["outline"])
+    else:
+        response = make_response(preview["html"])
+        response.mimetype = "text/html"
+    response.set_etag(preview["etag"] + ("-outline" if outline else ""))
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
-        script_path = os.path.join(BASE_DIR, config["script"])
-        if not os.path.exists(script_path):
-            return jsonify({"error": f"Script no encontrado: {config['script']}"}), 500
 
-        json_rel = config["jsons"][sub_type]
-        json_path = os.path.join(BASE_DIR, json_rel)
-        if not os.path.exists(json_path):
-            return jsonify({"error": f"JSON no encontrado: {json_rel}"}), 500
+@app.route("/preview/<fmt_type>/<sub_type>")
+def preview_html(fmt_type, sub_type):
+    return _preview_response(fmt_type, sub_type, outline=False)
 
-        os.makedirs(DOCS_DIR, exist_ok=True)
-        filename = f"UNAC_{fmt_type.upper()}_{sub_type.upper()}.docx"
-        output_path = os.path.join(DOCS_DIR, filename)
 
-        cmd = [sys.executable, script_path, json_path, output_path]
-        result = subprocess.run(
-            cmd,
-            cwd=BASE_DIR,
-            capture_output=True,
-            text=True,
-        )
+@app.route("/preview/<fmt_type>/<sub_type>/outline")
+def preview_outline(fmt_type, sub_type):
+    return _preview_response(fmt_type, sub_type, outline=True)
+
+
+def parse_render_request(data) -> tuple:
+    """
+    (formato, subtipo, opciones) del cuerpo de /generate o /prepare. Validador
+    compilado (schemas.py): un pedido mal formado se rechaza aqui, en microsegundos,
+    con todos sus problemas juntos y antes de ocupar un worker. ValueError si no vale.
+    """
+    problems = validate_render_request(data)
+    if problems:
+        raise ValueError("Pedido no valido: " + "; ".join(problems))
+    fmt_type, sub_type = resolve_key(data.get("format"), data.get("sub_type"))
+    overrides = data.get("overrides") or None
+    if overrides:
+        problems = validate_overrides(fmt_type, overrides)
+        if problems:
+            raise ValueError("Pedido no valido: " + "; ".join(problems))
+    options = {"jobs": data.get("jobs"), "deterministic": bool(data.get("deterministic")),
+               "compression": data.get("compression"), "report": bool(data.get("report")), "overrides": overrides}
+    return fmt_type, sub_type, options
+
+
+def template_error(fmt_type: str, sub_type: str, options: dict):
+    """
+    Respuesta de error si la plantilla del servidor no pasa su esquema (500) o un
+    override apunta a una ruta que no tiene (400); None si se puede renderizar.
+    """
+    try:
+        cfg = checked_template(fmt_type, sub_type)
+    except (OSError, ValueError) as exc:
+        log.error("Plantilla %s/%s no disponible: %s", fmt_type, sub_type, exc)
+        return jsonify({"error": str(exc)}), 500
+    try:
+        for path in options["overrides"] or ():
+            check_override_path(cfg, path)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return None
+
+
+def render_payload(fmt_type: str, sub_type: str, options: dict, cancel=None, progress=None) -> dict:
+    """
+    Corre en el pool de JOBS: la granja si hay workers, si no un proceso de POOL con
+    tiempo, CPU y memoria limitados (render_bytes publica en la cache compartida).
+    progress recibe las etapas del render (GET /jobs/<id>/events).
+    """
+    if FARM:
+        # Las etapas por seccion quedan en el worker remoto; aqui solo se avisa el envio
+        if progress:
+            progress({"stage": "rendering", "section": "farm"})
+        # Modo coordinador: el worker dueno de la plantilla (hash consistente) la genera
+        payload, worker = FARM.render(fmt_type, sub_type, options)
+        cache = get_shared_cache()
+        if cache:
+            cache.put(render_key(fmt_type, sub_type, options), payload)
+        # El tiempo por seccion queda en el worker; el reporte trae solo el analisis del paquete
+        return {"payload": payload, "worker": worker, "sections": None}
+    if options.get("report"):
+        payload, sections = POOL.run(render_with_report, fmt_type, sub_type, options, cancel=cancel,
+                                     on_progress=progress)
+        return {"payload": payload, "worker": None, "sections": sections}
+    payload = POOL.run(render_bytes, fmt_type, sub_type, options, cancel=cancel, on_progress=progress)
+    return {"payload": payload, "worker": None, "sections": None}
+
+
+def lookup_or_start(fmt_type: str, sub_type: str, options: dict) -> tuple:
+    """
+    (None, bytes, False) si otro proceso del equipo ya lo renderizo; si no
+    (job, None, enganchado) con el render en curso o recien lanzado.
+    """
+    key = render_key(fmt_type, sub_type, options)
+    cache = get_shared_cache()
+    # Con reporte se genera de nuevo para medir cada seccion (trabajo aparte del normal)
+    cached = cache.get(key) if cache and not options.get("report") else None
+    if cached is not None:
+        return None, cached, False
+    if options.get("report"):
+        key += "#report"
+    job, attached = JOBS.submit(key, render_payload, fmt_type, sub_type, options, label=f"{fmt_type}/{sub_type}")
+    return job, None, attached
+
+
+@app.route("/prepare", methods=["POST"])
+def prepare_document():
+    """Pista del frontend al cambiar la seleccion: arranca el render sin esperar."""
+    try:
+        fmt_type, sub_type, options = parse_render_request(request.json or {})
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    error = template_error(fmt_type, sub_type, options)
+    if error:
+        return error
+    job, _payload, attached = lookup_or_start(fmt_type, sub_type, options)
+    if job is None:
+        return jsonify({"status": "done", "cached": True})
+    return jsonify({"status": job.status, "job": job.id, "attached": attached}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET", "DELETE"])
+def job_status(job_id):
+    job = JOBS.cancel(job_id) if request.method == "DELETE" else JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify(job.to_dict())
+
 
-        if result.returncode != 0:
-            print("[ERROR PYTHON]", result.stderr)
-            return jsonify({"error": "Fallo la generacion interna. Revisa consola."}), 500
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """
+    Etapas del trabajo como Server-Sent Events (queued, started, rendering con
+    seccion y paso k/N, serializing, done | failed | cancelled). El stream termina en
+    la etapa final; al reconectar, Last-Event-ID evita repetir lo ya recibido.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    try:
+        last_id = int(request.headers.get("Last-Event-ID", -1))
+    except ValueError:
+        last_id = -1
+
+    def stream():
+        nonlocal last_id
+        while True:
+            events, finished = job.events_after(last_id, timeout=SSE_KEEPALIVE_S)
+            if not events and not finished:
+                yield ": keepalive\n\n"
+            for event in events:
+                last_id = event["id"]
+                yield f"id: {last_id}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+            if finished:
+                return
+
+    response = Response(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # nginx: sin buffer, cada evento sale en cuanto se emite
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    return jsonify({"jobs": JOBS.counts(), "pool": POOL.metrics(), "farm": FARM.status() if FARM.workers else None})
+
+
+def override_response(fmt_type: str, sub_type: str, options: dict, payload: bytes, sections):
+    """
+    Render con overrides: documento propio del pedido. Se devuelve el DOCX en la
+    respuesta, sin archivo en docs/, sin catalogo y sin abrirlo en este equipo.
+    """
+    response = Response(payload, mimetype=DOCX_MIME)
+    response.headers.set("Content-Disposition", "attachment", filename=output_filename(fmt_type, sub_type))
+    if options["report"]:
+        report = weight_report(payload, sections)
+        response.headers["X-Weight-Report"] = json.dumps(report_summary(report), separators=(",", ":"))
+    return response
+
+
+@app.route("/generate", methods=["POST"])
+def generate_document():
+    t0 = time.perf_counter()
+    try:
+        try:
+            fmt_type, sub_type, options = parse_render_request(request.json or {})
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        error = template_error(fmt_type, sub_type, options)
+        if error:
+            return error
+
+        # Si /prepare ya lo lanzo, aqui solo se espera lo que falte del mismo trabajo
+        job, payload, attached = lookup_or_start(fmt_type, sub_type, options)
+        worker, sections = None, None
+        if job is not None:
+            try:
+                result = job.result(timeout=RENDER_TIMEOUT_S)
+            except ValueError as exc:
+                return jsonify({"error": str(exc)}), 400
+            except FarmError as exc:
+                log.error("Granja sin respuesta para %s/%s: %s", fmt_type, sub_type, exc)
+                return jsonify({"error": str(exc)}), 503
+            except FutureTimeoutError:
+                return jsonify({"error": f"El render sigue en curso (trabajo {job.id})", "job": job.id}), 504
+            except JobTimeout as exc:
+                log.warning("Render %s/%s agoto el tiempo: %s", fmt_type, sub_type, exc, extra={"job": job.id})
+                return jsonify({"error": str(exc)}), 504
+            except (JobCancelled, CancelledError):
+                return jsonify({"error": "Trabajo cancelado", "job": job.id}), 409
+            except (FileNotFoundError, RuntimeError) as exc:
+                return jsonify({"error": str(exc)}), 500
+            payload, worker, sections = result["payload"], result["worker"], result["sections"]
 
-        if not os.path.exists(output_path):
-            return jsonify({"error": "El script corrio pero no genero el DOCX"}), 500
+        if options["overrides"]:
+            return override_response(fmt_type, sub_type, options, payload, sections)
 
-        open_document(output_path)
-        return jsonify({"ok": True, "filename": filename, "path": output_path})
+        os.makedirs(DOCS_DIR, exist_ok=True)
+        filename = output_filename(fmt_type, sub_type)
+        output_path = os.path.join(DOCS_DIR, filename)
+        with open(output_path, "wb") as f:
+            f.write(payload)
+        CATALOG.record_render(fmt_type, sub_type, output_path)
+        if not FARM:
+            open_document(output_path)
+        ms = round((time.perf_counter() - t0) * 1000)
+        log.info("Documento guardado: %s (%s ms)", filename, ms, extra={
+            "sample": True, "ms": ms, "cached": job is None, "attached": attached, "worker": worker,
+            "job": job.id if job else None, "job_request_id": job.request_id if job else None,
+        })
+        body = {"ok": True, "filename": filename, "path": output_path,
+                "cached": job is None, "attached": attached, "worker": worker}
+        if not options["report"]:
+            return jsonify(body)
+        # Reporte de peso: completo en el JSON lateral y en la respuesta, resumen en cabecera
+        report = weight_report(payload, sections)
+        write_report(report, sidecar_path(output_path))
+        body["report"] = report
+        response = jsonify(body)
+        response.headers["X-Weight-Report"] = json.dumps(report_summary(report), separators=(",", ":"))
+        return response
 
     except Exception as exc:
-        print("[ERROR SERVER]", exc)
+        log.exception("Error en /generate: %s", exc)
         return jsonify({"error": str(exc)}), 500
 
 
+@app.route("/farm")
+def farm_status():
+    return jsonify(FARM.status())
+
+
+@app.route("/farm/workers", methods=["POST", "DELETE"])
+def farm_workers():
+    # CORS abierto para la vista: el registro de workers exige el token de la granja
+    if not token_authorized(request.headers.get(FARM_TOKEN_HEADER)):
+        return jsonify({"error": f"Registro de workers no autorizado (requiere {FARM_TOKEN_ENV} "
+                                 f"y la cabecera {FARM_TOKEN_HEADER})"}), 403
+    url = ((request.json or {}).get("url") or "").strip()
+    if not url.startswith(("http://", "https://")):
+        return jsonify({"error": "Se esperaba la URL http del worker (campo 'url')"}), 400
+    if request.method == "DELETE":
+        return jsonify({"ok": FARM.remove_worker(url), "active": sorted(FARM.ring.nodes)})
+    healthy = FARM.add_worker(url)
+    return jsonify({"ok": True, "healthy": healthy, "active": sorted(FARM.ring.nodes)})
+
+
+@app.route("/restyle", methods=["POST"])
+def restyle_document():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Falta el archivo DOCX (campo 'file')"}), 400
+    try:
+        fmt_type, sub_type = resolve_key(request.form.get("format"), request.form.get("sub_type"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    output_path = temp_output()
+    with tempfile.NamedTemporaryFile(suffix=".docx", dir=DOCS_DIR, delete=False) as tmp:
+        upload.save(tmp)
+        src_path = tmp.name
+    base_name = os.path.splitext(secure_filename(upload.filename))[0] or "documento"
+    try:
+        restyle_with_template(src_path, output_path, fmt_type, sub_type)
+    except (ValueError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError) as exc:
+        discard(output_path)
+        return jsonify({"error": f"DOCX no valido: {exc}"}), 400
+    except Exception:
+        discard(output_path)
+        raise
+    finally:
+        os.remove(src_path)
+
+    return send_and_discard(output_path, f"{base_name}_UNAC.docx")
+
+
+@app.route("/validate", methods=["POST"])
+def validate_document():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Falta el archivo DOCX (campo 'file')"}), 400
+    try:
+        if request.form.get("template"):
+            fmt_type, sub_type = resolve_template_id(request.form["template"])
+        else:
+            fmt_type, sub_type = resolve_key(request.form.get("format"), request.form.get("sub_type"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    # Se lee directo del stream subido; no se guarda copia en disco
+    try:
+        report = check_docx(upload.stream, fmt_type, sub_type)
+    except (KeyError, zipfile.BadZipFile, etree.XMLSyntaxError) as exc:
+        return jsonify({"error": f"DOCX no valido: {exc}"}), 400
+    report["file"] = secure_filename(upload.filename)
+    return jsonify(report)
+
+
+@app.route("/ingest", methods=["POST"])
+def ingest_markdown_document():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Falta el archivo Markdown (campo 'file')"}), 400
+    try:
+        fmt_type, sub_type = resolve_key(request.form.get("format"), request.form.get("sub_type"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    compression = request.form.get("compression", "balanced")
+    if compression not in COMPRESSION_LEVELS:
+        return compression_error()
+
+    base_name = os.path.splitext(secure_filename(upload.filename))[0] or "capitulos"
+    bib_upload = request.files.get("bib")
+    bib_text = bib_upload.read().decode("utf-8", errors="replace") if bib_upload else None
+    if bib_text:
+        # Se parsea antes de generar (queda en cache para build_with_markdown)
+        try:
+            parse_bibliography(bib_text)
+        except ValueError as exc:
+            return jsonify({"error": f"Bibliografia no valida: {exc}"}), 400
+    output_path = temp_output()
+    # Lectura linea a linea del stream subido
+    lines = io.TextIOWrapper(upload.stream, encoding="utf-8", errors="replace")
+    try:
+        stats = build_with_markdown(fmt_type, sub_type, lines, output_path, bib_text=bib_text,
+                                    compression=compression)
+    except (OSError, ValueError) as exc:
+        discard(output_path)
+        return jsonify({"error": f"No se pudo generar: {exc}"}), 500
+    except Exception:
+        discard(output_path)
+        raise
+    log.info("Markdown integrado: %s titulos, ~%s paginas", stats["anchors"], stats["pages"])
+
+    return send_and_discard(output_path, f"{base_name}_UNAC.docx")
+
+
+@app.route("/figures", methods=["POST"])
+def insert_figures_document():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Falta el ZIP de figuras (campo 'file')"}), 400
+    try:
+        fmt_type, sub_type = resolve_key(request.form.get("format"), request.form.get("sub_type"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    compression = request.form.get("compression", "balanced")
+    if compression not in COMPRESSION_LEVELS:
+        return compression_error()
+
+    output_path = temp_output()
+    with tempfile.NamedTemporaryFile(suffix=".zip", dir=DOCS_DIR, delete=False) as tmp:
+        upload.save(tmp)
+        src_path = tmp.name
+    base_name = os.path.splitext(secure_filename(upload.filename))[0] or "figuras"
+    try:
+        if not zipfile.is_zipfile(src_path):
+            discard(output_path)
+            return jsonify({"error": "Se esperaba un ZIP de imagenes"}), 400
+        # Tantos procesos como el pool de render, no uno por nucleo y por pedido
+        stats = build_with_figures(fmt_type, sub_type, src_path, output_path, jobs=POOL_WORKERS,
+                                   compression=compression)
+    except IMAGE_ERRORS as exc:
+        discard(output_path)
+        return jsonify({"error": f"Imagen no valida: {exc}"}), 400
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as exc:
+        discard(output_path)
+        return jsonify({"error": f"No se pudo generar: {exc}"}), 500
+    except Exception:
+        discard(output_path)
+        raise
+    finally:
+        os.remove(src_path)
+    log.info("Figuras integradas: %s (normalizacion %ss)", stats["figures"], stats["normalize_s"])
+
+    return send_and_discard(output_path, f"{base_name}_UNAC.docx")
+
+
 if __name__ == "__main__":
-    print("Servidor CentroFormatosUNAC listo en http://localhost:5000")
+    log.info("Servidor CentroFormatosUNAC listo en http://localhost:5000")
     app.run(debug=True, port=5000)
@@ -0,0 +1,272 @@
+import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from template_bundle import template_assets
+from templates import BASE_DIR, checked_template, template_path
+from unac_logging import get_logger, setup_logging
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "unac_shared_cache.bin")
+DEFAULT_BUDGET_MB = 128
+DEFAULT_SLOTS = 1024
+PROBE = 8
+
+# Formato del archivo (lo decide el primer proceso que lo crea):
+#   cabecera (64 bytes) | tabla de slots | zona de datos circular
+# Cada slot: hash de la clave, seq, offset, largo, crc32, fecha. seq impar = slot en
+# escritura; los lectores no toman lock: copian y validan que seq no cambio y el crc.
+# Cada registro de datos: largo de la clave (uint32) | clave | contenido.
+MAGIC = b"UNACSHM1"
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+SLOT = struct.Struct("<16sQQQId4x")
+SEQ_OFFSET = 16
+KEY_LEN = struct.Struct("<I")
+
+log = get_logger("shared_cache")
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class SharedCache:
+    """
+    Cache de bytes compartida por todos los procesos del equipo sobre un archivo mmap.
+    La publicacion es atomica para los lectores: primero se escriben los datos, al
+    final el slot. Al llenarse la zona de datos se sobreescribe lo mas antiguo (FIFO).
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, budget_bytes: int = DEFAULT_BUDGET_MB << 20,
+                 slots: int = DEFAULT_SLOTS):
+        self.path = path
+        self.tlock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+        with self._locked():
+            size = os.fstat(self.fd).st_size
+            if size < HEADER_SIZE or self._read_header()[:8] != MAGIC:
+                self._create(slots, budget_bytes)
+            self.mm = mmap.mmap(self.fd, 0)
+        _magic, _version, self.slots, self.data_size, _head = HEADER.unpack_from(self.mm, 0)
+        self.data_start = HEADER_SIZE + self.slots * SLOT.size
+
+    def _read_header(self) -> bytes:
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return os.read(self.fd, HEADER.size)
+
+    def _create(self, slots: int, data_size: int):
+        os.ftruncate(self.fd, 0)
+        os.ftruncate(self.fd, HEADER_SIZE + slots * SLOT.size + data_size)
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, HEADER.pack(MAGIC, 1, slots, data_size, 0))
+
+    @contextmanager
+    def _locked(self):
+        """Lock de escritores: hilo del proceso + lock de archivo entre procesos."""
+        with self.tlock:
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(self.fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+
+    def _slot_offset(self, idx: int) -> int:
+        return HEADER_SIZE + idx * SLOT.size
+
+    def _probe(self, digest: bytes):
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        return ((start + k) % self.slots for k in range(min(PROBE, self.slots)))
+
+    # -------------------------
+    # LECTURA (SIN LOCK)
+    # -------------------------
+
+    def get(self, key: str):
+        digest = _digest(key)
+        kb = key.encode("utf-8")
+        for idx in self._probe(digest):
+            off = self._slot_offset(idx)
+            h, seq, offset, length, crc, _stamp = SLOT.unpack_from(self.mm, off)
+            if h != digest or seq & 1 or not length:
+                continue
+            start = self.data_start + offset
+            raw = self.mm[start:start + length]
+            # Si un escritor invalido el slot mientras se copiaba, cambio seq: es un miss
+            if SLOT.unpack_from(self.mm, off)[1] != seq or zlib.crc32(raw) != crc:
+                return None
+            (klen,) = KEY_LEN.unpack_from(raw)
+            if raw[KEY_LEN.size:KEY_LEN.size + klen] == kb:
+                return raw[KEY_LEN.size + klen:]
+        return None
+
+    # -------------------------
+    # ESCRITURA (LOCK DE ARCHIVO)
+    # -------------------------
+
+    def _clear_slot(self, off: int, seq: int):
+        # seq pasa a impar antes de tocar nada y termina par con el slot vacio
+        struct.pack_into("<Q", self.mm, off + SEQ_OFFSET, seq | 1)
+        SLOT.pack_into(self.mm, off, b"\0" * 16, (seq | 1) + 1, 0, 0, 0, 0.0)
+
+    def _evict_range(self, start: int, end: int):
+        for idx in range(self.slots):
+            off = self._slot_offset(idx)
+            _h, seq, offset, length, _crc, _stamp = SLOT.unpack_from(self.mm, off)
+            if length and offset < end and offset + length > start:
+                self._clear_slot(off, seq)
+
+    def _pick_slot(self, digest: bytes) -> int:
+        empty, oldest = None, None
+        for idx in self._probe(digest):
+            h, _seq, _offset, length, _crc, stamp = SLOT.unpack_from(self.mm, self._slot_offset(idx))
+            if h == digest and length:
+                return idx
+            if not length and empty is None:
+                empty = idx
+            if length and (oldest is None or stamp < oldest[1]):
+                oldest = (idx, stamp)
+        return empty if empty is not None else oldest[0]
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Publica key -> data; False si el contenido no cabe en la mitad del presupuesto."""
+        kb = key.encode("utf-8")
+        record = KEY_LEN.pack(len(kb)) + kb + bytes(data)
+        need = len(record)
+        if need > self.data_size // 2:
+            return False
+        digest = _digest(key)
+        with self._locked():
+            magic, version, slots, data_size, head = HEADER.unpack_from(self.mm, 0)
+            if head + need > data_size:
+                head = 0
+            self._evict_range(head, head + need)
+            off = self._slot_offset(self._pick_slot(digest))
+            seq = SLOT.unpack_from(self.mm, off)[1]
+            struct.pack_into("<Q", self.mm, off + SEQ_OFFSET, seq | 1)
+            self.mm[self.data_start + head:self.data_start + head + need] = record
+            SLOT.pack_into(self.mm, off, digest, (seq | 1) + 1, head, need, zlib.crc32(record), time.time())
+            HEADER.pack_into(self.mm, 0, magic, version, slots, data_size, head + need)
+        return True
+
+    def clear(self):
+        with self._locked():
+            for idx in range(self.slots):
+                off = self._slot_offset(idx)
+                _h, seq, _offset, length, _crc, _stamp = SLOT.unpack_from(self.mm, off)
+                if length:
+                    self._clear_slot(off, seq)
+            magic, version, slots, data_size, _head = HEADER.unpack_from(self.mm, 0)
+            HEADER.pack_into(self.mm, 0, magic, version, slots, data_size, 0)
+
+    def stats(self) -> dict:
+        lengths = [SLOT.unpack_from(self.mm, self._slot_offset(i))[3] for i in range(self.slots)]
+        live = [n for n in lengths if n]
+        return {
+            "path": self.path,
+            "entries": len(live),
+            "bytes": sum(live),
+            "budget": self.data_size,
+            "slots": self.slots,
+        }
+
+
+_CACHE = None
+
+
+def get_shared_cache():
+    """Cache del equipo (o None si esta desactivada con UNAC_SHARED_CACHE=0 o no se pudo abrir)."""
+    global _CACHE
+    if _CACHE is None:
+        path = os.environ.get("UNAC_SHARED_CACHE", DEFAULT_PATH)
+        if path == "0":
+            _CACHE = False
+        else:
+            budget = int(os.environ.get("UNAC_SHARED_CACHE_MB", DEFAULT_BUDGET_MB)) << 20
+            try:
+                _CACHE = SharedCache(path, budget_bytes=budget)
+            except (OSError, ValueError) as exc:
+                log.warning("Cache compartida desactivada (%s): %s", path, exc)
+                _CACHE = False
+    return _CACHE or None
+
+# -------------------------
+# CLAVES DE RENDER
+# -------------------------
+
+def _signature(paths) -> str:
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{os.path.basename(path)}:{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append(f"{os.path.basename(path)}:-")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def render_key(fmt_type: str, sub_type: str, options: dict) -> str:
+    """
+    Clave del DOCX de una plantilla: cambia si cambia su JSON, un asset que incrusta
+    (logo) o cualquier modulo del generador. jobs no entra en la clave (la salida no
+    depende del paralelismo).
+    """
+    sources = [template_path(fmt_type, sub_type)] + sorted(glob.glob(os.path.join(BASE_DIR, "*.py")))
+    try:
+        assets = template_assets(fmt_type, checked_template(fmt_type, sub_type))
+    except (OSError, ValueError):
+        assets = []
+    sources += [os.path.join(BASE_DIR, asset) for asset in assets]
+    opts = {"deterministic": bool(options.get("deterministic")),
+            "compression": options.get("compression") or "balanced"}
+    # Solo con overrides: las claves de los renders normales no cambian
+    if options.get("overrides"):
+        opts["overrides"] = options["overrides"]
+    return f"render:{fmt_type}/{sub_type}:{json.dumps(opts, sort_keys=True)}:{_signature(sources)}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache compartida (mmap) de DOCX renderizados")
+    parser.add_argument("accion", choices=["stats", "clear", "warm"],
+                        help="stats: uso; clear: vaciar; warm: renderizar todas las plantillas")
+    args = parser.parse_args()
+    setup_logging()
+
+    cache = get_shared_cache()
+    if cache is None:
+        print("[ERROR] Cache compartida no disponible")
+        sys.exit(1)
+    if args.accion == "clear":
+        cache.clear()
+        print(f"[OK] Cache vaciada: {cache.path}")
+    elif args.accion == "warm":
+        from render_farm import render_bytes
+        from templates import iter_templates
+        for fmt_type, sub_type, _path in iter_templates():
+            t0 = time.perf_counter()
+            render_bytes(fmt_type, sub_type, {"deterministic": True})
+            print(f"[OK] {fmt_type}/{sub_type} en cache ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+    stats = cache.stats()
+    print(f"[OK] {stats['entries']} entradas, {stats['bytes'] // 1024} KB de {stats['budget'] // 1024} KB ({stats['path']})")
@@ -0,0 +1,223 @@
+import argparse
+import glob
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import time
+
+from schemas import validate_template
+from unac_logging import get_logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMATS_DIR = os.path.join(BASE_DIR, "formats")
+DEFAULT_BUNDLE = os.path.join(BASE_DIR, "formats.bundle")
+DEFAULT_LOGO = os.path.join("assets", "LogoUNAC.png")
+
+# Formato del archivo:
+#   MAGIC (8 bytes) | largo del indice (uint64 LE) | indice (pickle) | blobs
+# El indice guarda, por ruta relativa, (offset, largo) dentro de la zona de blobs.
+MAGIC = b"UNACBDL1"
+HEADER = struct.Struct("<8sQ")
+
+log = get_logger("template_bundle")
+
+
+def rel_key(path: str) -> str:
+    return os.path.relpath(os.path.abspath(path), BASE_DIR).replace(os.sep, "/")
+
+
+def resolve_asset(ref: str):
+    """
+    Ruta real de un asset de plantilla relativo a BASE_DIR, o None si la referencia
+    sale de esa carpeta (ruta absoluta, '..' o enlace): nunca se incrusta otro archivo.
+    """
+    if not ref:
+        return None
+    base = os.path.realpath(BASE_DIR)
+    path = os.path.realpath(os.path.join(base, ref))
+    return path if path.startswith(base + os.sep) else None
+
+# -------------------------
+# COMPILACION
+# -------------------------
+
+def template_assets(family: str, cfg: dict) -> list:
+    """Rutas de assets (relativas a BASE_DIR) que usa cada familia de generador."""
+    if family == "maestria":
+        refs = [cfg.get("logo_path", "")]
+    elif family == "proyecto":
+        ruta = cfg.get("configuracion", {}).get("ruta_logo", DEFAULT_LOGO)
+        refs = [ruta, os.path.basename(ruta)]
+    else:
+        refs = []
+    # Todas las familias caen en el logo por defecto si el suyo no existe
+    refs.append(DEFAULT_LOGO)
+    found = []
+    for ref in refs:
+        path = resolve_asset(ref)
+        if path and os.path.exists(path) and rel_key(path) not in found:
+            found.append(rel_key(path))
+    return found
+
+
+def compile_bundle(output_path: str = DEFAULT_BUNDLE, formats_dir: str = FORMATS_DIR) -> dict:
+    errors, blobs, index = [], [], {"templates": {}, "assets": {}, "sources": {}}
+    offset = 0
+
+    def add_blob(data: bytes):
+        nonlocal offset
+        blobs.append(data)
+        start, offset = offset, offset + len(data)
+        return start, len(data)
+
+    for path in sorted(glob.glob(os.path.join(formats_dir, "**", "*.json"), recursive=True)):
+        family = os.path.basename(os.path.dirname(path))
+        key = rel_key(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+        except ValueError as exc:
+            errors.append(f"{key}: JSON invalido ({exc})")
+            continue
+
+        problems = validate_template(family, cfg)
+        if problems:
+            errors.extend(f"{key} {p}" for p in problems)
+            continue
+
+        st = os.stat(path)
+        index["sources"][key] = (st.st_mtime_ns, st.st_size)
+        index["templates"][key] = {
+            "family": family,
+            "blob": add_blob(pickle.dumps(cfg, protocol=pickle.HIGHEST_PROTOCOL)),
+            "assets": template_assets(family, cfg),
+        }
+        for asset in index["templates"][key]["assets"]:
+            if asset not in index["assets"]:
+                st = os.stat(os.path.join(BASE_DIR, asset))
+                index["sources"][asset] = (st.st_mtime_ns, st.st_size)
+                with open(os.path.join(BASE_DIR, asset), "rb") as f:
+                    index["assets"][asset] = add_blob(f.read())
+
+    if errors:
+        raise ValueError("Plantillas invalidas:\n  " + "\n  ".join(errors))
+
+    index["created"] = time.time()
+    index_bytes = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(index_bytes)))
+        f.write(index_bytes)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, output_path)
+    return index
+
+# -------------------------
+# CARGA (MMAP)
+# -------------------------
+
+class TemplateBundle:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_len = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Bundle no reconocido: {path}")
+        self.index = pickle.loads(self.mm[HEADER.size:HEADER.size + index_len])
+        self.data_start = HEADER.size + index_len
+
+    def _blob(self, ref) -> memoryview:
+        start, length = ref
+        return memoryview(self.mm)[self.data_start + start:self.data_start + start + length]
+
+    def _fresh(self, key: str) -> bool:
+        # Si la fuente (JSON o asset) sigue en disco y cambio, el bundle no manda
+        try:
+            st = os.stat(os.path.join(BASE_DIR, key))
+        except OSError:
+            return True
+        return (st.st_mtime_ns, st.st_size) == self.index["sources"].get(key)
+
+    def template(self, path: str):
+        key = rel_key(path)
+        entry = self.index["templates"].get(key)
+        # Un asset cambiado o nuevo puede resolver otra ruta: tambien invalida la plantilla
+        if entry is None or not all(self._fresh(k) for k in [key, *entry["assets"]]):
+            return None
+        return pickle.loads(self._blob(entry["blob"]))
+
+    def asset(self, path: str):
+        key = rel_key(path)
+        ref = self.index["assets"].get(key)
+        return None if ref is None or not self._fresh(key) else self._blob(ref)
+
+
+_BUNDLE = None
+
+
+def get_bundle():
+    """Bundle del proceso (o None si no existe o esta desactivado con UNAC_BUNDLE=0)."""
+    global _BUNDLE
+    if _BUNDLE is None:
+        path = os.environ.get("UNAC_BUNDLE", DEFAULT_BUNDLE)
+        if path == "0" or not os.path.exists(path):
+            _BUNDLE = False
+        else:
+            try:
+                _BUNDLE = TemplateBundle(path)
+            except (OSError, ValueError, pickle.UnpicklingError) as exc:
+                log.warning("Bundle ignorado (%s): %s", path, exc)
+                _BUNDLE = False
+    return _BUNDLE or None
+
+
+def cached_template(path: str):
+    bundle = get_bundle()
+    return bundle.template(path) if bundle else None
+
+
+def open_asset(path: str):
+    """Devuelve un stream del asset desde el bundle, la ruta si existe en disco, o None."""
+    bundle = get_bundle()
+    data = bundle.asset(path) if bundle else None
+    if data is not None:
+        return io.BytesIO(data)
+    if path and os.path.exists(path):
+        return path
+    return None
+
+# -------------------------
+# CLI
+# -------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bundle precompilado de plantillas UNAC")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compile = sub.add_parser("compile-templates", help="Valida formats/**/*.json y escribe el bundle")
+    p_compile.add_argument("-o", "--output", default=DEFAULT_BUNDLE)
+    p_info = sub.add_parser("info", help="Muestra el contenido de un bundle")
+    p_info.add_argument("path", nargs="?", default=DEFAULT_BUNDLE)
+    args = parser.parse_args()
+
+    if args.command == "compile-templates":
+        t0 = time.perf_counter()
+        try:
+            index = compile_bundle(args.output)
+        except ValueError as exc:
+            print(f"[ERROR] {exc}")
+            sys.exit(1)
+        print(f"[OK] Bundle escrito en: {args.output} "
+              f"({len(index['templates'])} plantillas, {len(index['assets'])} assets, "
+              f"{os.path.getsize(args.output)} bytes, {time.perf_counter() - t0:.3f}s)")
+    else:
+        bundle = TemplateBundle(args.path)
+        for key, entry in sorted(bundle.index["templates"].items()):
+            print(f"{entry['family']:<10} {key}  assets={entry['assets']}")
+        for key, (_start, length) in sorted(bundle.index["assets"].items()):
+            print(f"{'asset':<10} {key}  {length} bytes")
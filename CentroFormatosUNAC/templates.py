@@ -0,0 +1,215 @@
+import json
+import os
+import unicodedata
+
+from schemas import check_template
+from template_bundle import cached_template
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMATS_DIR = os.path.join(BASE_DIR, "formats")
+DOCS_DIR = os.path.join(BASE_DIR, "docs")
+
+# -------------------------
+# REGISTRO DE PLANTILLAS
+# -------------------------
+
+SCRIPTS_CONFIG = {
+    "proyecto": {
+        "script": "generador_proyecto_tesis.py",
+        "tipo": "proyecto_tesis",
+        "descripcion": "Estructura base del plan de investigacion segun directiva UNAC.",
+        "jsons": {
+            "cuant": os.path.join("formats", "proyecto", "unac_proyecto_cuant.json"),
+            "cual": os.path.join("formats", "proyecto", "unac_proyecto_cual.json"),
+        },
+    },
+    "informe": {
+        "script": "generador_informe_tesis.py",
+        "tipo": "informe_pregrado",
+        "descripcion": "Formato final para sustentacion y obtencion del titulo profesional.",
+        "jsons": {
+            "cuant": os.path.join("formats", "informe", "unac_informe_cuant.json"),
+            "cual": os.path.join("formats", "informe", "unac_informe_cual.json"),
+        },
+    },
+    "maestria": {
+        "script": "generador_maestria.py",
+        "tipo": "informe_posgrado",
+        "descripcion": "Plantillas de posgrado con estructura, indices y numeracion.",
+        "jsons": {
+            "cuant": os.path.join("formats", "maestria", "unac_maestria_cuant.json"),
+            "cual": os.path.join("formats", "maestria", "unac_maestria_cual.json"),
+        },
+    },
+}
+
+ALIASES = {
+    "pregrado": "informe",
+}
+
+ENFOQUES = {
+    "cuant": "cuantitativo",
+    "cual": "cualitativo",
+}
+
+
+def resolve_key(fmt_type: str, sub_type: str) -> tuple:
+    """Normaliza (formato, subtipo) aplicando alias; lanza ValueError si no existe."""
+    fmt_type = (fmt_type or "").strip().lower()
+    sub_type = (sub_type or "").strip().lower()
+    fmt_type = ALIASES.get(fmt_type, fmt_type)
+    if fmt_type not in SCRIPTS_CONFIG:
+        raise ValueError("Formato no valido")
+    if sub_type not in SCRIPTS_CONFIG[fmt_type]["jsons"]:
+        raise ValueError("Subtipo no valido")
+    return fmt_type, sub_type
+
+
+def resolve_template_id(template_id: str) -> tuple:
+    """Acepta 'formato/subtipo' o el id de catalogo (p. ej. unac_maestria_cuant)."""
+    template_id = (template_id or "").strip()
+    if "/" in template_id:
+        return resolve_key(*template_id.split("/", 1))
+    for fmt_type, sub_type, _path in iter_templates():
+        if template_id in (f"unac_{fmt_type}_{sub_type}", load_template(fmt_type, sub_type).get("id")):
+            return fmt_type, sub_type
+    raise ValueError(f"Plantilla desconocida: {template_id}")
+
+
+def template_path(fmt_type: str, sub_type: str) -> str:
+    return os.path.join(BASE_DIR, SCRIPTS_CONFIG[fmt_type]["jsons"][sub_type])
+
+
+def output_filename(fmt_type: str, sub_type: str) -> str:
+    return f"UNAC_{fmt_type.upper()}_{sub_type.upper()}.docx"
+
+
+def iter_templates():
+    for fmt_type, config in SCRIPTS_CONFIG.items():
+        for sub_type in config["jsons"]:
+            yield fmt_type, sub_type, template_path(fmt_type, sub_type)
+
+
+def load_template(fmt_type: str, sub_type: str) -> dict:
+    path = template_path(fmt_type, sub_type)
+    cfg = cached_template(path)
+    if cfg is not None:
+        return cfg
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"JSON no encontrado: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    # El bundle se valida al compilarlo; el JSON suelto, al leerlo
+    check_template(fmt_type, cfg, path)
+    return cfg
+
+
+_CHECKED = {}
+
+
+def checked_template(fmt_type: str, sub_type: str) -> dict:
+    """
+    load_template memorizado por (mtime, tamano) del JSON: el servidor revisa cada
+    pedido contra la plantilla sin releerla. Solo lectura; una plantilla invalida
+    lanza ValueError en cada llamada (no se memoriza).
+    """
+    path = template_path(fmt_type, sub_type)
+    try:
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+    entry = _CHECKED.get(path)
+    if entry is None or entry[0] != signature:
+        entry = _CHECKED[path] = (signature, load_template(fmt_type, sub_type))
+    return entry[1]
+
+# -------------------------
+# CAMPOS REEMPLAZADOS
+# -------------------------
+
+def _step(node, key: str):
+    if not isinstance(node, list):
+        return key
+    # Solo indices desde 0: '-1' no apunta al ultimo elemento
+    if not key.isdigit():
+        raise ValueError(f"indice de lista no valido '{key}'")
+    return int(key)
+
+
+def check_override_path(cfg: dict, path: str):
+    """ValueError si la ruta con puntos no existe en la plantilla (columna o clave mal escrita)."""
+    node = cfg
+    for key in path.split("."):
+        try:
+            node = node[_step(node, key)]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise ValueError(f"La ruta '{path}' no existe en la plantilla (falla en '{key}')")
+
+
+def apply_overrides(base: dict, overrides: dict) -> dict:
+    """Copia de base con los valores reemplazados; solo se copian los nodos de cada ruta."""
+    cfg = dict(base)
+    for path, value in overrides.items():
+        node = cfg
+        keys = path.split(".")
+        for key in keys[:-1]:
+            key = _step(node, key)
+            child = node[key]
+            child = dict(child) if isinstance(child, dict) else list(child)
+            node[key] = child
+            node = child
+        node[_step(node, keys[-1])] = value
+    return cfg
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+# -------------------------
+# TITULOS POR FAMILIA
+# -------------------------
+
+def template_headings(fmt_type: str, cfg: dict) -> list:
+    """Devuelve [(nivel, texto)] en el orden en que el generador escribe los titulos."""
+    headings = []
+    if fmt_type == "maestria":
+        for blk in cfg.get("pre_pages", []):
+            if blk.get("title"):
+                headings.append((int(blk.get("title_level", 4)), blk["title"]))
+        for item in cfg.get("structure", []):
+            headings.append((int(item["level"]), item["title"]))
+
+    elif fmt_type == "informe":
+        pre = cfg.get("preliminares", {})
+        for key in ("dedicatoria", "resumen"):
+            if key in pre:
+                headings.append((1, pre[key]["titulo"]))
+        if "indices" in pre:
+            headings.append((1, pre["indices"]["contenido"]))
+        if "introduccion" in pre:
+            headings.append((1, pre["introduccion"]["titulo"]))
+        for cap in cfg.get("cuerpo", []):
+            headings.append((1, cap["titulo"]))
+            for item in cap.get("contenido", []):
+                headings.append((2, item["texto"]))
+        fin = cfg.get("finales", {})
+        if "referencias" in fin:
+            headings.append((1, fin["referencias"]["titulo"]))
+        if "anexos" in fin:
+            headings.append((1, fin["anexos"]["titulo_seccion"]))
+
+    elif fmt_type == "proyecto":
+        for pag in cfg.get("paginas", []):
+            if pag.get("titulo"):
+                headings.append((1, pag["titulo"]))
+            for cap in pag.get("capitulos", []):
+                if cap.get("titulo"):
+                    headings.append((1, cap["titulo"]))
+                for sec in cap.get("secciones", []):
+                    if sec.get("sub"):
+                        headings.append((2, sec["sub"]))
+
+    return headings
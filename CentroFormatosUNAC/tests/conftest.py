@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los modulos de CentroFormatosUNAC se importan por nombre, como en server.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
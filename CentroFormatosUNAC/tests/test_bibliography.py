@@ -0,0 +1,56 @@
+from bibliography import Bibliography, year_suffix
+
+BIB = """
+@article{p1, author={Perez, Juan}, title={Alfa}, year={2020}, journal={Revista}}
+@article{p2, author={Perez, Juan}, title={Beta}, year={2020}, journal={Revista}}
+@article{p3, author={Perez, Juan}, title={Gamma}, year={2020}, journal={Revista}}
+@article{q1, author={Quispe, Ana}, title={Delta}, year={2021}, journal={Revista}}
+"""
+
+
+def cite_all(bib: Bibliography, text: str) -> str:
+    cited = bib.cite(text)
+    bib.finish()
+    return bib.resolve(cited)
+
+
+def reference_years(bib: Bibliography) -> list:
+    return [ref[0][0] for ref in bib.references()]
+
+
+def test_year_suffix_sequence():
+    assert [year_suffix(i) for i in (0, 1, 25, 26, 27, 51, 52)] == ["a", "b", "z", "aa", "ab", "az", "ba"]
+
+
+def test_suffixes_only_among_cited_entries():
+    bib = Bibliography.from_text(BIB)
+    text = cite_all(bib, "Ver [@p3] y [@p2, p. 4]; tambien [@q1].")
+    # p1 no se cita: Beta y Gamma quedan 2020a y 2020b, sin saltar letra
+    assert text == "Ver (Perez, 2020b) y (Perez, 2020a, p. 4); tambien (Quispe, 2021)."
+    assert reference_years(bib) == ["Perez, J. (2020a). ", "Perez, J. (2020b). ", "Quispe, A. (2021). "]
+
+
+def test_single_cited_entry_of_group_has_no_suffix():
+    bib = Bibliography.from_text(BIB)
+    assert cite_all(bib, "Solo [@p2].") == "Solo (Perez, 2020)."
+    assert reference_years(bib) == ["Perez, J. (2020). "]
+
+
+def test_suffix_follows_title_order_not_citation_order():
+    bib = Bibliography.from_text(BIB)
+    assert cite_all(bib, "[@p3; @p1]") == "(Perez, 2020b; Perez, 2020a)"
+
+
+def test_citation_before_its_group_is_complete_gets_final_suffix():
+    # La primera cita de p2 se escribe antes de conocer p1: la marca se resuelve al final
+    bib = Bibliography.from_text(BIB)
+    first = bib.cite("[@p2]")
+    second = bib.cite("[@p1]")
+    bib.finish()
+    assert (bib.resolve(first), bib.resolve(second)) == ("(Perez, 2020b)", "(Perez, 2020a)")
+
+
+def test_missing_key_is_marked():
+    bib = Bibliography.from_text(BIB)
+    assert cite_all(bib, "[@nada]") == "(¿nada?)"
+    assert bib.missing == {"nada"}
@@ -0,0 +1,51 @@
+from bulk import Checkpoint, output_name, unique_name
+
+SIGNATURE = {"input": "datos.csv", "template": "maestria/cuant"}
+
+
+def test_out_of_order_completions_advance_done_upto(tmp_path):
+    cp = Checkpoint.load(str(tmp_path / "cp.json"), SIGNATURE)
+    for index in (2, 0, 4):
+        cp.mark(index, ok=True)
+    assert (cp.done_upto, cp.done) == (1, {2, 4})
+    cp.mark(1, ok=False)
+    assert (cp.done_upto, cp.done) == (3, {4})
+    cp.mark(3, ok=True)
+    assert (cp.done_upto, cp.done) == (5, set())
+    assert (cp.ok, cp.failed) == (4, 1)
+
+
+def test_resume_skips_only_finished_rows(tmp_path):
+    path = str(tmp_path / "cp.json")
+    cp = Checkpoint.load(path, SIGNATURE)
+    for index in (0, 1, 3, 6):
+        cp.mark(index, ok=index != 3)
+    cp.save(force=True)
+
+    resumed = Checkpoint.load(path, SIGNATURE)
+    assert [i for i in range(8) if not resumed.is_done(i)] == [2, 4, 5, 7]
+    assert (resumed.ok, resumed.failed) == (3, 1)
+    for index in (5, 2, 4, 7):
+        resumed.mark(index, ok=True)
+    assert (resumed.done_upto, resumed.done) == (8, set())
+
+
+def test_other_signature_or_restart_starts_over(tmp_path):
+    path = str(tmp_path / "cp.json")
+    cp = Checkpoint.load(path, SIGNATURE)
+    cp.mark(0, ok=True)
+    cp.save(force=True)
+    assert Checkpoint.load(path, dict(SIGNATURE, template="maestria/cual")).done_upto == 0
+    assert Checkpoint.load(path, SIGNATURE, restart=True).done_upto == 0
+    assert Checkpoint.load(path, SIGNATURE).done_upto == 1
+
+
+def test_unique_names_are_stable_across_resume():
+    rows = [{"nombre": "Ana Perez"}, {"nombre": "ana perez"}, {"nombre": ""}, {"nombre": "Ana Perez"}]
+
+    def names():
+        used = set()
+        return [unique_name(output_name(row, i, "nombre"), used) for i, row in enumerate(rows)]
+
+    assert names() == ["Ana_Perez.docx", "ana_perez_2.docx", "fila_000003.docx", "Ana_Perez_3.docx"]
+    assert names() == names()
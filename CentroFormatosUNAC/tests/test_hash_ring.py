@@ -0,0 +1,48 @@
+from render_farm import HashRing
+
+NODES = ["http://w1:5001", "http://w2:5001", "http://w3:5001", "http://w4:5001"]
+KEYS = [f"render:maestria/cuant:{i}" for i in range(2000)]
+
+
+def owners(ring: HashRing) -> dict:
+    return {key: ring.preference(key)[0] for key in KEYS}
+
+
+def test_removing_a_node_moves_only_its_keys():
+    ring = HashRing(NODES)
+    before = owners(ring)
+    ring.remove("http://w2:5001")
+    after = owners(ring)
+
+    moved = {key for key in KEYS if before[key] != after[key]}
+    assert moved == {key for key in KEYS if before[key] == "http://w2:5001"}
+    # Cada clave movida pasa al siguiente worker de su lista de preferencia
+    ring_full = HashRing(NODES)
+    assert all(after[key] == ring_full.preference(key)[1] for key in moved)
+    # ~1/N de las claves, no una redistribucion completa
+    assert 0.1 < len(moved) / len(KEYS) < 0.4
+
+
+def test_readding_a_node_restores_its_keys():
+    ring = HashRing(NODES)
+    before = owners(ring)
+    ring.remove("http://w3:5001")
+    ring.add("http://w3:5001")
+    assert owners(ring) == before
+    assert len(ring.points) == len(NODES) * ring.vnodes
+
+
+def test_preference_lists_every_node_once():
+    ring = HashRing(NODES)
+    for key in KEYS[:50]:
+        order = ring.preference(key)
+        assert sorted(order) == sorted(NODES)
+    ring.remove("http://w1:5001")
+    assert "http://w1:5001" not in ring.nodes
+    assert all("http://w1:5001" not in ring.preference(key) for key in KEYS[:50])
+
+
+def test_empty_ring_has_no_preference():
+    ring = HashRing(["http://w1:5001"])
+    ring.remove("http://w1:5001")
+    assert ring.preference("render:informe/cual") == []
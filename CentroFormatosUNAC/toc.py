@@ -0,0 +1,332 @@
+import math
+import re
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_TAB_ALIGNMENT, WD_TAB_LEADER
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Cm, Pt
+
+from format_rules import PAGE_A4_CM, UNAC_MARGINS_CM
+from preview import CHARS_PER_LINE, LINES_PER_PAGE
+
+TEXT_WIDTH_CM = PAGE_A4_CM[0] - UNAC_MARGINS_CM["left"] - UNAC_MARGINS_CM["right"]
+TOC_RE = re.compile(r"^\s*TOC\b")
+TOC_LEVELS_RE = re.compile(r'\\o\s+"(\d)-(\d)"')
+TOC_CAPTION_RE = re.compile(r'\\c\s+"([^"]+)"')
+SEQ_RE = re.compile(r"^\s*SEQ\s+(\S+)")
+HEADING_NAME_RE = re.compile(r"^heading (\d)$")
+BOOKMARK_PREFIX = "_Toc"
+EMU_PER_LINE = 914400 * 0.25   # ~18 pt de interlineado
+EMPTY_TOC_TEXT = "No se encontraron entradas para el indice."
+
+
+def toc_instr(min_level: int = 1, max_level: int = 3) -> str:
+    return f' TOC \\o "{min_level}-{max_level}" \\h \\z \\u '
+
+
+def caption_toc_instr(label: str) -> str:
+    return f' TOC \\h \\z \\c "{label}" '
+
+# -------------------------
+# CAMPOS COMPLEJOS
+# -------------------------
+
+def _fld_char(kind: str):
+    run = OxmlElement("w:r")
+    fld = OxmlElement("w:fldChar")
+    fld.set(qn("w:fldCharType"), kind)
+    run.append(fld)
+    return run
+
+
+def _instr_run(instr: str):
+    run = OxmlElement("w:r")
+    t = OxmlElement("w:instrText")
+    t.set(qn("xml:space"), "preserve")
+    t.text = instr
+    run.append(t)
+    return run
+
+
+def _text_run(text: str):
+    run = OxmlElement("w:r")
+    t = OxmlElement("w:t")
+    t.set(qn("xml:space"), "preserve")
+    t.text = text
+    run.append(t)
+    return run
+
+
+def add_toc_field(paragraph, instr: str):
+    """Deja el campo TOC (begin/instr/separate/end) listo para que render_tocs lo llene."""
+    p = paragraph._p
+    for run in (_fld_char("begin"), _instr_run(instr), _fld_char("separate"), _fld_char("end")):
+        p.append(run)
+    return paragraph
+
+# -------------------------
+# ESTILOS TOC
+# -------------------------
+
+def _entry_style(doc, name: str, indent_cm: float):
+    try:
+        return doc.styles[name]
+    except KeyError:
+        pass
+    style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = doc.styles["Normal"]
+    style.hidden = False
+    style.unhide_when_used = True
+    fmt = style.paragraph_format
+    fmt.left_indent = Cm(indent_cm)
+    fmt.space_after = Pt(3)
+    fmt.tab_stops.add_tab_stop(Cm(TEXT_WIDTH_CM), WD_TAB_ALIGNMENT.RIGHT, WD_TAB_LEADER.DOTS)
+    return style
+
+
+def _heading_levels(doc) -> dict:
+    levels = {}
+    for style in doc.styles:
+        if style.type != WD_STYLE_TYPE.PARAGRAPH:
+            continue
+        m = HEADING_NAME_RE.match((style.name or "").lower())
+        if m:
+            levels[style.style_id] = int(m.group(1))
+    return levels
+
+# -------------------------
+# RECORRIDO UNICO DEL BODY
+# -------------------------
+
+def _paragraph_text(p) -> str:
+    return "".join(t.text or "" for t in p.iter(qn("w:t"))).strip()
+
+
+def _paragraph_lines(p, text: str) -> int:
+    lines = max(1, math.ceil(len(text) / CHARS_PER_LINE))
+    for extent in p.iter(qn("wp:extent")):
+        lines += math.ceil(int(extent.get("cy", 0)) / EMU_PER_LINE)
+    return lines
+
+
+def _first_instr(p) -> str:
+    """Instruccion del primer campo del parrafo (hasta su separate), sin los PAGEREF anidados."""
+    parts, inside = [], False
+    for el in p.iter(qn("w:fldChar"), qn("w:instrText")):
+        if el.tag == qn("w:instrText"):
+            if inside:
+                parts.append(el.text or "")
+        elif el.get(qn("w:fldCharType")) == "begin" and not inside and not parts:
+            inside = True
+        else:
+            break
+    return "".join(parts)
+
+
+def _legacy_toc(p):
+    """Convierte un fldSimple TOC (plantillas anteriores) en campo complejo; devuelve la instruccion."""
+    for fld in p.iter(qn("w:fldSimple")):
+        instr = fld.get(qn("w:instr"), "")
+        if TOC_RE.match(instr):
+            instr = instr.replace("\\\\", "\\")
+            for child in list(p):
+                if child.tag != qn("w:pPr"):
+                    p.remove(child)
+            for run in (_fld_char("begin"), _instr_run(instr), _fld_char("separate"), _fld_char("end")):
+                p.append(run)
+            return instr
+    return None
+
+
+def scan_body(doc) -> dict:
+    """
+    Una sola pasada por el body: titulos y leyendas SEQ con su pagina estimada
+    (saltos explicitos + desborde por lineas) y la ubicacion de cada campo TOC.
+    """
+    heading_levels = _heading_levels(doc)
+    items, fields = [], []
+    page, lines = 1, 0
+    toc_field, depth = None, 0
+
+    for el in doc.element.body.iterchildren():
+        if el.tag == qn("w:tbl"):
+            lines += len(el.findall(qn("w:tr")))
+            continue
+        if el.tag != qn("w:p"):
+            continue
+
+        if toc_field is None:
+            instr = _first_instr(el)
+            if not TOC_RE.match(instr):
+                instr = _legacy_toc(el) or instr
+            if TOC_RE.match(instr):
+                toc_field = {"p": el, "end": None, "instr": instr, "page": page, "after": len(items)}
+                depth = 0
+
+        if toc_field is not None:
+            # Las entradas ya renderizadas no cuentan: se recalculan al final
+            for fld in el.iter(qn("w:fldChar")):
+                kind = fld.get(qn("w:fldCharType"))
+                depth += 1 if kind == "begin" else -1 if kind == "end" else 0
+            if depth <= 0:
+                toc_field["end"] = el
+                fields.append(toc_field)
+                toc_field = None
+                lines += 1
+            continue
+
+        ppr = el.find(qn("w:pPr"))
+        if ppr is not None and ppr.find(qn("w:pageBreakBefore")) is not None and lines:
+            page, lines = page + 1, 0
+
+        text = _paragraph_text(el)
+        lines += _paragraph_lines(el, text)
+        if lines > LINES_PER_PAGE:
+            page, lines = page + lines // LINES_PER_PAGE, lines % LINES_PER_PAGE
+
+        pstyle = ppr.find(qn("w:pStyle")) if ppr is not None else None
+        level = heading_levels.get(pstyle.get(qn("w:val"))) if pstyle is not None else None
+        if level and text:
+            items.append({"kind": "heading", "level": level, "text": text, "p": el, "page": page})
+        else:
+            for fld in el.iter(qn("w:fldSimple")):
+                m = SEQ_RE.match(fld.get(qn("w:instr"), ""))
+                if m and text:
+                    items.append({"kind": "caption", "label": m.group(1), "text": text, "p": el, "page": page})
+                    break
+
+        if any(br.get(qn("w:type")) == "page" for br in el.iter(qn("w:br"))):
+            page, lines = page + 1, 0
+
+    return {"items": items, "fields": fields}
+
+# -------------------------
+# MARCADORES Y ENTRADAS
+# -------------------------
+
+def _bookmark(p, next_id: list) -> str:
+    for start in p.findall(qn("w:bookmarkStart")):
+        if start.get(qn("w:name"), "").startswith(BOOKMARK_PREFIX):
+            return start.get(qn("w:name"))
+    bm_id = next_id[0]
+    next_id[0] += 1
+    name = f"{BOOKMARK_PREFIX}{bm_id:09d}"
+    start = OxmlElement("w:bookmarkStart")
+    start.set(qn("w:id"), str(bm_id))
+    start.set(qn("w:name"), name)
+    end = OxmlElement("w:bookmarkEnd")
+    end.set(qn("w:id"), str(bm_id))
+    ppr = p.find(qn("w:pPr"))
+    if ppr is not None:
+        ppr.addnext(start)
+    else:
+        p.insert(0, start)
+    p.append(end)
+    return name
+
+
+def _entry_children(text: str, bookmark: str, page: int) -> list:
+    link = OxmlElement("w:hyperlink")
+    link.set(qn("w:anchor"), bookmark)
+    link.set(qn("w:history"), "1")
+    tab = OxmlElement("w:r")
+    tab.append(OxmlElement("w:tab"))
+    for run in (_text_run(text), tab, _fld_char("begin"), _instr_run(f" PAGEREF {bookmark} \\h "),
+                _fld_char("separate"), _text_run(str(page)), _fld_char("end")):
+        link.append(run)
+    return [link]
+
+
+def _set_style(p, style_id: str):
+    ppr = p.find(qn("w:pPr"))
+    if ppr is None:
+        ppr = OxmlElement("w:pPr")
+        p.insert(0, ppr)
+    for old in ppr.findall(qn("w:pStyle")):
+        ppr.remove(old)
+    pstyle = OxmlElement("w:pStyle")
+    pstyle.set(qn("w:val"), style_id)
+    ppr.insert(0, pstyle)
+    # El titulo del indice centra su propio parrafo; las entradas van alineadas
+    for jc in ppr.findall(qn("w:jc")):
+        ppr.remove(jc)
+
+
+def _fill_field(field: dict, entries: list):
+    """Reemplaza el resultado del campo: el parrafo del campo pasa a ser la primera entrada."""
+    p, end = field["p"], field["end"]
+    while end is not p:
+        nxt = p.getnext()
+        nxt.getparent().remove(nxt)
+        if nxt is end:
+            break
+    for child in list(p):
+        if child.tag != qn("w:pPr"):
+            p.remove(child)
+
+    head = [_fld_char("begin"), _instr_run(field["instr"]), _fld_char("separate")]
+    if not entries:
+        for run in head + [_text_run(EMPTY_TOC_TEXT), _fld_char("end")]:
+            p.append(run)
+        return
+
+    prev = None
+    for i, (style_id, children) in enumerate(entries):
+        para = p if i == 0 else OxmlElement("w:p")
+        _set_style(para, style_id)
+        for child in (head if i == 0 else []) + children:
+            para.append(child)
+        if prev is not None:
+            prev.addnext(para)
+        prev = para
+    prev.append(_fld_char("end"))
+
+
+def render_tocs(doc) -> dict:
+    """
+    Prerenderiza todos los campos TOC del documento (contenido y \\c "Figura"/"Tabla")
+    con marcadores _Toc, hipervinculos y PAGEREF ya resueltos; devuelve {instr: entradas}.
+    """
+    scan = scan_body(doc)
+    if not scan["fields"]:
+        return {}
+
+    body = doc.element.body
+    next_id = [1 + max((int(b.get(qn("w:id"), 0)) for b in body.iter(qn("w:bookmarkStart"))), default=0)]
+
+    plans = []
+    for field in scan["fields"]:
+        caption = TOC_CAPTION_RE.search(field["instr"])
+        levels = TOC_LEVELS_RE.search(field["instr"])
+        lo, hi = (int(levels.group(1)), int(levels.group(2))) if levels else (1, 3)
+        if caption:
+            selected = [it for it in scan["items"] if it["kind"] == "caption" and it["label"] == caption.group(1)]
+        else:
+            selected = [it for it in scan["items"] if it["kind"] == "heading" and lo <= it["level"] <= hi]
+        plans.append((field, caption, selected))
+
+    # Cada indice empuja las paginas de lo que viene despues segun su propio largo
+    shift = [0] * len(scan["items"])
+    for field, _caption, selected in plans:
+        extra = max(0, math.ceil(len(selected) / LINES_PER_PAGE) - 1)
+        for i in range(field["after"], len(shift)):
+            shift[i] += extra
+    page_of = {id(it["p"]): it["page"] + shift[i] for i, it in enumerate(scan["items"])}
+
+    stats = {}
+    for field, caption, selected in plans:
+        style_ids = {}
+        entries = []
+        for it in selected:
+            if caption:
+                name, indent = "table of figures", 0
+            else:
+                name, indent = f"toc {it['level']}", 0.5 * (it["level"] - 1)
+            if name not in style_ids:
+                style_ids[name] = _entry_style(doc, name, indent).style_id
+            bookmark = _bookmark(it["p"], next_id)
+            entries.append((style_ids[name], _entry_children(it["text"], bookmark, page_of[id(it["p"])])))
+        _fill_field(field, entries)
+        stats[field["instr"].strip()] = len(entries)
+    return stats
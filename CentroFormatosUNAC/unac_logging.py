@@ -0,0 +1,183 @@
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+LOG_FORMAT_ENV = "UNAC_LOG_FORMAT"
+REQUEST_ID_ENV = "UNAC_REQUEST_ID"
+REQUEST_ID_HEADER = "X-Request-Id"
+# Lineas de exito de alto volumen (marcadas con extra={"sample": True}): se deja 1 de cada N
+SAMPLE_EVERY = max(1, int(os.environ.get("UNAC_LOG_SAMPLE", 10)))
+LEVEL_TAGS = {"DEBUG": "DEBUG", "INFO": "OK", "WARNING": "WARN", "ERROR": "ERROR", "CRITICAL": "ERROR"}
+ROOT = "unac"
+
+REQUEST_ID = contextvars.ContextVar("unac_request_id", default=None)
+# Atributos propios de LogRecord; el resto de extra={...} va como campo del JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+
+# -------------------------
+# REQUEST ID
+# -------------------------
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def current_request_id():
+    """Id del pedido en curso; en un proceso hijo sin contexto, el heredado por entorno."""
+    return REQUEST_ID.get() or os.environ.get(REQUEST_ID_ENV)
+
+
+@contextmanager
+def request_context(request_id: str = None):
+    token = REQUEST_ID.set(request_id or new_request_id())
+    try:
+        yield REQUEST_ID.get()
+    finally:
+        REQUEST_ID.reset(token)
+
+
+def install_request_ids(app):
+    """Cada pedido Flask toma X-Request-Id (o uno nuevo) y lo devuelve en la respuesta."""
+    from flask import g, request
+
+    @app.before_request
+    def _bind_request_id():
+        g.request_id_token = REQUEST_ID.set(request.headers.get(REQUEST_ID_HEADER) or new_request_id())
+
+    @app.after_request
+    def _echo_request_id(response):
+        response.headers[REQUEST_ID_HEADER] = REQUEST_ID.get() or ""
+        return response
+
+    @app.teardown_request
+    def _unbind_request_id(_exc):
+        token = g.pop("request_id_token", None)
+        if token is not None:
+            REQUEST_ID.reset(token)
+
+# -------------------------
+# FORMATO Y FILTROS
+# -------------------------
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = current_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Deja 1 de cada SAMPLE_EVERY registros INFO marcados sample=True, por mensaje."""
+
+    def __init__(self, every: int = SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self.counters = {}
+
+    def filter(self, record):
+        if not getattr(record, "sample", False) or record.levelno > logging.INFO:
+            return True
+        key = (record.name, record.msg)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters.setdefault(key, itertools.count())
+        n = next(counter)
+        record.sampled = self.every
+        return n % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and k not in entry})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Mismo aspecto que los print historicos: '[OK] mensaje'."""
+
+    def format(self, record):
+        line = f"[{LEVEL_TAGS.get(record.levelname, record.levelname)}] {record.getMessage()}"
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            line += f" (req {request_id})"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+# -------------------------
+# CONFIGURACION (COLA NO BLOQUEANTE)
+# -------------------------
+
+_LISTENER = None
+
+
+def setup_logging(fmt: str = None, level: int = logging.INFO, stream=None):
+    """
+    Configura el logger 'unac' una sola vez por proceso. Quien registra solo encola
+    (QueueHandler); un hilo aparte da formato y escribe en la consola. El formato
+    (json | text) queda en el entorno para que lo hereden los procesos hijos.
+    """
+    global _LISTENER
+    if _LISTENER is not None:
+        return logging.getLogger(ROOT)
+    fmt = os.environ.get(LOG_FORMAT_ENV) or fmt or "text"
+    os.environ[LOG_FORMAT_ENV] = fmt
+
+    console = logging.StreamHandler(stream or sys.stderr)
+    console.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter())
+
+    logger = logging.getLogger(ROOT)
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    _LISTENER = logging.handlers.QueueListener(records, console, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(_LISTENER.stop)
+    return logger
+
+
+def _after_fork_in_child():
+    """El hilo del QueueListener no pasa al hijo de un fork: el hijo escribe directo."""
+    global _LISTENER
+    if _LISTENER is None:
+        return
+    logger = logging.getLogger(ROOT)
+    queued, console = logger.handlers[0], _LISTENER.handlers[0]
+    direct = logging.StreamHandler(console.stream)
+    direct.setFormatter(console.formatter)
+    for flt in queued.filters:
+        direct.addFilter(flt)
+    logger.handlers[:] = [direct]
+    _LISTENER = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_logger(name: str):
+    return logging.getLogger(f"{ROOT}.{name}")
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import time
+
+from parallel_render import chunk_cache
+from template_bundle import BASE_DIR, template_assets
+from unac_logging import get_logger
+
+POLL_S = float(os.environ.get("UNAC_WATCH_POLL_S", 0.25))
+
+log = get_logger("watch")
+
+
+def _stat(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def _digest(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+def watched_paths(json_path: str) -> list:
+    """El JSON y los assets que usa (logos), segun la familia de su carpeta formats/<familia>/."""
+    family = os.path.basename(os.path.dirname(os.path.abspath(json_path)))
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            assets = template_assets(family, json.load(f))
+    except (OSError, ValueError):
+        assets = []
+    return [os.path.abspath(json_path)] + [os.path.join(BASE_DIR, a) for a in assets]
+
+
+def default_output(json_path: str) -> str:
+    return os.path.abspath(os.path.splitext(os.path.basename(json_path))[0] + ".docx")
+
+
+def _replace(tmp_path: str, output_path: str) -> bool:
+    try:
+        os.replace(tmp_path, output_path)
+        return True
+    except PermissionError:
+        # Windows: Word tiene el archivo abierto; el nuevo queda en .tmp hasta el proximo cambio
+        log.warning("No se pudo reemplazar %s (abierto en Word?); ultimo render en %s", output_path, tmp_path)
+        return False
+
+
+def watch_template(json_path: str, build, output_path: str = None, interval: float = POLL_S):
+    """
+    Modo autor: proceso caliente que vuelve a generar al guardar el JSON o un asset.
+    build(ruta_salida) genera el documento. Solo se rehacen los capitulos/paginas que
+    cambiaron (cache de chunks) y la salida se reemplaza de forma atomica. Ctrl+C sale.
+    """
+    # El bundle precompilado no ve los cambios de assets: en modo watch se lee del disco
+    os.environ["UNAC_BUNDLE"] = "0"
+    output_path = os.path.abspath(output_path or default_output(json_path))
+    tmp_path = output_path + ".tmp"
+    fragments, last_digests = {}, None
+    seen = {}
+    paths = watched_paths(json_path)
+    print(f"[OK] Vigilando {json_path} -> {output_path} (Ctrl+C para salir)")
+    try:
+        while True:
+            current = {p: _stat(p) for p in paths}
+            if current != seen:
+                # Espera a que el editor termine de escribir (dos lecturas iguales)
+                time.sleep(interval)
+                if {p: _stat(p) for p in paths} != current:
+                    continue
+                seen = current
+                # Guardar sin cambios (solo mtime) no vuelve a generar
+                digests = [_digest(p) for p in paths]
+                if digests != last_digests:
+                    _render(build, tmp_path, output_path, fragments, "|".join(digests[1:]))
+                    last_digests = digests
+                # El JSON puede apuntar a otro logo
+                paths = watched_paths(json_path)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("[OK] Modo watch terminado")
+
+
+def _render(build, tmp_path: str, output_path: str, fragments: dict, assets_digest: str):
+    t0 = time.perf_counter()
+    try:
+        with chunk_cache(fragments, salt=assets_digest) as stats:
+            build(tmp_path)
+    except Exception as exc:
+        # JSON a medio editar o invalido: se informa y se sigue vigilando
+        log.error("Render fallido: %s", exc)
+        return
+    ms = (time.perf_counter() - t0) * 1000
+    if _replace(tmp_path, output_path):
+        size = os.path.getsize(output_path)
+        print(f"[OK] {time.strftime('%H:%M:%S')} renderizado en {ms:.0f} ms, {size // 1024} KB "
+              f"({stats['reused']} bloques reutilizados, {stats['rendered']} nuevos)")
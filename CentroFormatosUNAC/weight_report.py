@@ -0,0 +1,263 @@
+import argparse
+import contextvars
+import hashlib
+import io
+import json
+import os
+import posixpath
+import sys
+import time
+import zipfile
+from contextlib import contextmanager
+
+from lxml import etree
+
+from docx_package import R_NS, rels_path, resolve_target, w
+from progress import section_started
+
+A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+MEDIA_PREFIX = "word/media/"
+XML_EXTENSIONS = (".xml", ".rels")
+# Umbrales de las alertas del reporte
+MEDIA_WARN_KB = 200
+TABLE_WARN = 20
+REPEAT_WARN = 10
+TOP_PARTS = 10
+
+COUNTED_TAGS = {
+    w("p"): "paragraphs",
+    w("r"): "runs",
+    w("tbl"): "tables",
+    w("fldSimple"): "fields",
+    w("drawing"): "drawings",
+}
+FLD_CHAR = w("fldChar")
+FLD_CHAR_TYPE = w("fldCharType")
+
+# -------------------------
+# TIEMPO POR SECCION
+# -------------------------
+
+_TIMINGS = contextvars.ContextVar("unac_build_timings", default=None)
+
+
+@contextmanager
+def collect_timings():
+    """Activa la medicion de build_section() para lo que se genere dentro del bloque."""
+    timings = {}
+    token = _TIMINGS.set((timings, []))
+    try:
+        yield timings
+    finally:
+        _TIMINGS.reset(token)
+
+
+@contextmanager
+def build_section(name: str):
+    """
+    Suma el tiempo propio del bloque a la seccion 'name': una seccion anidada (las
+    tablas de encabezado dentro de cada pagina) se descuenta de la que la contiene,
+    asi las secciones suman el total. Sin collect_timings() no mide nada. Tambien es
+    el punto donde se avisa la etapa al progreso del trabajo (progress.py).
+    """
+    section_started(name)
+    state = _TIMINGS.get()
+    if state is None:
+        yield
+        return
+    timings, stack = state
+    stack.append(0.0)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        timings[name] = timings.get(name, 0.0) + elapsed - stack.pop()
+        if stack:
+            stack[-1] += elapsed
+
+# -------------------------
+# ANALISIS DEL PAQUETE
+# -------------------------
+
+def count_elements(data: bytes) -> dict:
+    counts = dict.fromkeys(COUNTED_TAGS.values(), 0)
+    for el in etree.fromstring(data).iter(*COUNTED_TAGS, FLD_CHAR):
+        if el.tag == FLD_CHAR:
+            # Campo complejo: se cuenta una vez, en su fldChar de inicio
+            counts["fields"] += el.get(FLD_CHAR_TYPE) == "begin"
+        else:
+            counts[COUNTED_TAGS[el.tag]] += 1
+    return counts
+
+
+def _image_targets(zf: zipfile.ZipFile, part: str, data: bytes) -> list:
+    """Media referenciada por cada a:blip de la parte (una entrada por dibujo)."""
+    rels = {}
+    try:
+        for rel in etree.fromstring(zf.read(rels_path(part))):
+            rels[rel.get("Id")] = resolve_target(part, rel.get("Target", ""))
+    except KeyError:
+        return []
+    return [rels.get(blip.get(f"{{{R_NS}}}embed")) for blip in etree.fromstring(data).iter(A_BLIP)]
+
+
+def analyze_package(source) -> dict:
+    """Peso del DOCX (ruta, bytes o stream): partes, media, elementos e imagenes repetidas."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as zf:
+        infos = zf.infolist()
+        elements = {"document": None, "headers_footers": dict.fromkeys(COUNTED_TAGS.values(), 0)}
+        media, references = {}, {}
+        for info in infos:
+            name = info.filename
+            if name.startswith(MEDIA_PREFIX):
+                data = zf.read(name)
+                media[name] = {"name": name, "size": info.file_size,
+                               "sha1": hashlib.sha1(data).hexdigest()}
+                continue
+            if not name.startswith("word/") or not name.endswith(".xml") or "/_rels/" in name:
+                continue
+            base = posixpath.basename(name)
+            if base != "document.xml" and not base.startswith(("header", "footer")):
+                continue
+            data = zf.read(name)
+            counts = count_elements(data)
+            if base == "document.xml":
+                elements["document"] = counts
+            else:
+                for key, value in counts.items():
+                    elements["headers_footers"][key] += value
+            for target in _image_targets(zf, name, data):
+                if target:
+                    references[target] = references.get(target, 0) + 1
+
+    by_hash = {}
+    for item in media.values():
+        by_hash.setdefault(item["sha1"], []).append(item["name"])
+        item["references"] = references.get(item["name"], 0)
+    duplicate_parts = [names for names in by_hash.values() if len(names) > 1]
+    parts = sorted(
+        ({"name": i.filename, "size": i.file_size, "compressed": i.compress_size,
+          "stored": i.compress_type == zipfile.ZIP_STORED} for i in infos),
+        key=lambda p: p["compressed"], reverse=True,
+    )
+    return {
+        "bytes": sum(i.compress_size for i in infos),
+        "uncompressed": sum(i.file_size for i in infos),
+        "xml_bytes": sum(i.file_size for i in infos if i.filename.endswith(XML_EXTENSIONS)),
+        "parts": parts,
+        "elements": elements,
+        "media": sorted(media.values(), key=lambda m: m["size"], reverse=True),
+        "images": {
+            "parts": len(media),
+            "references": sum(references.values()),
+            # Mismos bytes guardados en mas de una parte
+            "duplicate_parts": sum(len(names) - 1 for names in duplicate_parts),
+            # La misma parte dibujada otra vez (p. ej. el logo en cada tabla de encabezado)
+            "repeated_references": sum(n - 1 for n in references.values() if n > 1),
+        },
+    }
+
+
+def weight_hints(report: dict) -> list:
+    hints = []
+    for item in report["media"]:
+        if item["size"] > MEDIA_WARN_KB * 1024:
+            hints.append(f"{item['name']} pesa {item['size'] // 1024} KB (umbral {MEDIA_WARN_KB} KB)")
+    if report["images"]["duplicate_parts"]:
+        hints.append(f"{report['images']['duplicate_parts']} imagen(es) guardadas mas de una vez con los mismos bytes")
+    for item in report["media"]:
+        if item["references"] >= REPEAT_WARN:
+            hints.append(f"{item['name']} se dibuja {item['references']} veces")
+    tables = (report["elements"]["document"] or {}).get("tables", 0)
+    if tables >= TABLE_WARN:
+        hints.append(f"{tables} tablas en el cuerpo (revisar tablas de encabezado por pagina)")
+    return hints
+
+
+def weight_report(source, timings: dict = None) -> dict:
+    """Reporte completo: analisis del paquete, tiempo por seccion (si se midio) y alertas."""
+    report = analyze_package(source)
+    report["sections_ms"] = {k: round(v * 1000, 1) for k, v in (timings or {}).items()} or None
+    report["hints"] = weight_hints(report)
+    return report
+
+
+def report_summary(report: dict) -> dict:
+    """Resumen corto (cabecera HTTP, linea de consola)."""
+    top = report["parts"][0] if report["parts"] else {}
+    return {
+        "bytes": report["bytes"],
+        "uncompressed": report["uncompressed"],
+        "media_bytes": sum(m["size"] for m in report["media"]),
+        "top_part": top.get("name"),
+        "duplicate_images": report["images"]["duplicate_parts"] + report["images"]["repeated_references"],
+        "sections_ms": report["sections_ms"],
+        "hints": len(report["hints"]),
+    }
+
+
+def sidecar_path(docx_path: str) -> str:
+    return os.path.splitext(docx_path)[0] + ".weight.json"
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Tamano: {report['bytes'] // 1024} KB en disco, {report['uncompressed'] // 1024} KB sin comprimir "
+             f"({report['xml_bytes'] // 1024} KB de XML)"]
+    for label, counts in report["elements"].items():
+        if counts:
+            lines.append(f"Elementos ({label}): " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    lines.append("Partes mas pesadas:")
+    for part in report["parts"][:TOP_PARTS]:
+        lines.append(f"  {part['name']:<40} {part['compressed']:>9} B  ({part['size']} B"
+                     f"{', sin deflate' if part['stored'] else ''})")
+    images = report["images"]
+    lines.append(f"Imagenes: {images['parts']} partes, {images['references']} dibujos, "
+                 f"{images['duplicate_parts']} duplicadas, {images['repeated_references']} repetidas")
+    if report["sections_ms"]:
+        lines.append("Tiempo por seccion: " + ", ".join(f"{k} {v} ms" for k, v in report["sections_ms"].items()))
+    lines.extend(f"[WARN] {hint}" for hint in report["hints"])
+    return "\n".join(lines)
+
+
+def emit_report(docx_path: str, timings: dict = None, report_path: str = None) -> dict:
+    """Para las CLI: escribe el JSON junto al DOCX (o en report_path) e imprime el resumen."""
+    report = weight_report(docx_path, timings)
+    target = report_path or sidecar_path(docx_path)
+    write_report(report, target)
+    print(format_report(report))
+    print(f"[OK] Reporte de peso: {target}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte de peso de un DOCX: partes, media, elementos y tiempos")
+    parser.add_argument("docx", nargs="?", help="DOCX a analizar (sin --format)")
+    parser.add_argument("--format", help="Genera la plantilla (proyecto | informe | maestria) midiendo cada seccion")
+    parser.add_argument("--sub-type", default="cuant", help="cuant | cual")
+    parser.add_argument("--json", action="store_true", help="Imprime el reporte completo en JSON")
+    args = parser.parse_args()
+
+    timings = None
+    if args.format:
+        from render_farm import render_with_report
+        from templates import resolve_key
+        fmt_type, sub_type = resolve_key(args.format, args.sub_type)
+        source, timings = render_with_report(fmt_type, sub_type, {"deterministic": True})
+    elif args.docx:
+        source = args.docx
+    else:
+        parser.error("Indique un DOCX o --format")
+    try:
+        report = weight_report(source, timings)
+    except (OSError, zipfile.BadZipFile, etree.XMLSyntaxError) as exc:
+        print(f"[ERROR] No se pudo analizar: {exc}")
+        sys.exit(1)
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
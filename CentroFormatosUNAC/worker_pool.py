@@ -0,0 +1,307 @@
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from progress import progress_sink
+from unac_logging import REQUEST_ID, current_request_id, get_logger, setup_logging
+
+POOL_WORKERS = int(os.environ.get("UNAC_POOL_WORKERS", min(2, os.cpu_count() or 1)))
+WALL_TIMEOUT_S = float(os.environ.get("UNAC_JOB_TIMEOUT_S", 120))
+CPU_LIMIT_S = int(os.environ.get("UNAC_JOB_CPU_S", 60))
+MEMORY_LIMIT_MB = int(os.environ.get("UNAC_JOB_MEM_MB", 2048))
+# Reciclado: un worker se reemplaza tras N trabajos o si su RSS pasa el umbral
+MAX_JOBS_PER_WORKER = int(os.environ.get("UNAC_WORKER_MAX_JOBS", 200))
+MAX_RSS_MB = int(os.environ.get("UNAC_WORKER_MAX_RSS_MB", 768))
+POLL_S = 0.05
+KILL_REASONS = ("wall_timeout", "cpu_limit", "memory_limit", "cancelled", "crashed")
+RECYCLE_REASONS = ("max_jobs", "rss")
+# Modulos que el forkserver importa una vez: cada worker nace con los generadores cargados
+PRELOAD = ["render_farm", "markdown_ingest", "generador_maestria", "generador_informe_tesis",
+           "generador_proyecto_tesis"]
+
+log = get_logger("worker_pool")
+
+
+class JobTimeout(RuntimeError):
+    """El trabajo paso el tiempo de pared; el worker se mato."""
+
+
+class JobCancelled(RuntimeError):
+    """El trabajo se cancelo desde la API; el worker se mato si estaba corriendo."""
+
+
+class WorkerCrashed(RuntimeError):
+    """El worker murio (limite de CPU o de memoria, o un fallo nativo)."""
+
+# -------------------------
+# LADO DEL WORKER
+# -------------------------
+
+def rss_mb() -> float:
+    """RSS actual del proceso (Linux); en otros sistemas el pico que da getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576 if peak > 1 << 30 else peak / 1024
+
+
+def apply_memory_limit(mem_mb: int):
+    if resource is None or not mem_mb:
+        return
+    limit = mem_mb << 20
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as exc:
+        log.warning("No se pudo limitar la memoria del worker: %s", exc)
+
+
+def apply_cpu_limit(cpu_s: int):
+    """RLIMIT_CPU es acumulado por proceso: el limite blando se corre al uso actual + cpu_s."""
+    if resource is None or not cpu_s:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + cpu_s
+    _soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError) as exc:
+        log.warning("No se pudo limitar la CPU del trabajo: %s", exc)
+
+
+def _worker_main(conn, mem_mb: int):
+    # Ctrl+C lo atiende el proceso padre, que cierra el pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging()
+    apply_memory_limit(mem_mb)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        fn, args, cpu_s, request_id, report_progress = msg
+        apply_cpu_limit(cpu_s)
+        token = REQUEST_ID.set(request_id)
+        # Las etapas del render viajan al padre por el mismo pipe, antes del resultado
+        sink = (lambda event: conn.send(("progress", event, rss_mb()))) if report_progress else None
+        try:
+            with progress_sink(sink):
+                result = fn(*args)
+            conn.send(("ok", result, rss_mb()))
+        except MemoryError:
+            conn.send(("memory_limit", "Memoria agotada", rss_mb()))
+            break
+        except Exception as exc:
+            conn.send(("error", (type(exc).__name__, str(exc)), rss_mb()))
+        finally:
+            REQUEST_ID.reset(token)
+
+# -------------------------
+# LADO DEL PADRE
+# -------------------------
+
+def _context():
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(PRELOAD)
+        return ctx
+    return mp.get_context("spawn")
+
+
+class _Worker:
+    def __init__(self, ctx, mem_mb: int):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, mem_mb), daemon=True)
+        self.proc.start()
+        child.close()
+        self.jobs = 0
+        self.rss_mb = 0.0
+
+    def kill(self):
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.proc.join(timeout=2)
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Procesos de render persistentes con limites por trabajo: tiempo de pared (el padre
+    mata al worker), CPU y memoria (setrlimit dentro del worker). Cada muerte y cada
+    reciclado queda en metrics().
+    """
+
+    def __init__(self, size: int = POOL_WORKERS, wall_s: float = WALL_TIMEOUT_S, cpu_s: int = CPU_LIMIT_S,
+                 mem_mb: int = MEMORY_LIMIT_MB, max_jobs: int = MAX_JOBS_PER_WORKER, max_rss_mb: int = MAX_RSS_MB):
+        self.size = max(1, size)
+        self.wall_s = wall_s
+        self.cpu_s = cpu_s
+        self.mem_mb = mem_mb
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.ctx = None
+        self.idle = queue.Queue()
+        self.spawned = 0
+        self.busy = 0
+        self.lock = threading.Lock()
+        self.counters = {"jobs": 0, "ok": 0, "errors": 0, "spawned": 0}
+        self.kills = dict.fromkeys(KILL_REASONS, 0)
+        self.recycled = dict.fromkeys(RECYCLE_REASONS, 0)
+        self.latencies = []
+        if resource is None:
+            log.warning("Sin modulo resource: solo se aplica el tiempo de pared, no CPU ni memoria.")
+
+    def _spawn(self) -> _Worker:
+        if self.ctx is None:
+            self.ctx = _context()
+        with self.lock:
+            self.counters["spawned"] += 1
+        return _Worker(self.ctx, self.mem_mb)
+
+    def _acquire(self, cancel: threading.Event = None) -> _Worker:
+        while True:
+            with self.lock:
+                can_spawn = self.spawned < self.size
+                if can_spawn:
+                    self.spawned += 1
+            if can_spawn:
+                try:
+                    return self._spawn()
+                except Exception:
+                    with self.lock:
+                        self.spawned -= 1
+                    raise
+            try:
+                return self.idle.get(timeout=POLL_S * 4)
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    raise JobCancelled("Trabajo cancelado antes de empezar")
+
+    def _retire(self, worker: _Worker, reason: str, kill: bool):
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        with self.lock:
+            self.spawned -= 1
+            if reason in self.kills:
+                self.kills[reason] += 1
+            else:
+                self.recycled[reason] += 1
+        level = logging.WARNING if reason in self.kills else logging.INFO
+        log.log(level, "Worker %s retirado: %s (%s trabajos, %.0f MB)", worker.proc.pid, reason, worker.jobs,
+                worker.rss_mb, extra={"reason": reason})
+
+    def _release(self, worker: _Worker):
+        if worker.jobs >= self.max_jobs:
+            self._retire(worker, "max_jobs", kill=False)
+        elif self.max_rss_mb and worker.rss_mb > self.max_rss_mb:
+            self._retire(worker, "rss", kill=False)
+        else:
+            self.idle.put(worker)
+
+    def _death_reason(self, worker: _Worker) -> str:
+        worker.proc.join(timeout=1)
+        code = worker.proc.exitcode
+        if hasattr(signal, "SIGXCPU") and code == -signal.SIGXCPU:
+            return "cpu_limit"
+        if hasattr(signal, "SIGKILL") and code == -signal.SIGKILL:
+            # Nadie en el pool lo mato: el OOM killer del sistema
+            return "memory_limit"
+        return "crashed"
+
+    def run(self, fn, *args, timeout: float = None, cancel: threading.Event = None, on_progress=None):
+        """
+        Ejecuta fn(*args) en un worker; fn debe ser una funcion de modulo (picklable).
+        on_progress(evento) recibe, en este hilo, las etapas que emita el render.
+        """
+        worker = self._acquire(cancel)
+        with self.lock:
+            self.busy += 1
+            self.counters["jobs"] += 1
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + (timeout or self.wall_s)
+        try:
+            worker.conn.send((fn, args, self.cpu_s, current_request_id(), on_progress is not None))
+            status = "progress"
+            while status == "progress":
+                while not worker.conn.poll(POLL_S):
+                    if cancel is not None and cancel.is_set():
+                        self._retire(worker, "cancelled", kill=True)
+                        raise JobCancelled("Trabajo cancelado")
+                    if time.monotonic() > deadline:
+                        self._retire(worker, "wall_timeout", kill=True)
+                        raise JobTimeout(f"Tiempo agotado ({timeout or self.wall_s:.0f}s)")
+                    if not worker.proc.is_alive() and not worker.conn.poll(0):
+                        break
+                try:
+                    status, value, worker.rss_mb = worker.conn.recv()
+                except (EOFError, OSError):
+                    reason = self._death_reason(worker)
+                    self._retire(worker, reason, kill=True)
+                    raise WorkerCrashed(f"Worker terminado: {reason}")
+                if status == "progress":
+                    on_progress(value)
+            worker.jobs += 1
+            if status == "memory_limit":
+                self._retire(worker, "memory_limit", kill=True)
+                raise WorkerCrashed(f"Worker terminado: memory_limit ({self.mem_mb} MB)")
+            self._release(worker)
+        finally:
+            with self.lock:
+                self.busy -= 1
+        with self.lock:
+            self.latencies = (self.latencies + [time.perf_counter() - t0])[-500:]
+            self.counters["ok" if status == "ok" else "errors"] += 1
+        if status == "error":
+            name, message = value
+            raise (ValueError if name == "ValueError" else RuntimeError)(message)
+        return value
+
+    def metrics(self) -> dict:
+        with self.lock:
+            lat = sorted(self.latencies)
+            pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000) if lat else None
+            return {
+                "workers": self.spawned,
+                "busy": self.busy,
+                "limits": {"wall_s": self.wall_s, "cpu_s": self.cpu_s, "mem_mb": self.mem_mb,
+                           "max_jobs": self.max_jobs, "max_rss_mb": self.max_rss_mb},
+                **self.counters,
+                "kills": dict(self.kills),
+                "recycled": dict(self.recycled),
+                "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+            }
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                break
@@ -11,6 +11,13 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 
+# Registro comun de CentroFormatosUNAC: lanzado por server.py hereda el formato
+# y el request id (UNAC_REQUEST_ID) del pedido que lo ejecuta
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CentroFormatosUNAC"))
+from unac_logging import get_logger, setup_logging
+
+log = get_logger("maestria_legacy")
+
 # -------------------------
 # UTILIDADES JSON / PATHS
 # -------------------------
@@ -45,7 +52,7 @@ def open_document(path: str):
         else:
             subprocess.run(["xdg-open", path], check=False)
     except Exception as exc:
-        print(f"[WARN] No se pudo abrir el documento: {exc}")
+        log.warning("No se pudo abrir el documento: %s", exc)
 
 def set_page_setup(doc: Document, cfg: dict):
     page_setup = cfg.get("page_setup", {})
@@ -124,7 +131,7 @@ def add_page_blocks(doc: Document, blocks: list, default_title_level: int = 4):
 
 def add_center_logo(doc: Document, logo_path: str, width_cm: float = 3.5, spacing_after_pt: int = 6):
     if not logo_path or not os.path.exists(logo_path):
-        print(f"[WARN] Logo no encontrado en: {logo_path}")
+        log.warning("Logo no encontrado en: %s", logo_path)
         return
     p = doc.add_paragraph()
     p.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -269,13 +276,14 @@ def generate(config_path: str, output_path_override: str = None):
     doc.save(final_path)
     
     # IMPORTANTE: Usamos [OK] en lugar de emojis para evitar crash en Windows
-    print(f"[OK] Documento guardado en: {final_path}")
+    log.info("Documento guardado en: %s", final_path)
 
     # Si NO estamos en modo servidor (output_override es None), abrimos el archivo
     if not output_path_override:
         open_document(final_path)
 
 if __name__ == "__main__":
+    setup_logging()
     
     # ----------------------------------------------------
     # MODO SERVIDOR (AUTOMÁTICO)
@@ -288,7 +296,7 @@ if __name__ == "__main__":
         try:
             generate(json_arg, output_path_override=output_arg)
         except Exception as e:
-            print(f"[ERROR] Fallo critico: {e}")
+            log.error("Fallo critico: %s", e)
             sys.exit(1)
 
     # ----------------------------------------------------
@@ -9,6 +9,13 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 
+# Registro comun de CentroFormatosUNAC: lanzado por server.py hereda el formato
+# y el request id (UNAC_REQUEST_ID) del pedido que lo ejecuta
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CentroFormatosUNAC"))
+from unac_logging import get_logger, setup_logging
+
+log = get_logger("informe_legacy")
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FORMATS_DIR = os.path.join(BASE_DIR, "formats")
 IMAGENES_DIR = os.path.join(BASE_DIR, "Imagenes")
@@ -152,10 +159,11 @@ def generar_documento_core(ruta_json, ruta_salida):
     agregar_numeracion_paginas(doc)
     doc.save(ruta_salida)
     # CORRECCION: Emoji quitado
-    print(f"[OK] Generado: {ruta_salida}")
+    log.info("Generado: %s", ruta_salida)
     return ruta_salida
 
 if __name__ == "__main__":
+    setup_logging()
     if len(sys.argv) > 2:
         path_json_arg = sys.argv[1]
         path_output_arg = sys.argv[2]
@@ -163,7 +171,7 @@ if __name__ == "__main__":
             generar_documento_core(path_json_arg, path_output_arg)
         except Exception as e:
             # CORRECCION: Emoji quitado
-            print(f"[ERROR] Error en generador: {str(e)}")
+            log.error("Error en generador: %s", e)
             sys.exit(1)
     else:
         print("="*40)
@@ -190,4 +198,4 @@ if __name__ == "__main__":
             ruta = generar_documento_core(json_path, out_file)
             if platform.system() == 'Windows': os.startfile(ruta)
         except Exception as e:
-            print(f"Error: {e}")
\ No newline at end of file
+            log.error("Error: %s", e)
\ No newline at end of file
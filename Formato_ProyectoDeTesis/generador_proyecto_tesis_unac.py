@@ -10,6 +10,13 @@ from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 
+# Registro comun de CentroFormatosUNAC: lanzado por server.py hereda el formato
+# y el request id (UNAC_REQUEST_ID) del pedido que lo ejecuta
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "CentroFormatosUNAC"))
+from unac_logging import get_logger, setup_logging
+
+log = get_logger("proyecto_legacy")
+
 class SistemasHenyerEngine:
     def __init__(self, json_path):
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -195,9 +202,10 @@ class SistemasHenyerEngine:
 
         full_output_path = os.path.abspath(output_path)
         self.doc.save(full_output_path)
-        print(f"[OK] Documento generado: {full_output_path}")
+        log.info("Documento generado: %s", full_output_path)
 
 if __name__ == "__main__":
+    setup_logging()
     if len(sys.argv) > 2:
         json_path_arg = sys.argv[1]
         output_path_arg = sys.argv[2]
@@ -206,7 +214,7 @@ if __name__ == "__main__":
             engine = SistemasHenyerEngine(json_path_arg)
             engine.construir(output_path_arg)
         except Exception as e:
-            print(f"[ERROR] Error en generador: {str(e)}")
+            log.error("Error en generador: %s", e)
             sys.exit(1)
 
     else:
@@ -239,6 +247,6 @@ if __name__ == "__main__":
                 engine.construir(out_name)
                 if platform.system() == 'Windows': os.startfile(out_name)
             except Exception as e:
-                print(f"Error: {e}")
+                log.error("Error: %s", e)
         else:
             print(f"No se encontro el JSON: {json_path}")
@@ -3,9 +3,18 @@ from flask_cors import CORS
 import subprocess
 import os
 import sys
+import time
 from datetime import datetime
 
+# Mismo registro JSON con request id que CentroFormatosUNAC/server.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CentroFormatosUNAC'))
+from unac_logging import REQUEST_ID_ENV, current_request_id, get_logger, install_request_ids, setup_logging
+
+setup_logging('json')
+log = get_logger('legacy_server')
+
 app = Flask(__name__)
+install_request_ids(app)
 CORS(app)
 
 # ==========================================
@@ -14,6 +23,7 @@ CORS(app)
 # Ajustado para coincidir con tu estructura de carpetas 'WORD_TEAM4'
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_TIMEOUT_S = int(os.environ.get('UNAC_JOB_TIMEOUT_S', 120))
 
 SCRIPTS_CONFIG = {
     # 1. PROYECTO DE TESIS
@@ -56,12 +66,13 @@ def index():
 
 @app.route('/generate', methods=['POST'])
 def generate_document():
+    t0 = time.perf_counter()
     try:
         data = request.json
         fmt_type = data.get('format')      # proyecto, pregrado, maestria
         sub_type = data.get('sub_type')    # cuant, cual
         
-        print(f"\n[SOLICITUD] Generando: {fmt_type.upper()} - {sub_type.upper()}")
+        log.info("Solicitud: %s - %s", fmt_type, sub_type, extra={'format': fmt_type, 'sub_type': sub_type})
 
         if fmt_type not in SCRIPTS_CONFIG:
             return jsonify({'error': 'Tipo de formato no válido'}), 400
@@ -107,32 +118,40 @@ def generate_document():
 
         # EJECUCIÓN DEL SUBPROCESO
         # Llamamos a python pasando: [script, ruta_json, ruta_salida]
-        print(f"   -> Ejecutando en: {work_dir}")
-        print(f"   -> Script: {config['script']}")
-        
+        log.info("Ejecutando %s en %s", config['script'], work_dir)
+
         cmd = [sys.executable, script_path, json_path, output_path]
+        # El generador hereda el request id para que sus lineas se crucen con esta solicitud
+        env = dict(os.environ, **{REQUEST_ID_ENV: current_request_id() or ''})
         
-        result = subprocess.run(
-            cmd,
-            cwd=work_dir, # Importante: el script corre "dentro" de su carpeta
-            capture_output=True,
-            text=True
-        )
+        try:
+            result = subprocess.run(
+                cmd,
+                cwd=work_dir, # Importante: el script corre "dentro" de su carpeta
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=GENERATOR_TIMEOUT_S # Una plantilla colgada no bloquea el servidor
+            )
+        except subprocess.TimeoutExpired:
+            log.error("%s supero %ss", config['script'], GENERATOR_TIMEOUT_S)
+            return jsonify({'error': f'La generación superó {GENERATOR_TIMEOUT_S} segundos.'}), 504
 
         if result.returncode != 0:
-            print(f"[ERROR PYTHON]: {result.stderr}")
+            log.error("Fallo %s (codigo %s)", config['script'], result.returncode, extra={'stderr': result.stderr[-4000:]})
             return jsonify({'error': 'Falló la generación interna. Ver consola.'}), 500
 
         if os.path.exists(output_path):
-            print(f"   -> Éxito. Enviando archivo.")
+            ms = round((time.perf_counter() - t0) * 1000)
+            log.info("Generado %s (%s ms)", filename, ms, extra={'sample': True, 'ms': ms})
             return send_file(output_path, as_attachment=True, download_name=filename)
         else:
             return jsonify({'error': 'El script corrió pero no generó el archivo .docx'}), 500
 
     except Exception as e:
-        print(f"[ERROR SERVER]: {e}")
+        log.exception("Error en /generate: %s", e)
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    print("🚀 Servidor UNAC iniciado en http://localhost:5000")
+    log.info("Servidor UNAC iniciado en http://localhost:5000")
     app.run(debug=True, port=5000)
\ No newline at end of file